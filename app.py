@@ -1,56 +1,248 @@
-import smtplib
-import math
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_from_directory,send_file
-from flask_sqlalchemy import SQLAlchemy
-from flask_mail import Mail, Message
-from geopy.distance import geodesic
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
-from math import radians, sin, cos, sqrt, atan2
+import hmac
+import json
 import logging
-
+import math
 import os
-from dotenv import load_dotenv
-load_dotenv()
-from flask_cors import CORS
+import time
 
+import click
+from flask import Blueprint, Flask, Response, current_app, g, render_template, request, jsonify, url_for, send_file, stream_with_context
+from flask_sqlalchemy import SQLAlchemy
+from flask_cors import CORS
+from werkzeug.wsgi import wrap_file
+from storage import init_storage, install_sqlite_pragmas, sqlite_engine_options
+from geoclient import GeocoderBusy
+from bulk_register import BulkRegistration, iter_upload_rows
+from helper_queries import HelperQueryError, fetch_helper_page, parse_helper_query, stream_helpers_ndjson
+from sos_batch import SOSBatchError, parse_batch_request
+from live_tracking import TrackerFull, parse_track_points
+from helper_locations import parse_heartbeat, parse_location_update
+from incident_log import BATCH, COALESCED, K_NEAREST, IncidentQueryError, pack_incident, parse_incident_query
+import metrics
+from logging_setup import configure_logging
+from services import Services
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}}, methods=["GET", "POST"])
-# Database Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'  # Ensure database file is 'users.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-
-# Create the database
-with app.app_context():
-    db.create_all()
-    print("Database and tables created successfully!")
-CORS(app, resources={
-    r"/*": {
-        "origins": ["http://127.0.0.1:5500", "http://localhost:5500"],
-        "methods": ["GET", "POST", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Accept"],
-        "supports_credentials": True  # Changed from allow_credentials
+# Bound to each app in create_app; models and routes are declared once here
+db = SQLAlchemy()
+bp = Blueprint('sos', __name__, cli_group=None)
+
+
+def load_config():
+    """Settings read from the environment (and .env) when an app is created."""
+    # Each open live stream holds one of a worker's GUNICORN_THREADS for up to
+    # LIVE_STREAM_MAX_SECONDS; at most half of them may, so SOS requests
+    # always find a free thread
+    live_stream_threads = max(1, int(os.getenv('GUNICORN_THREADS', '16')) // 2)
+    return {
+        # Database Configuration
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL', 'sqlite:///users.db'),  # Ensure database file is 'users.db'
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'CONFIGURE_LOGGING': True,
+        'CORS_ORIGINS': [origin.strip() for origin in os.getenv('CORS_ORIGINS', '*').split(',')],
+        'HELPER_GRID_CELL_DEG': float(os.getenv('HELPER_GRID_CELL_DEG', '0.1')),
+        'HELPER_REGISTRY_CHECK_INTERVAL': float(os.getenv('HELPER_REGISTRY_CHECK_INTERVAL', '1')),
+        'GEOCODE_CACHE_PATH': os.getenv('GEOCODE_CACHE_PATH'),
+        'GEOCODE_CACHE_PRECISION': int(os.getenv('GEOCODE_CACHE_PRECISION', '4')),
+        'GEOCODE_CACHE_TTL': float(os.getenv('GEOCODE_CACHE_TTL', '86400')),
+        'GEOCODE_CACHE_SIZE': int(os.getenv('GEOCODE_CACHE_SIZE', '10000')),
+        'GEOCODER_DOMAIN': os.getenv('GEOCODER_DOMAIN'),
+        'GEOCODER_SCHEME': os.getenv('GEOCODER_SCHEME'),
+        'GEOCODER_RATE': float(os.getenv('GEOCODER_RATE', '1')),
+        'GEOCODER_BURST': int(os.getenv('GEOCODER_BURST', '1')),
+        'GEOCODER_QUEUE_SIZE': int(os.getenv('GEOCODER_QUEUE_SIZE', '64')),
+        'GEOCODER_TIMEOUT': float(os.getenv('GEOCODER_TIMEOUT', '10')),
+        # Threads making backend calls; the rate limit applies across all of them
+        'GEOCODER_WORKERS': int(os.getenv('GEOCODER_WORKERS', '4')),
+        'MAIL_SERVER': os.getenv('MAIL_SERVER', 'smtp.gmail.com'),
+        'MAIL_PORT': int(os.getenv('MAIL_PORT', '587')),
+        'MAIL_USE_TLS': os.getenv('MAIL_USE_TLS', 'true').lower() == 'true',
+        'MAIL_USERNAME': os.getenv('EMAIL_USER'),
+        'MAIL_PASSWORD': os.getenv('EMAIL_PASSWORD'),
+        'SMTP_POOL_SIZE': int(os.getenv('SMTP_POOL_SIZE', '4')),
+        'SMTP_CONCURRENCY': int(os.getenv('SMTP_CONCURRENCY', '4')),
+        'SMTP_TIMEOUT': float(os.getenv('SMTP_TIMEOUT', '10')),
+        'SMTP_MESSAGE_TIMEOUT': float(os.getenv('SMTP_MESSAGE_TIMEOUT', '30')),
+        'SOS_OUTBOX_PATH': os.getenv('SOS_OUTBOX_PATH'),
+        'SOS_MAX_ATTEMPTS': int(os.getenv('SOS_MAX_ATTEMPTS', '5')),
+        'SOS_OUTBOX_WORKERS': int(os.getenv('SOS_OUTBOX_WORKERS', '2')),
+        # Seconds a stopping process keeps sending due SOS deliveries
+        'SOS_DRAIN_TIMEOUT': float(os.getenv('SOS_DRAIN_TIMEOUT', '20')),
+        # Bounds for the k-nearest mode of /send_sos
+        'SOS_MAX_K': int(os.getenv('SOS_MAX_K', '100')),
+        'SOS_MAX_RADIUS': float(os.getenv('SOS_MAX_RADIUS', '50')),
+        # Repeated SOS from one client inside this window and distance joins
+        # the incident already in progress
+        'SOS_COALESCE_WINDOW': float(os.getenv('SOS_COALESCE_WINDOW', '120')),
+        'SOS_COALESCE_DISTANCE_KM': float(os.getenv('SOS_COALESCE_DISTANCE_KM', '0.2')),
+        # Mass-emergency dispatch: many incidents share one proximity pass and
+        # each helper is contacted for at most SOS_HELPER_CAP of their closest
+        'SOS_BATCH_MAX': int(os.getenv('SOS_BATCH_MAX', '5000')),
+        'SOS_HELPER_CAP': int(os.getenv('SOS_HELPER_CAP', '1')),
+        # Live location streams: points kept per incident, points queued per
+        # slow subscriber, open streams per process (each holds a server
+        # thread; a quarter of GUNICORN_THREADS by default, never over half)
+        'LIVE_BUFFER_SIZE': int(os.getenv('LIVE_BUFFER_SIZE', '50')),
+        'LIVE_MAX_PENDING': int(os.getenv('LIVE_MAX_PENDING', '20')),
+        'LIVE_MAX_SUBSCRIBERS': min(live_stream_threads, int(os.getenv(
+            'LIVE_MAX_SUBSCRIBERS', str(max(1, live_stream_threads // 2))))),
+        'LIVE_POLL_INTERVAL': float(os.getenv('LIVE_POLL_INTERVAL', '0.5')),
+        'LIVE_HEARTBEAT': float(os.getenv('LIVE_HEARTBEAT', '15')),
+        'LIVE_STREAM_MAX_SECONDS': float(os.getenv('LIVE_STREAM_MAX_SECONDS', '1800')),
+        # Address helpers reach this server at; enables the live map link in emails
+        'PUBLIC_BASE_URL': os.getenv('PUBLIC_BASE_URL'),
+        # Helper position pings are kept in memory and written in one
+        # transaction per interval (sooner once this many helpers are waiting)
+        'HELPER_LOCATION_FLUSH_INTERVAL': float(os.getenv('HELPER_LOCATION_FLUSH_INTERVAL', '10')),
+        'HELPER_LOCATION_MAX_PENDING': int(os.getenv('HELPER_LOCATION_MAX_PENDING', '50000')),
+        # Key for the per-helper tokens devices send with pings (issued at
+        # registration); default is a random key in instance/helper_token.key
+        'HELPER_TOKEN_SECRET': os.getenv('HELPER_TOKEN_SECRET'),
+        'HELPER_TOKEN_KEY_PATH': os.getenv('HELPER_TOKEN_KEY_PATH'),
+        # Helpers count as present for this long after a heartbeat or ping.
+        # With SOS_PREFER_PRESENT, /send_sos notifies present helpers and adds
+        # the closest stale ones only while fewer than SOS_MIN_PRESENT_HELPERS
+        # are present. Off by default: enable it only once helpers' devices
+        # send heartbeats, or every helper counts as stale
+        'HELPER_PRESENCE_TTL': float(os.getenv('HELPER_PRESENCE_TTL', '300')),
+        'SOS_PREFER_PRESENT': os.getenv('SOS_PREFER_PRESENT', 'false').lower() == 'true',
+        'SOS_MIN_PRESENT_HELPERS': int(os.getenv('SOS_MIN_PRESENT_HELPERS', '3')),
+        # Alarm audio: directory (default static/audio) and the lifetime of
+        # fingerprinted URLs, which change whenever a file does
+        'AUDIO_DIR': os.getenv('AUDIO_DIR'),
+        'AUDIO_MAX_AGE': int(os.getenv('AUDIO_MAX_AGE', str(365 * 24 * 3600))),
+        # Binary log of every SOS for analysis (default instance/incidents).
+        # /incidents answers only "Authorization: Bearer <token>" and is
+        # disabled (404) while no token is set
+        'INCIDENT_LOG_ENABLED': os.getenv('INCIDENT_LOG_ENABLED', 'true').lower() == 'true',
+        'INCIDENT_LOG_DIR': os.getenv('INCIDENT_LOG_DIR'),
+        'INCIDENT_SEGMENT_RECORDS': int(os.getenv('INCIDENT_SEGMENT_RECORDS', '1000000')),
+        'INCIDENT_QUERY_TOKEN': os.getenv('INCIDENT_QUERY_TOKEN'),
     }
-})
+
+
+def create_app(config=None):
+    """Builds an app; ``config`` overrides the values from load_config().
+
+    Nothing here touches the database, opens the outbox or starts threads.
+    Run ``flask --app app init-db`` (or init_db(app)) once to create the
+    tables and apply migrations.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    app = Flask(__name__)
+    app.config.update(load_config())
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', sqlite_engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+
+    sos = app.extensions['sos'] = Services(app)
+    if app.config['CONFIGURE_LOGGING']:
+        # JSON records written by a background thread; levels come from
+        # LOG_LEVEL / LOG_LEVELS
+        sos.log_handler = configure_logging()
+
+    CORS(app, resources={r"/*": {"origins": app.config['CORS_ORIGINS']}},
+         methods=["GET", "POST", "DELETE", "OPTIONS"],
+         allow_headers=["Content-Type", "Accept", "Idempotency-Key", "X-Client-Id", "X-Track-Token", "X-Helper-Token",
+                        "Last-Event-ID"])
+    db.init_app(app)
+    with app.app_context():
+        # Creates no connection; WAL pragmas apply as connections open
+        install_sqlite_pragmas(db.engine)
+        sos.engine = db.engine
+    app.register_blueprint(bp)
+    return app
+
+
+def services():
+    return current_app.extensions['sos']
+
+
+def init_db(app):
+    # Create the database: WAL pragmas, tables and pending schema migrations
+    with app.app_context():
+        applied = init_storage(db)
+    logger.info("Database and tables created successfully!")
+    return applied
+
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create the database tables and apply pending migrations."""
+    applied = init_db(current_app)
+    click.echo(f"Database ready; applied migrations: {applied or 'none'}")
+
+
+@bp.cli.command('helper-token')
+@click.argument('helper_id', type=int)
+def helper_token_command(helper_id):
+    """Print the device token of a helper (e.g. one added by bulk upload)."""
+    helper = db.session.get(RegisteredUser, helper_id)
+    if helper is None:
+        raise click.ClickException(f"No helper with id {helper_id}")
+    click.echo(services().helper_token(helper.id, helper.email))
+
+
+# Request latency per route; stages timed during the request carry its route
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.route_token = metrics.current_route.set(request.url_rule.rule if request.url_rule else 'unmatched')
+    g.stages_token = metrics.current_stages.set({})
+
+@bp.after_app_request
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            route=metrics.current_route.get(), method=request.method, status=response.status_code
+        )
+    return response
+
+@bp.teardown_app_request
+def reset_request_route(exc):
+    token = g.pop('route_token', None)
+    if token is not None:
+        metrics.current_route.reset(token)
+    token = g.pop('stages_token', None)
+    if token is not None:
+        metrics.current_stages.reset(token)
 
 # Database Model for Registered Users
 class RegisteredUser(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(256))
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
+    is_active = db.Column(db.Boolean, nullable=False, default=True, server_default='1', index=True)
+    location_updated_at = db.Column(db.Float)
+    last_seen_at = db.Column(db.Float)
+
+    __table_args__ = (
+        db.Index('ix_registered_user_lat_lon', 'latitude', 'longitude'),
+    )
 
     def __repr__(self):
         return f"<RegisteredUser {self.name}, {self.email}>"
+
+def get_helper_registry():
+    return services().registry.sync(db.engine)
+
+def helper_record(helper):
+    return {
+        'id': helper.id,
+        'name': helper.name,
+        'email': helper.email,
+        'latitude': helper.latitude,
+        'longitude': helper.longitude,
+        'is_active': helper.is_active
+    }
+
 # File to store user data
 USERS_FILE = 'users.json'
 
@@ -65,48 +257,120 @@ def save_users(users):
         json.dump(users, f, indent=4)
 
 # Route to render the index page
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/audio-file')
+def send_audio(asset, immutable):
+    # send_file answers If-None-Match / If-Modified-Since with 304 and Range /
+    # If-Range with 206; full responses go out through wsgi.file_wrapper,
+    # which gunicorn writes with sendfile(2)
+    response = send_file(asset.path, mimetype=asset.mimetype, conditional=True, etag=asset.digest,
+                         last_modified=asset.mtime, max_age=current_app.config['AUDIO_MAX_AGE'] if immutable else 0)
+    # Werkzeug only adds this to 206s; media elements look for it up front
+    response.headers['Accept-Ranges'] = 'bytes'
+    content_range = response.content_range
+    if response.status_code == 206 and content_range.stop == content_range.length:
+        # Open-ended ranges (bytes=N-, what <audio> asks for) run to the end
+        # of the file, so a file positioned at N serves them - and keeps the
+        # sendfile path Werkzeug's range iterator would bypass
+        response.response.close()
+        body = open(asset.path, 'rb')
+        body.seek(content_range.start)
+        response.response = wrap_file(request.environ, body)
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+@bp.app_context_processor
+def audio_context():
+    def audio_sources(name):
+        # <source> elements for every format of `name`, smallest first
+        return [{'url': url_for('sos.audio_asset', filename=asset.filename), 'type': asset.mimetype}
+                for asset in services().audio_assets.variants(name)]
+
+    return {'audio_sources': audio_sources}
+
+# Fingerprinted audio: cached for AUDIO_MAX_AGE without revalidation. An
+# outdated fingerprint (a page cached before the file changed) still gets
+# the current file, just without the long-lived headers.
+@bp.route('/audio/<filename>')
+def audio_asset(filename):
+    asset, current = services().audio_assets.resolve(filename)
+    if asset is None:
+        return jsonify({'success': False, 'message': 'Audio file not found'}), 404
+    return send_audio(asset, immutable=current)
+
+# Stable URL for pages that can't render fingerprinted ones (alarm.html); the
+# format follows the Accept header and the browser revalidates with the ETag
+@bp.route('/audio-file')
 def serve_audio():
-    return send_file('/static/audio/alarm.mp3', as_attachment=False)
-
-@app.route('/helpers')
+    asset = services().audio_assets.negotiate('alarm', request.accept_mimetypes)
+    if asset is None:
+        return jsonify({'success': False, 'message': 'Audio file not found'}), 404
+    response = send_audio(asset, immutable=False)
+    response.vary.add('Accept')
+    return response
+
+@bp.route('/helpers')
 def helpers_page():
     return render_template('index11.html')
 
-@app.route('/get_helpers', methods=['GET'])
+@bp.route('/get_helpers', methods=['GET'])
 def get_helpers():
+    # Supports ?after=&limit= (keyset paging), ?fields=, ?format=ndjson and
+    # ?bbox= or ?lat=&lng=&radius= filters; no parameters returns every helper
     try:
-        helpers = RegisteredUser.query.all()
-        helpers_list = [{
-            'id': helper.id,
-            'name': helper.name,
-            'email': helper.email,
-            'latitude': helper.latitude,
-            'longitude': helper.longitude
-        } for helper in helpers]
+        params = parse_helper_query(request.args)
+    except HelperQueryError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    try:
+        if request.args.get('format', 'json') == 'json' and not any(
+            request.args.get(name) for name in ('after', 'limit', 'bbox', 'radius')
+        ):
+            # Unfiltered listing is served straight from the registry
+            helpers_list = [
+                {field: helper[field] for field in params['fields']}
+                for helper in get_helper_registry().all()
+            ]
+            return jsonify({
+                'success': True,
+                'helpers': helpers_list,
+                'nextCursor': None
+            })
+
+        if params['format'] == 'ndjson':
+            return Response(
+                stream_with_context(stream_helpers_ndjson(db.session, RegisteredUser, params)),
+                mimetype='application/x-ndjson'
+            )
+
+        with metrics.stage('db_fetch'):
+            helpers_list, next_cursor = fetch_helper_page(db.session, RegisteredUser, params)
         
         return jsonify({
             'success': True,
-            'helpers': helpers_list
+            'helpers': helpers_list,
+            'nextCursor': next_cursor
         })
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.error(f"Error fetching helpers: {str(e)}")
         return jsonify({
             'success': False,
             'error': 'Failed to fetch helpers'
         }), 500
 
-@app.route('/delete_helper/<int:helper_id>', methods=['DELETE'])
+@bp.route('/delete_helper/<int:helper_id>', methods=['DELETE'])
 def delete_helper(helper_id):
     try:
         helper = RegisteredUser.query.get(helper_id)
         if helper:
             db.session.delete(helper)
             db.session.commit()
+            services().registry.remove(helper_id)
             return jsonify({'success': True, 'message': 'Helper deleted successfully'})
         return jsonify({'success': False, 'message': 'Helper not found'}), 404
     except Exception as e:
@@ -114,8 +378,28 @@ def delete_helper(helper_id):
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+def reverse_geocode(latitude, longitude):
+    # Reverse-geocode cache in front of a rate-limited, coalescing geocoder
+    # client. Nearby points share a cache key, so they also share one backend call
+    geocode_cache = services().geocode_cache
+    geocoding_client = services().geocoding_client
+    key = geocode_cache.key(latitude, longitude)
+
+    def lookup():
+        # The caller has already counted its miss; this only catches an
+        # address stored by a flight that finished in the meantime
+        address = geocode_cache.get(latitude, longitude, count=False)
+        if address is None:
+            with metrics.stage('geocode_backend'):
+                address = geocoding_client.submit(latitude, longitude).result(geocoding_client.timeout)
+            address = address or "Address not found"
+            geocode_cache.set(latitude, longitude, address)
+        return address
+
+    return geocoding_client.flights.do(key, lookup)
+
 # Route to show address
-@app.route('/get_location_info', methods=['POST'])
+@bp.route('/get_location_info', methods=['POST'])
 def get_location_info():
     try:
         data = request.json
@@ -125,21 +409,24 @@ def get_location_info():
         if latitude is None or longitude is None:
             return jsonify({'success': False, 'error': 'Missing coordinates'}), 400
 
-        # Initialize the geolocator
-        geolocator = Nominatim(user_agent="distress_signal_app")
-        
-        try:
-            # Get the address
-            location = geolocator.reverse((latitude, longitude), language='en')
-            address = location.address if location else "Address not found"
-        except GeocoderTimedOut:
-            address = "Timeout getting address"
-        except Exception as e:
-            address = f"Error getting address: {str(e)}"
+        with metrics.stage('geocode_cache'):
+            address = services().geocode_cache.get(latitude, longitude)
+        cached = address is not None
+
+        if not cached:
+            try:
+                address = reverse_geocode(latitude, longitude)
+            except TimeoutError:
+                address = "Timeout getting address"
+            except GeocoderBusy:
+                address = "Address lookup busy, please retry"
+            except Exception as e:
+                address = f"Error getting address: {str(e)}"
 
         return jsonify({
             'success': True,
             'address': address,
+            'cached': cached,
             'coordinates': {
                 'latitude': latitude,
                 'longitude': longitude
@@ -148,6 +435,80 @@ def get_location_info():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Scrape-time gauges for state the other components already track. Read
+# from the scraping app; components not built yet report nothing.
+def _log_records_dropped():
+    handler = services().log_handler
+    return handler.dropped if handler is not None else 0
+
+def _geocode_lookups():
+    cache = services().built('geocode_cache')
+    client = services().built('geocoding_client')
+    counts = {}
+    if cache is not None:
+        counts.update({('memory_hit',): cache.hits, ('disk_hit',): cache.disk_hits, ('miss',): cache.misses})
+    if client is not None:
+        counts.update({('backend_call',): client.backend_calls, ('coalesced',): client.flights.shared,
+                       ('rejected',): client.rejected})
+    return counts
+
+metrics.REGISTRY.gauge('log_records_dropped', 'Log records dropped because the log queue was full',
+                       _log_records_dropped)
+metrics.REGISTRY.gauge('helper_registry_helpers', 'Helpers held in the in-memory registry',
+                       lambda: len(services().registry))
+metrics.REGISTRY.gauge('geocode_lookups', 'Reverse-geocode lookups since start by outcome',
+                       _geocode_lookups, ('outcome',))
+
+def _live_tracking():
+    tracker = services().built('live_tracker')
+    if tracker is None:
+        return {}
+    stats = tracker.stats()
+    return {(name,): stats[name] for name in ('subscribers', 'published', 'pushed', 'dropped')}
+
+metrics.REGISTRY.gauge('live_tracking', 'Live location streams open and points published, pushed and dropped',
+                       _live_tracking, ('kind',))
+
+def _helper_locations():
+    buffer = services().built('helper_locations')
+    if buffer is None:
+        return {}
+    stats = buffer.stats()
+    return {(name,): stats[name] for name in ('pending', 'received', 'heartbeats', 'coalesced', 'flushed',
+                                              'flushes', 'failures')}
+
+metrics.REGISTRY.gauge('helper_location_updates', 'Helper position pings received, coalesced and flushed',
+                       _helper_locations, ('kind',))
+
+def _helper_presence():
+    presence = services().built('presence')
+    if presence is None:
+        return {}
+    stats = presence.stats()
+    return {(name,): stats[name] for name in ('present', 'beats', 'expired')}
+
+metrics.REGISTRY.gauge('helper_presence', 'Helpers currently present, heartbeats applied and presences expired',
+                       _helper_presence, ('kind',))
+
+def _incident_log():
+    log = services().built('incident_log')
+    if log is None:
+        return {}
+    stats = log.stats()
+    return {('appended',): stats['appended'], ('failures',): stats['failures']}
+
+metrics.REGISTRY.gauge('incident_log_records', 'SOS incidents written to the incident log by this process',
+                       _incident_log, ('kind',))
+
+@bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/geocode_stats', methods=['GET'])
+def geocode_stats():
+    sos = services()
+    return jsonify({'success': True, **sos.geocode_cache.stats(), 'client': sos.geocoding_client.stats()})
+
 # Route to send SOS
 def calculate_distance(lat1, lon1, lat2, lon2):
     R = 6371  # Earth's radius in kilometers
@@ -165,174 +526,175 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     return distance
 
 def get_helpers_from_database():
-    # Query actual helpers from the database
+    # Served from the in-memory registry; no ORM objects are built
     try:
-        helpers = RegisteredUser.query.all()
         return [{
-            'id': helper.id,
-            'email': helper.email,
-            'latitude': helper.latitude,
-            'longitude': helper.longitude
-        } for helper in helpers]
+            'id': helper['id'],
+            'email': helper['email'],
+            'latitude': helper['latitude'],
+            'longitude': helper['longitude']
+        } for helper in get_helper_registry().all()]
     except Exception as e:
         logger.error(f"Error fetching helpers from database: {str(e)}")
         return []
 
-def get_nearby_helpers(user_lat, user_lon, radius=10):
+def get_nearby_helpers(user_lat, user_lon, radius=10, k=None, prefer_present=None):
+    # With k set, returns the k closest helpers, growing the search from 1 km
+    # up to `radius`; otherwise everyone within `radius`. With prefer_present
+    # (SOS_PREFER_PRESENT by default) helpers without a recent heartbeat are
+    # left out unless fewer than SOS_MIN_PRESENT_HELPERS are present.
+    if prefer_present is None:
+        prefer_present = current_app.config['SOS_PREFER_PRESENT']
     try:
-        helpers = RegisteredUser.query.all()
-        nearby_helpers = []
-        
-        print(f"Searching helpers near: {user_lat}, {user_lon}")
+        with metrics.stage('registry_sync'):
+            registry = get_helper_registry()
+        started = time.perf_counter()
+        stale_skipped = 0
+        with metrics.stage('helper_search'):
+            lat, lon = float(user_lat), float(user_lon)
+            minimum = current_app.config['SOS_MIN_PRESENT_HELPERS']
+            if k and prefer_present:
+                matches, stale_skipped, scanned = registry.nearest_present(lat, lon, k, radius, minimum)
+            elif k:
+                matches, scanned = registry.nearest(lat, lon, k, radius)
+            elif prefer_present:
+                matches, stale_skipped, scanned = registry.nearby_present(lat, lon, radius, minimum)
+            else:
+                # Only active helpers in grid cells overlapping the radius are checked
+                matches, scanned = registry.nearby(lat, lon, radius)
+        route = metrics.current_route.get()
+        metrics.HELPERS_SCANNED.inc(scanned, route=route)
+        metrics.HELPERS_MATCHED.inc(len(matches), route=route)
+        g.helpers_stale_skipped = stale_skipped
+        if prefer_present:
+            metrics.HELPERS_STALE_SKIPPED.inc(stale_skipped, route=route)
+            if any(helper['id'] not in registry.presence for helper, _ in matches):
+                metrics.PRESENCE_FALLBACKS.inc(route=route)
         
-        for helper in helpers:
-            distance = calculate_distance(
-                float(user_lat), 
-                float(user_lon),
-                float(helper.latitude),
-                float(helper.longitude)
-            )
-            
-            print(f"Helper Location: {helper.latitude}, {helper.longitude}")
-            print(f"Calculated Distance: {distance} km")
-            
-            if distance <= radius:
-                nearby_helpers.append({
-                    'id': helper.id,
-                    'email': helper.email,
-                    'distance': round(distance, 2)
-                })
+        nearby_helpers = [{
+            'id': helper['id'],
+            'email': helper['email'],
+            'distance': round(distance, 2)
+        } for helper, distance in matches]
         
-        print(f"Found {len(nearby_helpers)} nearby helpers")
+        # One summary line per scan, never one per helper
+        logger.info("Helper scan", extra={
+            'lat': user_lat, 'lon': user_lon, 'radius': radius, 'k': k,
+            'scanned': scanned, 'matched': len(nearby_helpers), 'stale_skipped': stale_skipped,
+            'ms': round((time.perf_counter() - started) * 1000, 3)
+        })
         return nearby_helpers
     except Exception as e:
-        print(f"Helper search error: {str(e)}")
+        logger.error(f"Helper search error: {str(e)}")
         return []
 
 
-# Email configuration
-# def send_sos_email(helper_email, location_info, distance):
-#     # Email credentials - store these in your .env file
-#     SMTP_SERVER = "smtp.gmail.com"  # or your email provider's SMTP server
-#     SMTP_PORT = 587
-#     SENDER_EMAIL = os.getenv('EMAIL_USER')  # add this to your .env file
-#     SENDER_PASSWORD = os.getenv('EMAIL_PASSWORD')  # add this to your .env file
-
-#     try:
-#         # Create message
-#         msg = MIMEMultipart()
-#         msg['From'] = SENDER_EMAIL
-#         msg['To'] = helper_email
-#         msg['Subject'] = "URGENT: SOS Signal Received"
-
-#         # Email body
-#         body = f"""
-#         URGENT: An SOS signal has been received from someone nearby!
-
-#         Location Details:
-#         - Latitude: {location_info['latitude']}
-#         - Longitude: {location_info['longitude']}
-#         - Approximate distance from you: {distance:.2f} km
+def request_stages(**renamed):
+    # Stage timings of this request in seconds, plus 'total' so far;
+    # renamed={'helper_search': 'helper_assign'} stores a stage under another name
+    stages = dict(metrics.current_stages.get() or {})
+    for name, source in renamed.items():
+        stages[name] = stages.get(source)
+    stages['total'] = time.perf_counter() - g.request_started
+    return stages
 
-#         Google Maps Link:
-#         https://www.google.com/maps?q={location_info['latitude']},{location_info['longitude']}
-
-#         This person needs immediate assistance. Please check their location and respond if you can help.
-
-#         Note: This is an automated message. Please be cautious and ensure your own safety first.
-#         """
-
-#         msg.attach(MIMEText(body, 'plain'))
-
-#         # Create SMTP session
-#         server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-#         server.starttls()
-#         server.login(SENDER_EMAIL, SENDER_PASSWORD)
-
-#         # Send email
-#         server.send_message(msg)
-#         server.quit()
-        
-#         logger.info(f"SOS email sent successfully to {helper_email}")
-#         return True
-
-#     except Exception as e:
-#         logger.error(f"Failed to send email to {helper_email}: {str(e)}")
-#         return False
-
-# # Update the send_sos route to include email notifications
-# # Route to send SOS
-
-# Update email configuration
-EMAIL_CONFIG = {
-    'MAIL_SERVER': 'smtp.gmail.com',
-    'MAIL_PORT': 587,
-    'MAIL_USE_TLS': True,
-    'MAIL_USERNAME': os.getenv('EMAIL_USER'),
-    'MAIL_PASSWORD': os.getenv('EMAIL_PASSWORD')
-}
-
-def send_sos_email(recipient, location, distance):
+def record_incidents(*records):
+    # The incident log is for analysis; failing to write it never fails an SOS
+    if not current_app.config['INCIDENT_LOG_ENABLED']:
+        return
     try:
-        # Validate credentials
-        if not EMAIL_CONFIG['MAIL_USERNAME'] or not EMAIL_CONFIG['MAIL_PASSWORD']:
-            raise ValueError("Email credentials missing")
-
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_CONFIG['MAIL_USERNAME']
-        msg['To'] = recipient
-        msg['Subject'] = "EMERGENCY SOS ALERT!"
-
-        # Create body with string (not bytes)
-        body = f"""
-        EMERGENCY ALERT - Someone needs help!
-        
-        Location Details:
-        Latitude: {location['latitude']}
-        Longitude: {location['longitude']}
-        Distance from you: {distance:.2f} km
-        
-        Google Maps Link:
-        https://www.google.com/maps?q={location['latitude']},{location['longitude']}
-        
-        Please respond if you can help!
-        """
-
-        msg.attach(MIMEText(body, 'plain'))
-
-        # Send email
-        with smtplib.SMTP(EMAIL_CONFIG['MAIL_SERVER'], EMAIL_CONFIG['MAIL_PORT']) as server:
-            server.starttls()
-            server.login(EMAIL_CONFIG['MAIL_USERNAME'], EMAIL_CONFIG['MAIL_PASSWORD'])
-            server.send_message(msg)
-            return True
-
+        services().incident_log.append(*records)
     except Exception as e:
-        logger.error(f"Email error to {recipient}: {str(e)}")
-        return False
+        logger.error(f"Incident log error: {str(e)}")
+
+def sos_client_key(data):
+    # Only an explicit client id coalesces: people behind one NAT or carrier
+    # address can share a browser build, and each of them needs their own SOS
+    client_id = data.get('clientId') or request.headers.get('X-Client-Id')
+    return f"id:{client_id}"[:200] if client_id else None
+
+def sos_job_response(job_id, helpers_found, helpers_added, coalesced):
+    outbox = services().outbox
+    counts = outbox.job_status(job_id)['counts']
+    return jsonify({
+        'success': True,
+        'jobId': job_id,
+        'statusUrl': url_for('.sos_status', job_id=job_id),
+        # The sender posts live positions to locationUrl with trackToken
+        'trackToken': outbox.track_token(job_id),
+        'locationUrl': url_for('.sos_location', job_id=job_id),
+        'streamUrl': url_for('.sos_stream', job_id=job_id),
+        'coalesced': coalesced,
+        'helpersFound': helpers_found,
+        'helpersAdded': helpers_added,
+        # Kept for existing clients: helpers queued for this incident
+        'helpersNotified': sum(counts.values())
+    }), 202
 
 # Update send_sos route to use new email function
-@app.route('/send_sos', methods=['POST'])
+@bp.route('/send_sos', methods=['POST'])
 def send_sos():
     try:
         data = request.get_json()
         user_location = data['location']
+
+        # A retried request with the same key returns the original incident
+        # without scanning or queueing anything
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotencyKey')
+        if idempotency_key:
+            idempotency_key = str(idempotency_key)[:200]
+            job_id = services().outbox.find_by_idempotency_key(idempotency_key)
+            if job_id:
+                return sos_job_response(job_id, None, 0, True)
         
-        nearby_helpers = get_nearby_helpers(
-            user_location['latitude'],
-            user_location['longitude']
-        )
+        # Optional k-nearest mode bounds the fan-out regardless of density
+        k = data.get('k')
+        if k is not None:
+            try:
+                k = int(k)
+                max_radius = float(data.get('max_radius', current_app.config['SOS_MAX_RADIUS']))
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'message': "'k' and 'max_radius' must be numeric"}), 400
+            if k < 1 or max_radius <= 0:
+                return jsonify({'success': False, 'message': "'k' and 'max_radius' must be positive"}), 400
+            k = min(k, current_app.config['SOS_MAX_K'])
+            radius = min(max_radius, current_app.config['SOS_MAX_RADIUS'])
+            nearby_helpers = get_nearby_helpers(
+                user_location['latitude'],
+                user_location['longitude'],
+                radius=radius,
+                k=k
+            )
+        else:
+            radius = 10
+            nearby_helpers = get_nearby_helpers(
+                user_location['latitude'],
+                user_location['longitude'],
+                radius=radius
+            )
         
-        emails_sent = 0
-        for helper in nearby_helpers:
-            if send_sos_email(helper['email'], user_location, helper['distance']):
-                emails_sent += 1
-
-        return jsonify({
-            'success': True,
-            'helpersNotified': emails_sent
-        })
+        # Emails are sent by the outbox workers; the request only queues them.
+        # Helpers already queued for a coalesced incident are skipped.
+        with metrics.stage('outbox_enqueue'):
+            job_id, coalesced, added = services().outbox.submit(
+                user_location,
+                nearby_helpers,
+                client_key=sos_client_key(data),
+                idempotency_key=idempotency_key,
+                coalesce_window=current_app.config['SOS_COALESCE_WINDOW'],
+                coalesce_distance_km=current_app.config['SOS_COALESCE_DISTANCE_KM']
+            )
+        services().start_outbox_workers()
+        if coalesced:
+            logger.info(f"SOS coalesced into {job_id}: {added} new helpers queued")
+        record_incidents(pack_incident(
+            user_location, job_id, len(nearby_helpers), added,
+            stale=g.get('helpers_stale_skipped', 0), radius=radius, k=k,
+            flags=(COALESCED if coalesced else 0) | (K_NEAREST if k else 0),
+            stages=request_stages()
+        ))
+
+        return sos_job_response(job_id, len(nearby_helpers), added, coalesced)
 
     except Exception as e:
         logger.error(f"SOS Error: {str(e)}")
@@ -340,8 +702,228 @@ def send_sos():
             'success': False, 
             'message': str(e)
         }), 500
+
+@bp.route('/send_sos/batch', methods=['POST'])
+def send_sos_batch():
+    try:
+        locations, radius, cap = parse_batch_request(
+            request.get_json(silent=True), current_app.config['SOS_BATCH_MAX'],
+            current_app.config['SOS_MAX_RADIUS'], current_app.config['SOS_HELPER_CAP']
+        )
+    except SOSBatchError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    try:
+        with metrics.stage('registry_sync'):
+            registry = get_helper_registry()
+        with metrics.stage('helper_assign'):
+            assigned, found, scanned = registry.assign(
+                [(location['latitude'], location['longitude']) for location in locations], radius, cap
+            )
+        metrics.HELPERS_SCANNED.inc(scanned, route=metrics.current_route.get())
+        metrics.HELPERS_MATCHED.inc(sum(found), route=metrics.current_route.get())
+        jobs = [
+            (location, [{'id': helper['id'], 'email': helper['email'], 'distance': round(distance, 2)}
+                        for helper, distance in matches])
+            for location, matches in zip(locations, assigned)
+        ]
+        # One outbox transaction for every incident; the workers then drain
+        # the combined deliveries in batches
+        with metrics.stage('outbox_enqueue'):
+            job_ids = services().outbox.enqueue_many(jobs)
+        services().start_outbox_workers()
+
+        notified = sum(len(helpers) for _, helpers in jobs)
+        # Timings are the whole batch's; every incident carries them
+        stages = request_stages(helper_search='helper_assign')
+        record_incidents(*(
+            pack_incident(location, job_id, in_range, len(helpers), radius=radius, flags=BATCH, stages=stages)
+            for job_id, in_range, (location, helpers) in zip(job_ids, found, jobs)
+        ))
+        logger.info(f"SOS batch: {len(jobs)} incidents, {scanned} helpers checked, {notified} notifications queued")
+        return jsonify({
+            'success': True,
+            'incidents': [{
+                'jobId': job_id,
+                'statusUrl': url_for('.sos_status', job_id=job_id),
+                'streamUrl': url_for('.sos_stream', job_id=job_id),
+                'helpersFound': in_range,
+                'helpersNotified': len(helpers)
+            } for job_id, in_range, (_, helpers) in zip(job_ids, found, jobs)],
+            'helpersNotified': notified,
+            'perHelperCap': cap,
+            'radius': radius
+        }), 202
+
+    except Exception as e:
+        logger.error(f"SOS batch error: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@bp.route('/sos_status/<job_id>', methods=['GET'])
+def sos_status(job_id):
+    try:
+        status = services().outbox.job_status(job_id)
+        if status is None:
+            return jsonify({'success': False, 'message': 'SOS job not found'}), 404
+        return jsonify({'success': True, **status})
+    except Exception as e:
+        logger.error(f"SOS status error: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+# Post-incident analysis: logged SOS incidents as NDJSON, filtered by time
+# (?from=&to=) and region (?bbox= or ?lat=&lng=&radius=), read block by block
+@bp.route('/incidents', methods=['GET'])
+def incidents():
+    # Incident positions are sensitive: without a configured token the route
+    # does not exist
+    token = current_app.config['INCIDENT_QUERY_TOKEN']
+    if not token:
+        return jsonify({'success': False, 'message': 'Not found'}), 404
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+        return jsonify({'success': False, 'message': 'Invalid or missing token'}), 403
+    try:
+        params = parse_incident_query(request.args)
+    except IncidentQueryError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    rows = services().incident_log.query(**params)
+    return Response(stream_with_context(json.dumps(row) + '\n' for row in rows),
+                    mimetype='application/x-ndjson')
+
+# Live location: the person in distress posts positions as they move and
+# notified helpers follow them over Server-Sent Events
+@bp.route('/sos/<job_id>/location', methods=['POST'])
+def sos_location(job_id):
+    data = request.get_json(silent=True)
+    try:
+        points = parse_track_points(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    try:
+        sos = services()
+        token = sos.outbox.track_token(job_id)
+        if token is None:
+            return jsonify({'success': False, 'message': 'SOS job not found'}), 404
+        supplied = request.headers.get('X-Track-Token') or data.get('trackToken') or ''
+        if not hmac.compare_digest(str(supplied), token):
+            return jsonify({'success': False, 'message': 'Invalid track token'}), 403
+        with metrics.stage('track_publish'):
+            rows = sos.live_tracker.publish(job_id, points)
+        return jsonify({'success': True, 'ids': [row['id'] for row in rows]}), 202
+    except Exception as e:
+        logger.error(f"Live location error: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+def sse_event(point, skipped=0):
+    payload = {
+        'latitude': point['latitude'],
+        'longitude': point['longitude'],
+        'accuracy': point['accuracy'],
+        'recordedAt': point['recorded_at'],
+        'skipped': skipped
+    }
+    return f"id: {point['id']}\nevent: location\ndata: {json.dumps(payload)}\n\n"
+
+@bp.route('/sos/<job_id>/stream', methods=['GET'])
+def sos_stream(job_id):
+    # EventSource reconnects with Last-Event-ID and gets only newer points
+    sos = services()
+    if sos.outbox.track_token(job_id) is None:
+        return jsonify({'success': False, 'message': 'SOS job not found'}), 404
+    last_id = request.headers.get('Last-Event-ID', type=int) or request.args.get('after', type=int) or 0
+    try:
+        subscriber = sos.live_tracker.subscribe(job_id, last_id)
+    except TrackerFull as e:
+        return jsonify({'success': False, 'message': str(e)}), 503, {'Retry-After': '5'}
+
+    heartbeat = current_app.config['LIVE_HEARTBEAT']
+    max_seconds = current_app.config['LIVE_STREAM_MAX_SECONDS']
+
+    def events():
+        # Streams are closed after max_seconds so threads are recycled; the
+        # browser reconnects on its own
+        try:
+            yield 'retry: 3000\n\n'
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline:
+                points, skipped = subscriber.get(heartbeat)
+                if not points:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield ''.join(sse_event(point, skipped if i == 0 else 0) for i, point in enumerate(points))
+        finally:
+            sos.live_tracker.unsubscribe(subscriber)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/sos/<job_id>/live', methods=['GET'])
+def sos_live(job_id):
+    return render_template('live.html', job_id=job_id)
+
+def helper_token_error(helper, data):
+    # Error response unless the request carries the helper's token (issued
+    # by /register_user) in X-Helper-Token or the body's "token"
+    if helper is None:
+        return jsonify({'success': False, 'message': 'Helper not found'}), 404
+    supplied = request.headers.get('X-Helper-Token') or data.get('token') or ''
+    expected = services().helper_token(helper['id'], helper['email'])
+    if not hmac.compare_digest(str(supplied).encode(), expected.encode()):
+        return jsonify({'success': False, 'message': 'Invalid helper token'}), 403
+    return None
+
+# Periodic position pings from helpers' devices. The registry moves the
+# helper at once; the database write is batched with everyone else's.
+@bp.route('/helper_location', methods=['POST'])
+def helper_location():
+    data = request.get_json(silent=True)
+    try:
+        helper_id, latitude, longitude = parse_location_update(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    try:
+        sos = services()
+        registry = get_helper_registry()
+        error = helper_token_error(registry.get(helper_id), data)
+        if error:
+            return error
+        sos.helper_locations.update(helper_id, latitude, longitude)
+        registry.move(helper_id, latitude, longitude)
+        # A position ping is also a heartbeat
+        sos.presence.beat(helper_id)
+        return jsonify({'success': True}), 202
+    except Exception as e:
+        logger.error(f"Helper location error: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+# Heartbeat from a helper's device that has no new position to report.
+# Marks the helper present here at once; other processes see it once the
+# batched last_seen_at write lands.
+@bp.route('/helper_heartbeat', methods=['POST'])
+def helper_heartbeat():
+    data = request.get_json(silent=True)
+    try:
+        helper_id = parse_heartbeat(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    try:
+        sos = services()
+        error = helper_token_error(get_helper_registry().get(helper_id), data)
+        if error:
+            return error
+        sos.helper_locations.seen(helper_id)
+        sos.presence.beat(helper_id)
+        return jsonify({'success': True, 'ttl': sos.presence.ttl}), 202
+    except Exception as e:
+        logger.error(f"Helper heartbeat error: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 # Route to register a user
-@app.route('/register_user', methods=['POST'])
+@bp.route('/register_user', methods=['POST'])
 def register_user():
     try:
         # Ensure the request contains JSON data
@@ -376,19 +958,61 @@ def register_user():
         new_user = RegisteredUser(name=name, email=email, latitude=latitude, longitude=longitude)
         db.session.add(new_user)
         db.session.commit()
+        services().registry.upsert(helper_record(new_user))
 
-        return jsonify({'success': True, 'message': "User registered successfully!"}), 201  # Created status code
+        # The device keeps helperToken for /helper_location and /helper_heartbeat
+        return jsonify({'success': True, 'message': "User registered successfully!", 'helperId': new_user.id,
+                        'helperToken': services().helper_token(new_user.id, new_user.email)}), 201  # Created status code
 
     except Exception as e:
-        # Log the exception (for debugging) and return a server error
-        print(f"Error occurred: {str(e)}")  # For debugging; remove in production
+        # Log the exception and return a server error
+        logger.exception(f"Registration error: {str(e)}")
         return jsonify({'success': False, 'message': "Internal server error. Please try again later."}), 500
 
+# Route to register many helpers at once (JSON array, NDJSON or CSV)
+@bp.route('/register_users/bulk', methods=['POST'])
+def register_users_bulk():
+    try:
+        rows = iter_upload_rows(request)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    def add_to_registry(inserted):
+        for helper_id, name, email, latitude, longitude in inserted:
+            services().registry.upsert({'id': helper_id, 'name': name, 'email': email,
+                                    'latitude': latitude, 'longitude': longitude, 'is_active': True})
+
+    chunk_size = request.args.get('chunk_size', '1000')
+    try:
+        chunk_size = int(chunk_size)
+    except ValueError:
+        chunk_size = 0
+    if not 1 <= chunk_size <= 10000:
+        return jsonify({'success': False, 'message': "'chunk_size' must be an integer between 1 and 10000"}), 400
+    registration = BulkRegistration(db.session, RegisteredUser, chunk_size=chunk_size,
+                                    on_inserted=add_to_registry)
+    try:
+        summary = registration.run(rows)
+    except ValueError as e:
+        # Malformed upload body; rows from earlier chunks stay committed
+        summary = registration.summary(0)
+        return jsonify({'success': False, 'message': f"Malformed upload: {str(e)}", **summary}), 400
+    except Exception as e:
+        logger.error(f"Bulk registration error: {str(e)}")
+        return jsonify({'success': False, 'message': "Internal server error. Please try again later.",
+                        'inserted': registration.inserted}), 500
+
+    status = 201 if summary['inserted'] else 200
+    return jsonify({'success': True, **summary}), status
+
 # Route to display helpers
-@app.route('/view_helpers')
+@bp.route('/view_helpers')
 def view_helpers():
     helpers = Helper.query.all()
     return render_template('helpers.html', helpers=helpers)
 
 if __name__ == '__main__':
+    app = create_app()
+    init_db(app)
+    app.extensions['sos'].start_outbox_workers()
     app.run(debug=True,port=5000)
\ No newline at end of file
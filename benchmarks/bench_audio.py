@@ -0,0 +1,80 @@
+"""Alarm audio delivery: bytes and latency for first and repeat visits.
+
+Renders the index page to find the fingerprinted <source> URLs, then times
+the requests a browser makes for each format: the first full download, the
+open-ended range <audio> sends (bytes=0-), a seek (bytes=N-) and the
+If-None-Match revalidation of /audio-file. Fingerprinted URLs are cached as
+immutable, so a repeat visit normally makes no request at all.
+
+    python benchmarks/bench_audio.py [--requests 200]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report import emit, header, summarize  # noqa: E402
+
+
+def timed(client, url, count, headers=None):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers or {})
+        response.get_data()
+        samples.append(time.perf_counter() - start)
+    return response, summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    import app
+
+    report = header('audio', requests=args.requests)
+    with tempfile.TemporaryDirectory() as workdir:
+        server = app.create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(workdir, "users.db")}',
+            'SOS_OUTBOX_PATH': os.path.join(workdir, 'outbox.db'),
+        })
+        client = server.test_client()
+        start = time.perf_counter()
+        page = client.get('/').get_data(as_text=True)
+        report['first_render_with_hashing_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        sources = re.findall(r'<source src="([^"]+)" type="([^"]+)"', page)
+
+        for url, mimetype in sources:
+            full, full_times = timed(client, url, args.requests)
+            size = len(full.data)
+            _, open_range = timed(client, url, args.requests, {'Range': 'bytes=0-'})
+            _, seek = timed(client, url, args.requests, {'Range': f'bytes={size // 2}-'})
+            revalidated, revalidate = timed(client, url, args.requests, {'If-None-Match': full.headers['ETag']})
+            report[mimetype] = {
+                'url': url,
+                'bytes': size,
+                'cache_control': full.headers.get('Cache-Control'),
+                'full': full_times,
+                'range_from_start': open_range,
+                'seek_to_middle': seek,
+                'revalidate': {**revalidate, 'status': revalidated.status_code,
+                               'bytes': len(revalidated.data)},
+            }
+
+        negotiated = client.get('/audio-file', headers={'Accept': '*/*'})
+        _, revalidate = timed(client, '/audio-file', args.requests,
+                              {'Accept': '*/*', 'If-None-Match': negotiated.headers['ETag']})
+        report['audio_file'] = {'mimetype': negotiated.mimetype, 'vary': negotiated.headers.get('Vary'),
+                                'revalidate': revalidate}
+    emit(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
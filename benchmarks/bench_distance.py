@@ -0,0 +1,86 @@
+"""Batch haversine vs. the scalar calculate_distance.
+
+Checks that distance.haversine_batch (NumPy and pure-Python paths) agrees with
+app.calculate_distance, then times all three at 1k/100k/1M helpers.
+
+    python benchmarks/bench_distance.py [--sizes 1000,100000,1000000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import distance  # noqa: E402
+from app import calculate_distance  # noqa: E402
+
+ORIGIN = (9.505855, 76.549324)
+
+
+def make_points(n, seed=42):
+    rng = random.Random(seed)
+    lats = [rng.uniform(-89.0, 89.0) for _ in range(n)]
+    lons = [rng.uniform(-180.0, 180.0) for _ in range(n)]
+    return lats, lons
+
+
+def check_correctness(n=20000, tolerance_km=1e-6):
+    lats, lons = make_points(n, seed=7)
+    # Include the origin itself, its antipode and the poles
+    lats += [ORIGIN[0], -ORIGIN[0], 90.0, -90.0]
+    lons += [ORIGIN[1], ORIGIN[1] - 180.0, 0.0, 0.0]
+    expected = [calculate_distance(ORIGIN[0], ORIGIN[1], a, b) for a, b in zip(lats, lons)]
+
+    paths = {'python': distance._haversine_python}
+    if distance.np is not None:
+        paths['numpy'] = distance._haversine_numpy
+
+    for name, fn in paths.items():
+        got = list(fn(ORIGIN[0], ORIGIN[1], lats, lons))
+        worst = max(abs(a - b) for a, b in zip(expected, got))
+        if worst > tolerance_km:
+            raise AssertionError(f"{name} batch differs from calculate_distance by {worst} km")
+        print(f"correctness {name}: max abs error {worst:.3e} km over {len(lats)} points")
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes, repeat):
+    results = []
+    for n in sizes:
+        lats, lons = make_points(n)
+        row = {'helpers': n}
+        row['scalar_s'] = best_of(
+            lambda: [calculate_distance(ORIGIN[0], ORIGIN[1], a, b) for a, b in zip(lats, lons)],
+            1 if n >= 1000000 else repeat)
+        row['python_batch_s'] = best_of(
+            lambda: distance._haversine_python(ORIGIN[0], ORIGIN[1], lats, lons),
+            1 if n >= 1000000 else repeat)
+        if distance.np is not None:
+            np_lats = distance.np.asarray(lats)
+            np_lons = distance.np.asarray(lons)
+            row['numpy_batch_s'] = best_of(
+                lambda: distance._haversine_numpy(ORIGIN[0], ORIGIN[1], np_lats, np_lons), repeat)
+        results.append(row)
+        print(json.dumps(row))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    check_correctness()
+    run([int(s) for s in args.sizes.split(',')], args.repeat)
@@ -0,0 +1,128 @@
+"""Cost of /helper_location pings, batched versus one commit per ping.
+
+Seeds synthetic helpers, then sends position pings through the Flask test
+client from several threads - a compressed version of every helper pinging
+every 30 s. Reports request latency and how many database transactions the
+pings turned into, then times the same pings written one commit each, as a
+naive endpoint would. Also checks that a moved helper is found at the new
+position before anything is flushed.
+
+    python benchmarks/bench_helper_location.py [--helpers 10000] [--pings 30000] [--threads 8]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from report import emit, header, summarize  # noqa: E402
+from synthetic import helpers  # noqa: E402
+
+
+def build_app(workdir, flush_interval):
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    import app
+    server = app.create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(workdir, "users.db")}',
+        'SOS_OUTBOX_PATH': os.path.join(workdir, 'outbox.db'),
+        'GEOCODE_CACHE_PATH': os.path.join(workdir, 'geocode_cache.db'),
+        'HELPER_TOKEN_KEY_PATH': os.path.join(workdir, 'helper_token.key'),
+        'HELPER_LOCATION_FLUSH_INTERVAL': flush_interval,
+    })
+    app.init_db(server)
+    return app, server
+
+
+def ping_thread(client, rows, tokens, count, seed, samples):
+    rng = random.Random(seed)
+    for _ in range(count):
+        row = rng.choice(rows)
+        body = {'id': row['id'], 'token': tokens[row['id']],
+                'latitude': row['latitude'] + rng.uniform(-0.002, 0.002),
+                'longitude': row['longitude'] + rng.uniform(-0.002, 0.002)}
+        start = time.perf_counter()
+        response = client.post('/helper_location', json=body)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 202, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--helpers', type=int, default=10000)
+    parser.add_argument('--pings', type=int, default=30000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--flush-interval', type=float, default=2.0)
+    parser.add_argument('--naive-pings', type=int, default=2000)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    report = header('helper_location', helpers=args.helpers, pings=args.pings, threads=args.threads,
+                    flush_interval=args.flush_interval)
+    with tempfile.TemporaryDirectory() as workdir:
+        app, server = build_app(workdir, args.flush_interval)
+        client = server.test_client()
+        body = ''.join(f'{{"name": "{r["name"]}", "email": "{r["email"]}", "latitude": {r["latitude"]}, '
+                       f'"longitude": {r["longitude"]}}}\n' for r in helpers(args.helpers))
+        client.post('/register_users/bulk', data=body, content_type='application/x-ndjson')
+        sos = server.extensions['sos']
+        with server.app_context():
+            rows = app.get_helper_registry().all()
+        # The tokens /register_user hands each device
+        tokens = {row['id']: sos.helper_token(row['id'], row['email']) for row in rows}
+
+        # Fresh positions are visible to lookups before any flush
+        probe = rows[0]
+        client.post('/helper_location', json={'id': probe['id'], 'token': tokens[probe['id']],
+                                              'latitude': 0.5, 'longitude': 0.5})
+        with server.app_context():
+            found = [h['id'] for h in app.get_nearby_helpers(0.5, 0.5, radius=1)]
+        report['moved_helper_found_before_flush'] = probe['id'] in found
+
+        samples = []
+        per_thread = args.pings // args.threads
+        threads = [threading.Thread(target=ping_thread, args=(client, rows, tokens, per_thread, i, samples))
+                   for i in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        flushed_in_run = sos.helper_locations.flushes
+        sos.helper_locations.flush()
+        stats = sos.helper_locations.stats()
+        report['batched'] = {
+            **summarize(samples, elapsed),
+            'transactions': flushed_in_run + 1,
+            'rows_written': stats['flushed'],
+            'coalesced': stats['coalesced'],
+        }
+
+        # Baseline: the same kind of ping as one UPDATE + COMMIT each
+        rng = random.Random(99)
+        with server.app_context():
+            engine = app.db.engine
+        start = time.perf_counter()
+        for _ in range(args.naive_pings):
+            row = rng.choice(rows)
+            with engine.begin() as conn:
+                conn.execute(text('UPDATE registered_user SET latitude = :lat, longitude = :lon, '
+                                  'location_updated_at = :at WHERE id = :id'),
+                             {'id': row['id'], 'lat': row['latitude'], 'lon': row['longitude'], 'at': time.time()})
+        naive = time.perf_counter() - start
+        report['one_commit_per_ping'] = {
+            'pings': args.naive_pings,
+            'ms_per_ping': round(naive / args.naive_pings * 1000, 3),
+            'max_pings_per_s': round(args.naive_pings / naive, 1),
+        }
+    emit(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
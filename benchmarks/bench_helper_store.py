@@ -0,0 +1,102 @@
+"""Memory per helper and scan time: dict rows + GridIndex vs. HelperStore.
+
+The "dicts" layout is what HelperRegistry held before the struct-of-arrays
+store: one dict per helper plus a GridIndex entry pointing at it.
+
+    python benchmarks/bench_helper_store.py [--helpers 1000000]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo_index import GridIndex  # noqa: E402
+from helper_store import HelperStore  # noqa: E402
+from distance import within_radius  # noqa: E402
+
+FIRST_NAMES = ['Anandhu', 'Arjun', 'Devika', 'Fathima', 'Gokul', 'Lakshmi', 'Meera', 'Rahul', 'Sneha', 'Vishnu']
+
+
+def make_helpers(n, seed=42):
+    # Helpers spread over Kerala, roughly 8.2-12.8 N, 74.8-77.4 E
+    rng = random.Random(seed)
+    for i in range(1, n + 1):
+        yield (i, rng.uniform(8.2, 12.8), rng.uniform(74.8, 77.4),
+               rng.choice(FIRST_NAMES), f'helper{i}@example.org')
+
+
+def build_dicts(n):
+    helpers = {}
+    grid = GridIndex()
+    for helper_id, lat, lon, name, email in make_helpers(n):
+        row = {'id': helper_id, 'name': name, 'email': email,
+               'latitude': lat, 'longitude': lon, 'is_active': True}
+        helpers[helper_id] = row
+        grid.insert(helper_id, lat, lon, row)
+    return helpers, grid
+
+
+def build_store(n):
+    store = HelperStore()
+    for helper_id, lat, lon, name, email in make_helpers(n):
+        store.append(helper_id, lat, lon, name, email)
+    return store
+
+
+def measure(build, n):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    built = build(n)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built, size, elapsed
+
+
+def time_scans(scan, repeat=20):
+    rng = random.Random(1)
+    points = [(rng.uniform(8.5, 12.5), rng.uniform(75.0, 77.0)) for _ in range(repeat)]
+    start = time.perf_counter()
+    for lat, lon in points:
+        scan(lat, lon)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--helpers', type=int, default=1000000)
+    parser.add_argument('--radius', type=float, default=10.0)
+    args = parser.parse_args()
+    n = args.helpers
+
+    (helpers, grid), dict_bytes, dict_build = measure(build_dicts, n)
+
+    def dict_scan(lat, lon):
+        candidates = grid.candidates(lat, lon, args.radius)
+        return within_radius(lat, lon, [c[1] for c in candidates], [c[2] for c in candidates], args.radius)
+
+    dict_scan_s = time_scans(dict_scan)
+    del helpers, grid
+    gc.collect()
+
+    store, store_bytes, store_build = measure(build_store, n)
+    store_scan_s = time_scans(lambda lat, lon: store.nearby(lat, lon, args.radius))
+
+    print(json.dumps({
+        'helpers': n,
+        'dicts': {'bytes_per_helper': round(dict_bytes / n, 1), 'build_s': round(dict_build, 3),
+                  'scan_ms': round(dict_scan_s * 1000, 3)},
+        'store': {'bytes_per_helper': round(store_bytes / n, 1), 'build_s': round(store_build, 3),
+                  'scan_ms': round(store_scan_s * 1000, 3)}
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Incident log: append cost and indexed time/region queries at scale.
+
+Writes ``--incidents`` synthetic SOS records spread over ``--days`` days,
+times single appends as /send_sos makes them, then runs time-window,
+region and combined queries. The same queries are run as a full scan of
+every record for comparison. Also reports how long a new process takes to
+open the log (index from sidecar files vs. rebuilt) and the peak memory of
+a query, which streams instead of loading segments.
+
+    python benchmarks/bench_incident_log.py [--incidents 2000000] [--days 30]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo_index import bounding_box  # noqa: E402
+from incident_log import RECORD, IncidentLog, cover_cells, decode, pack_incident  # noqa: E402
+from report import emit, header, summarize  # noqa: E402
+from synthetic import random_points  # noqa: E402
+
+STAGES = {'registry_sync': 0.0002, 'helper_search': 0.0011, 'outbox_enqueue': 0.0031, 'total': 0.0052}
+
+
+def fill(log, count, start, days, batch=5000):
+    # Times increase with some jitter, as with several writer processes
+    rng = random.Random(11)
+    step = days * 86400 / count
+    records = []
+    for i, (lat, lon) in enumerate(random_points(count, seed=21)):
+        ts = start + i * step + rng.uniform(-2, 2)
+        records.append(pack_incident({'latitude': lat, 'longitude': lon}, os.urandom(16).hex(),
+                                     rng.randint(0, 40), rng.randint(0, 10), ts=ts, radius=10.0, stages=STAGES))
+        if len(records) == batch:
+            log.append(*records)
+            records = []
+    if records:
+        log.append(*records)
+
+
+def full_scan(log, start=None, end=None, bbox=None):
+    # Reads and filters every record, decoding matches as query() does;
+    # what answering a query without the indexes costs
+    count = 0
+    for number in log.segment_numbers():
+        with open(os.path.join(log.directory, f'incidents-{number:06d}.log'), 'rb') as f:
+            while True:
+                data = f.read(RECORD.size * 4096)
+                if not data:
+                    break
+                for fields in RECORD.iter_unpack(data):
+                    if start is not None and not start <= fields[0] < end:
+                        continue
+                    if bbox is not None:
+                        lat, lon = fields[2] / 1e6, fields[3] / 1e6
+                        if not (bbox[0] <= lat <= bbox[2] and bbox[1] <= lon <= bbox[3]):
+                            continue
+                    decode(fields)
+                    count += 1
+    return count
+
+
+def blocks_read(log, start=None, end=None, bbox=None):
+    cells = cover_cells(bbox) if bbox is not None else None
+    segments = [log._segment_index(number) for number in log.segment_numbers()]
+    return (sum(len(segment.blocks(start, end, cells)) for segment in segments),
+            sum(len(segment.min_ts) for segment in segments))
+
+
+def timed_query(log, repeat, **params):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = sum(1 for _ in log.query(**params))
+        samples.append(time.perf_counter() - started)
+    return count, summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=2000000)
+    parser.add_argument('--days', type=float, default=30)
+    parser.add_argument('--segment-records', type=int, default=500000)
+    parser.add_argument('--appends', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    report = header('incident_log', incidents=args.incidents, days=args.days,
+                    segment_records=args.segment_records)
+    start = 1700000000.0
+    with tempfile.TemporaryDirectory() as workdir:
+        log = IncidentLog(workdir, segment_records=args.segment_records)
+        started = time.perf_counter()
+        fill(log, args.incidents, start, args.days)
+        report['fill_s'] = round(time.perf_counter() - started, 2)
+        report['bytes_per_incident'] = RECORD.size
+        report['log_mb'] = round(args.incidents * RECORD.size / 1e6, 1)
+
+        # One record per call, as the SOS routes write them
+        samples = []
+        location = {'latitude': 9.9312, 'longitude': 76.2673}
+        for _ in range(args.appends):
+            t = time.perf_counter()
+            log.append(pack_incident(location, os.urandom(16).hex(), 12, 5, stale=7, radius=10.0, stages=STAGES))
+            samples.append(time.perf_counter() - t)
+        report['append'] = summarize(samples)
+
+        # The first query builds the indexes (and saves them for sealed
+        # segments); one starting after the last incident reads no blocks
+        after_all = start + 2 * args.days * 86400
+        started = time.perf_counter()
+        sum(1 for _ in log.query(start=after_all))
+        report['index_build_s'] = round(time.perf_counter() - started, 2)
+        reopened = IncidentLog(workdir, segment_records=args.segment_records)
+        started = time.perf_counter()
+        sum(1 for _ in reopened.query(start=after_all))
+        report['index_load_s'] = round(time.perf_counter() - started, 2)
+
+        hour = (start + 10 * 86400, start + 10 * 86400 + 3600)
+        day = (start + 12 * 86400, start + 13 * 86400)
+        kochi = bounding_box(9.9312, 76.2673, 5)
+        queries = {
+            'one_hour': {'start': hour[0], 'end': hour[1]},
+            'kochi_5km_all_time': {'bbox': kochi},
+            'rural_5km_all_time': {'bbox': bounding_box(11.0, 76.9, 5)},
+            'kochi_5km_one_day': {'start': day[0], 'end': day[1], 'bbox': kochi},
+        }
+        report['queries'] = {}
+        for name, params in queries.items():
+            count, indexed = timed_query(log, args.repeat, **params)
+            read, total = blocks_read(log, params.get('start'), params.get('end'), params.get('bbox'))
+            started = time.perf_counter()
+            scanned = full_scan(log, params.get('start'), params.get('end'), params.get('bbox'))
+            report['queries'][name] = {'matches': count, 'indexed': indexed,
+                                       'blocks_read': read, 'blocks_total': total,
+                                       'full_scan_ms': round((time.perf_counter() - started) * 1000, 1),
+                                       'full_scan_matches': scanned}
+
+        tracemalloc.start()
+        count = sum(1 for _ in log.query(bbox=kochi))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report['streaming_query_peak_kb'] = round(peak / 1024, 1)
+        log.close()
+    emit(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Fan-out latency of live SOS locations through LiveTracker.
+
+Publishers post positions to a set of incidents while subscriber threads
+read them, as the SSE route does. Reports publish cost, publish-to-receive
+latency and how many points the deliberately slow subscribers skipped.
+Two trackers share one outbox file to cover delivery to another server
+process, which goes through the tailer's poll.
+
+    python benchmarks/bench_live.py [--incidents 20] [--subscribers 200] [--rate 50] [--duration 10]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from live_tracking import LiveTracker  # noqa: E402
+from outbox import Outbox  # noqa: E402
+from report import emit, header, summarize  # noqa: E402
+
+
+def subscriber_loop(tracker, job_id, latencies, deadline, delay):
+    subscriber = tracker.subscribe(job_id)
+    skipped = 0
+    try:
+        while time.monotonic() < deadline:
+            points, dropped = subscriber.get(0.5)
+            # recorded_at is stamped just before the row is written
+            now = time.time()
+            skipped += dropped
+            for point in points:
+                latencies.append(now - point['recorded_at'])
+            if delay:
+                time.sleep(delay)
+    finally:
+        tracker.unsubscribe(subscriber)
+    return skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=20)
+    parser.add_argument('--subscribers', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=50, help='Positions published per second, all incidents')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--slow-share', type=float, default=0.1,
+                        help='Share of subscribers that take 2 s per read')
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        outbox = Outbox(os.path.join(workdir, 'outbox.db'))
+        jobs = [outbox.enqueue({'latitude': 9.9, 'longitude': 76.3}, []) for _ in range(args.incidents)]
+        # `local` shares the publisher's process; `remote` stands for another worker
+        trackers = {'local': LiveTracker(outbox, max_subscribers=args.subscribers),
+                    'remote': LiveTracker(Outbox(os.path.join(workdir, 'outbox.db')),
+                                          max_subscribers=args.subscribers)}
+        latencies = {'local': [], 'remote': [], 'slow': []}
+        skipped = []
+        deadline = time.monotonic() + args.duration
+        rng = random.Random(5)
+
+        threads = []
+        for i in range(args.subscribers):
+            slow = i < args.subscribers * args.slow_share
+            side = 'remote' if i % 2 else 'local'
+            bucket = latencies['slow' if slow else side]
+            thread = threading.Thread(target=lambda *a: skipped.append(subscriber_loop(*a)), daemon=True, args=(
+                trackers[side], jobs[i % len(jobs)], bucket, deadline, 2.0 if slow else 0))
+            thread.start()
+            threads.append(thread)
+        time.sleep(0.5)
+
+        publish = []
+        interval = 1.0 / args.rate
+        next_at = time.monotonic()
+        while time.monotonic() < deadline - 1:
+            job_id = rng.choice(jobs)
+            start = time.perf_counter()
+            trackers['local'].publish(job_id, [{'latitude': 9.9 + rng.random() / 100,
+                                                'longitude': 76.3 + rng.random() / 100}])
+            publish.append(time.perf_counter() - start)
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.monotonic()))
+        for thread in threads:
+            thread.join()
+
+    report = header('live', incidents=args.incidents, subscribers=args.subscribers, rate=args.rate,
+                    duration_s=args.duration, slow_share=args.slow_share)
+    report['publish'] = summarize(publish)
+    report['delivery'] = {name: summarize(samples) for name, samples in latencies.items()}
+    report['skipped_by_slow_subscribers'] = sum(skipped)
+    report['trackers'] = {name: tracker.stats() for name, tracker in trackers.items()}
+    emit(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Micro-benchmarks for calculate_distance and get_nearby_helpers.
+
+get_nearby_helpers runs against the app's in-memory registry filled with
+synthetic helpers (see synthetic.py). The app is created with its database,
+outbox and geocode cache in a temporary directory.
+
+    python benchmarks/bench_nearby.py [--sizes 1000,10000,100000,1000000] [--out report.json]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report import emit, header, summarize  # noqa: E402
+from synthetic import helpers, incidents  # noqa: E402
+
+
+def build_app(workdir, log_level):
+    os.environ['LOG_LEVEL'] = log_level
+    import app
+    server = app.create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(workdir, "users.db")}',
+        'SOS_OUTBOX_PATH': os.path.join(workdir, 'outbox.db'),
+        'GEOCODE_CACHE_PATH': os.path.join(workdir, 'geocode_cache.db'),
+        # Registry is filled directly below; keep it from re-reading the DB
+        'HELPER_REGISTRY_CHECK_INTERVAL': 1e9,
+    })
+    app.init_db(server)
+    return app, server
+
+
+def bench_calculate_distance(app, calls):
+    rng = random.Random(3)
+    points = [(rng.uniform(8.2, 12.8), rng.uniform(74.8, 77.4)) for _ in range(calls)]
+    start = time.perf_counter()
+    for lat, lon in points:
+        app.calculate_distance(9.5, 76.5, lat, lon)
+    elapsed = time.perf_counter() - start
+    return {'calls': calls, 'ns_per_call': round(elapsed / calls * 1e9, 1)}
+
+
+def bench_nearby(app, size, queries, radius, k):
+    registry = app.get_helper_registry()
+    registry.store.clear()
+    for i, row in enumerate(helpers(size), start=1):
+        registry.store.append(i, row['latitude'], row['longitude'], row['name'], row['email'])
+
+    results = {}
+    points = incidents(queries)
+    for mode, k_value in (('radius', None), ('k_nearest', k)):
+        samples = []
+        matched = 0
+        for point in points:
+            start = time.perf_counter()
+            found = app.get_nearby_helpers(point['latitude'], point['longitude'], radius=radius, k=k_value,
+                                           prefer_present=False)
+            samples.append(time.perf_counter() - start)
+            matched += len(found)
+        results[mode] = {**summarize(samples), 'mean_matched': round(matched / len(points), 1)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--radius', type=float, default=10.0)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--out')
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app, server = build_app(workdir, args.log_level)
+        report = header('nearby', sizes=sizes, queries=args.queries, radius_km=args.radius, k=args.k)
+        report['calculate_distance'] = bench_calculate_distance(app, 200000)
+        with server.app_context():
+            report['get_nearby_helpers'] = {
+                str(size): bench_nearby(app, size, args.queries, args.radius, args.k) for size in sizes
+            }
+    emit(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
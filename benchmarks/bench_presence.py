@@ -0,0 +1,122 @@
+"""SOS fan-out with and without preferring present helpers, plus PresenceSet costs.
+
+Fills a HelperRegistry with synthetic helpers of which ``--present-share``
+have sent a recent heartbeat, then runs the /send_sos searches (radius and
+k-nearest) both ways. Reports how many notifications (and how many to
+stale helpers) the presence check avoided, how often it fell back to stale helpers and what it adds to search
+time. Also times heartbeats and the expiry of a whole TTL's worth of them.
+
+    python benchmarks/bench_presence.py [--helpers 100000] [--present-share 0.2] [--incidents 500]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper_registry import HelperRegistry  # noqa: E402
+from presence import PresenceSet  # noqa: E402
+from report import emit, header, summarize  # noqa: E402
+from synthetic import helpers, incidents  # noqa: E402
+
+
+def build_registry(n, present_share, ttl, seed=3):
+    rng = random.Random(seed)
+    presence = PresenceSet(ttl=ttl)
+    registry = HelperRegistry(presence=presence)
+    now = time.time()
+    for helper_id, row in enumerate(helpers(n), start=1):
+        registry.store.append(helper_id, row['latitude'], row['longitude'], row['name'], row['email'])
+        if rng.random() < present_share:
+            presence.beat(helper_id, now - rng.uniform(0, ttl / 2))
+    return registry
+
+
+def run_searches(registry, points, search):
+    samples, notified, stale_notified, skipped, with_stale = [], 0, 0, 0, 0
+    for point in points:
+        start = time.perf_counter()
+        matches, stale_skipped = search(point['latitude'], point['longitude'])
+        samples.append(time.perf_counter() - start)
+        notified += len(matches)
+        skipped += stale_skipped
+        # Presence-aware searches only hand out stale helpers as a fallback
+        stale = sum(1 for helper, _ in matches if helper['id'] not in registry.presence)
+        stale_notified += stale
+        with_stale += bool(stale)
+    return {'search': summarize(samples), 'notified': notified, 'stale_notified': stale_notified,
+            'stale_skipped': skipped, 'searches_with_stale': with_stale}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--helpers', type=int, default=100000)
+    parser.add_argument('--present-share', type=float, default=0.2)
+    parser.add_argument('--incidents', type=int, default=500)
+    parser.add_argument('--radius', type=float, default=10)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--minimum', type=int, default=3)
+    parser.add_argument('--ttl', type=float, default=300)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    report = header('presence', helpers=args.helpers, present_share=args.present_share, incidents=args.incidents,
+                    radius=args.radius, k=args.k, minimum=args.minimum, ttl=args.ttl)
+    registry = build_registry(args.helpers, args.present_share, args.ttl)
+    report['present'] = len(registry.presence)
+    points = incidents(args.incidents)
+
+    def everyone(lat, lon):
+        return registry.nearby(lat, lon, args.radius)[0], 0
+
+    def present(lat, lon):
+        return registry.nearby_present(lat, lon, args.radius, args.minimum)[:2]
+
+    def k_everyone(lat, lon):
+        return registry.nearest(lat, lon, args.k, args.radius * 5)[0], 0
+
+    def k_present(lat, lon):
+        return registry.nearest_present(lat, lon, args.k, args.radius * 5, args.minimum)[:2]
+
+    report['radius'] = {'all_helpers': run_searches(registry, points, everyone),
+                        'present_first': run_searches(registry, points, present)}
+    report['k_nearest'] = {'all_helpers': run_searches(registry, points, k_everyone),
+                           'present_first': run_searches(registry, points, k_present)}
+    for mode in ('radius', 'k_nearest'):
+        # k-nearest sends as many messages either way, but to present helpers
+        before, after = report[mode]['all_helpers'], report[mode]['present_first']
+        report[mode]['sends_avoided'] = before['notified'] - after['notified']
+        report[mode]['stale_sends_avoided'] = before['stale_notified'] - after['stale_notified']
+
+    # Heartbeat cost with every helper beating once, then expiry of them all
+    presence = PresenceSet(ttl=1.0)
+    ids = list(range(1, args.helpers + 1))
+    random.Random(9).shuffle(ids)
+    start = time.perf_counter()
+    for helper_id in ids:
+        presence.beat(helper_id)
+    beat_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for helper_id in ids:
+        presence.beat(helper_id)
+    rebeat_s = time.perf_counter() - start
+    heap_entries = len(presence._heap)
+    time.sleep(1.1)
+    start = time.perf_counter()
+    presence.expire()
+    expire_s = time.perf_counter() - start
+    report['presence_set'] = {
+        'first_beat_us': round(beat_s / len(ids) * 1e6, 3),
+        'repeat_beat_us': round(rebeat_s / len(ids) * 1e6, 3),
+        'heap_entries_after_repeats': heap_entries,
+        'expire_all_ms': round(expire_s * 1000, 3),
+        'expired': presence.expired,
+        'left': len(presence),
+    }
+    emit(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Many simultaneous incidents: per-incident scans vs. one batched assignment.
+
+Compares, for the same helpers and incidents:
+
+* scalar   - the original /send_sos path: every helper through the scalar
+             distance function, per incident (timed on a sample, extrapolated)
+* indexed  - HelperStore.nearby once per incident, no per-helper cap
+* batch    - sos_batch.assign_helpers with the per-helper cap, plus queueing
+             every incident in one outbox transaction
+
+    python benchmarks/bench_sos_batch.py [--incidents 1000] [--helpers 100000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper_store import HelperStore  # noqa: E402
+from outbox import Outbox  # noqa: E402
+from sos_batch import _assign_python, assign_helpers  # noqa: E402
+
+# Flood-affected district: helpers and incidents packed into about 1 x 1 degree
+REGION = (9.4, 10.4, 76.2, 77.2)
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    # Same formula as app.calculate_distance, without importing the app
+    from math import radians, sin, cos, sqrt, atan2
+    lat1, lon1, lat2, lon2 = map(radians, [float(lat1), float(lon1), float(lat2), float(lon2)])
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def random_points(n, seed):
+    rng = random.Random(seed)
+    return [(rng.uniform(REGION[0], REGION[1]), rng.uniform(REGION[2], REGION[3])) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=1000)
+    parser.add_argument('--helpers', type=int, default=100000)
+    parser.add_argument('--radius', type=float, default=10.0)
+    parser.add_argument('--cap', type=int, default=1)
+    parser.add_argument('--scalar-sample', type=int, default=5)
+    args = parser.parse_args()
+
+    helpers = random_points(args.helpers, 42)
+    store = HelperStore()
+    for i, (lat, lon) in enumerate(helpers, start=1):
+        store.append(i, lat, lon, 'Helper', f'helper{i}@example.org')
+    incidents = random_points(args.incidents, 7)
+
+    # Original path, extrapolated from a sample of incidents
+    sample = incidents[:args.scalar_sample]
+    start = time.perf_counter()
+    for lat, lon in sample:
+        [h for h in helpers if calculate_distance(lat, lon, h[0], h[1]) <= args.radius]
+    scalar_s = (time.perf_counter() - start) / len(sample) * len(incidents)
+
+    start = time.perf_counter()
+    indexed_notifications = sum(len(store.nearby(lat, lon, args.radius)[0]) for lat, lon in incidents)
+    indexed_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assigned, found, scanned = assign_helpers(store, incidents, args.radius, args.cap)
+    assign_s = time.perf_counter() - start
+
+    # Correctness: cap respected, every in-range helper used, and the
+    # pure-Python assignment agrees
+    per_helper = Counter(slot for matches in assigned for slot, _ in matches)
+    assert max(per_helper.values(), default=0) <= args.cap
+    python_assigned, python_found, _ = _assign_python(store, incidents, args.radius, args.cap)
+    assert python_found == list(found)
+    assert sorted(len(m) for m in python_assigned) == sorted(len(m) for m in assigned)
+    assert sum(map(len, python_assigned)) == sum(map(len, assigned))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = Outbox(os.path.join(tmp, 'outbox.db'))
+        jobs = [
+            ({'latitude': lat, 'longitude': lon},
+             [{'id': store.ids[slot], 'email': store.emails[slot], 'distance': round(d, 2)} for slot, d in matches])
+            for (lat, lon), matches in zip(incidents, assigned)
+        ]
+        start = time.perf_counter()
+        outbox.enqueue_many(jobs)
+        enqueue_s = time.perf_counter() - start
+
+    notified = sum(map(len, assigned))
+    print(json.dumps({
+        'incidents': args.incidents,
+        'helpers': args.helpers,
+        'radius_km': args.radius,
+        'per_helper_cap': args.cap,
+        'scalar': {'seconds_estimated': round(scalar_s, 2), 'notifications': indexed_notifications},
+        'indexed': {'seconds': round(indexed_s, 3), 'notifications': indexed_notifications,
+                    'max_per_helper': None},
+        'batch': {'assign_seconds': round(assign_s, 3), 'enqueue_seconds': round(enqueue_s, 3),
+                  'helpers_scanned': scanned, 'pairs_in_range': int(sum(found)),
+                  'notifications': notified, 'max_per_helper': max(per_helper.values(), default=0)}
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Cold-start cost of the app: import, create_app() and the first request.
+
+Each sample runs in a fresh interpreter. Also lists the slowest imports
+(from ``python -X importtime``) and checks that the geocoding and mail
+modules are still unloaded once the app exists. Exits non-zero when import +
+create_app exceeds --budget-ms at p50 or a deferred module was imported.
+
+    python benchmarks/bench_startup.py [--runs 10] [--budget-ms 800] [--out report.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from report import ROOT, emit, header, summarize
+
+# Only needed once a request geocodes or sends mail
+DEFERRED_MODULES = ('geopy', 'smtplib', 'email.mime', 'flask_mail')
+
+CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+server = app.create_app({
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(sys.argv[1], 'users.db'),
+    'SOS_OUTBOX_PATH': os.path.join(sys.argv[1], 'outbox.db'),
+    'GEOCODE_CACHE_PATH': os.path.join(sys.argv[1], 'geocode_cache.db'),
+})
+created = time.perf_counter()
+loaded = sorted(name for name in json.loads(sys.argv[2]) if name in sys.modules)
+app.init_db(server)
+initialized = time.perf_counter()
+status = server.test_client().get('/get_helpers').status_code
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - start, 'create_app': created - imported,
+    'init_db': initialized - created, 'first_request': served - initialized,
+    'status': status, 'deferred_loaded': loaded,
+}))
+"""
+
+
+def run_child(workdir):
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, workdir, json.dumps(DEFERRED_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, timeout=120,
+        env=dict(os.environ, LOG_LEVEL='WARNING')
+    )
+    if result.returncode:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit):
+    # -X importtime lines: "import time: self [us] | cumulative [us] | name",
+    # children listed before their parent and indented two spaces per level
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+        capture_output=True, text=True, timeout=120
+    )
+    children = []
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        name = parts[2].strip()
+        if depth == 0:
+            if name == 'app':
+                break
+            children = []
+        elif depth == 1:
+            children.append((int(parts[1]), name))
+    children.sort(reverse=True)
+    return [{'module': name, 'cumulative_ms': round(us / 1000, 1)} for us, name in children[:limit]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=800,
+                        help='p50 budget for import + create_app()')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            samples.append(run_child(workdir))
+
+    report = header('startup', runs=args.runs, budget_ms=args.budget_ms)
+    for phase in ('import', 'create_app', 'init_db', 'first_request'):
+        report[phase] = summarize([s[phase] for s in samples])
+    startup = summarize([s['import'] + s['create_app'] for s in samples])
+    loaded = sorted({name for s in samples for name in s['deferred_loaded']})
+    report['import_plus_create_app'] = startup
+    report['deferred_modules_loaded'] = loaded
+    report['first_request_status'] = sorted({s['status'] for s in samples})
+    report['slowest_imports'] = slowest_imports(args.top)
+    report['within_budget'] = startup['p50_ms'] <= args.budget_ms and not loaded
+    emit(report, args.out)
+    if not report['within_budget']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
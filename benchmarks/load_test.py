@@ -0,0 +1,254 @@
+"""End-to-end load test against a locally started SOS server.
+
+Starts the SMTP and Nominatim stand-ins (standins.py), runs the app in a
+subprocess (threaded dev server, or gunicorn with gunicorn.conf.py) with
+its database, outbox and caches in a temporary directory,
+seeds synthetic helpers through /register_users/bulk, then drives
+/send_sos, /get_helpers, /register_user and /get_location_info from
+concurrent clients. Prints per-endpoint p50/p95/p99 latency and throughput as
+JSON.
+
+    python benchmarks/load_test.py [--helpers 10000] [--concurrency 16] [--duration 30]
+        [--server dev|gunicorn] [--workers 2] [--threads 16]
+        [--mix send_sos=1,get_helpers=4,register_user=2,get_location_info=3] [--out report.json]
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+
+from report import ROOT, emit, header, summarize
+from standins import HTTPStandIn, SMTPStandIn
+from synthetic import AREAS, helpers, incidents
+
+SERVER = """
+import sys
+from app import create_app, init_db
+server = create_app()
+init_db(server)
+server.extensions['sos'].start_outbox_workers()
+server.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True, debug=False, use_reloader=False)
+"""
+DEFAULT_MIX = 'send_sos=1,get_helpers=4,register_user=2,get_location_info=3'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(server, port, workers, threads):
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+                '--workers', str(workers), '--threads', str(threads), 'wsgi:app']
+    return [sys.executable, '-c', SERVER, str(port)]
+
+
+def start_server(workdir, smtp, http, geocoder_rate, server='dev', workers=2, threads=16):
+    port = free_port()
+    env = dict(os.environ, **{
+        'DATABASE_URL': f'sqlite:///{os.path.join(workdir, "users.db")}',
+        'SOS_OUTBOX_PATH': os.path.join(workdir, 'outbox.db'),
+        'GEOCODE_CACHE_PATH': os.path.join(workdir, 'geocode_cache.db'),
+        'INCIDENT_LOG_DIR': os.path.join(workdir, 'incidents'),
+        'HELPER_TOKEN_KEY_PATH': os.path.join(workdir, 'helper_token.key'),
+        'MAIL_SERVER': '127.0.0.1',
+        'MAIL_PORT': str(smtp.port),
+        'MAIL_USE_TLS': 'false',
+        'EMAIL_USER': 'sos@example.org',
+        'EMAIL_PASSWORD': 'standin',
+        'GEOCODER_DOMAIN': f'127.0.0.1:{http.port}',
+        'GEOCODER_SCHEME': 'http',
+        'GEOCODER_RATE': str(geocoder_rate),
+        'GEOCODER_BURST': str(max(1, int(geocoder_rate))),
+        'GOOGLE_PLACES_URL': http.places_url,
+        'LOG_LEVEL': 'WARNING',
+    })
+    process = subprocess.Popen(
+        server_command(server, port, workers, threads), cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=open(os.path.join(workdir, 'server.log'), 'w')
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited early; see {workdir}/server.log")
+        try:
+            requests.get(f'{base_url}/metrics', timeout=1)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not start within 60 s")
+
+
+def seed(base_url, count, area):
+    body = ''.join(json.dumps(row) + '\n' for row in helpers(count, area))
+    start = time.perf_counter()
+    response = requests.post(f'{base_url}/register_users/bulk', data=body.encode('utf-8'),
+                             headers={'Content-Type': 'application/x-ndjson'}, timeout=600)
+    response.raise_for_status()
+    summary = response.json()
+    return {'inserted': summary.get('inserted'), 'seconds': round(time.perf_counter() - start, 3)}
+
+
+class Client(threading.Thread):
+    def __init__(self, index, base_url, operations, weights, deadline, points):
+        super().__init__(name=f'load-{index}', daemon=True)
+        self.index = index
+        self.base_url = base_url
+        self.operations = operations
+        self.weights = weights
+        self.deadline = deadline
+        self.points = points
+        self.rng = random.Random(index)
+        self.session = requests.Session()
+        self.samples = {name: [] for name in operations}
+        self.errors = {name: 0 for name in operations}
+        self.registered = 0
+        self.notifications_queued = 0
+
+    def point(self):
+        return self.rng.choice(self.points)
+
+    def send_sos(self):
+        response = self.session.post(f'{self.base_url}/send_sos', json={
+            'location': self.point(), 'clientId': uuid.uuid4().hex
+        }, timeout=30)
+        if response.status_code == 202:
+            self.notifications_queued += response.json().get('helpersAdded', 0)
+        return response
+
+    def get_helpers(self):
+        p = self.point()
+        return self.session.get(f'{self.base_url}/get_helpers', params={
+            'lat': p['latitude'], 'lng': p['longitude'], 'radius': 5, 'limit': 100
+        }, timeout=30)
+
+    def register_user(self):
+        self.registered += 1
+        p = self.point()
+        return self.session.post(f'{self.base_url}/register_user', json={
+            'name': f'Load {self.index}-{self.registered}',
+            'email': f'load{self.index}-{self.registered}-{uuid.uuid4().hex[:8]}@example.org',
+            'latitude': p['latitude'], 'longitude': p['longitude']
+        }, timeout=30)
+
+    def get_location_info(self):
+        # Three decimals (~100 m) so some lookups repeat and hit the cache
+        p = self.point()
+        return self.session.post(f'{self.base_url}/get_location_info', json={
+            'lat': round(p['latitude'], 3), 'lng': round(p['longitude'], 3)
+        }, timeout=30)
+
+    def run(self):
+        while time.monotonic() < self.deadline:
+            name = self.rng.choices(self.operations, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = getattr(self, name)().status_code < 400
+            except requests.RequestException:
+                ok = False
+            self.samples[name].append(time.perf_counter() - start)
+            if not ok:
+                self.errors[name] += 1
+
+
+def parse_mix(spec):
+    mix = {}
+    for item in spec.split(','):
+        name, _, weight = item.partition('=')
+        if float(weight or 0) > 0:
+            mix[name.strip()] = float(weight)
+    unknown = set(mix) - {'send_sos', 'get_helpers', 'register_user', 'get_location_info'}
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def wait_for_outbox(smtp, expected, timeout):
+    # Give the outbox workers a bounded time to drain queued notifications
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and smtp.counter.snapshot().get('messages', 0) < expected:
+        time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--helpers', type=int, default=10000)
+    parser.add_argument('--area', choices=sorted(AREAS), default='kerala')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--smtp-delay-ms', type=float, default=5)
+    parser.add_argument('--geocoder-delay-ms', type=float, default=50)
+    parser.add_argument('--geocoder-rate', type=float, default=50,
+                        help='Requests/s the app may send to the geocoder stand-in')
+    parser.add_argument('--drain-timeout', type=float, default=30)
+    parser.add_argument('--server', choices=['dev', 'gunicorn'], default='dev')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=16, help='threads per gunicorn worker')
+    parser.add_argument('--out')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    smtp = SMTPStandIn(delay_ms=args.smtp_delay_ms).start()
+    http = HTTPStandIn(delay_ms=args.geocoder_delay_ms).start()
+    report = header('load_test', helpers=args.helpers, area=args.area, concurrency=args.concurrency,
+                    duration_s=args.duration, mix=mix, smtp_delay_ms=args.smtp_delay_ms,
+                    geocoder_delay_ms=args.geocoder_delay_ms, geocoder_rate=args.geocoder_rate,
+                    server=args.server, workers=args.workers, threads=args.threads)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process, base_url = start_server(workdir, smtp, http, args.geocoder_rate,
+                                         args.server, args.workers, args.threads)
+        try:
+            report['seed'] = seed(base_url, args.helpers, args.area)
+            points = incidents(2000, args.area)
+            deadline = time.monotonic() + args.duration
+            clients = [Client(i, base_url, list(mix), list(mix.values()), deadline, points)
+                       for i in range(args.concurrency)]
+            start = time.perf_counter()
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            elapsed = time.perf_counter() - start
+
+            endpoints = {}
+            all_samples = []
+            for name in mix:
+                samples = [s for client in clients for s in client.samples[name]]
+                all_samples.extend(samples)
+                endpoints[name] = {**summarize(samples, elapsed),
+                                   'errors': sum(client.errors[name] for client in clients)}
+            report['endpoints'] = endpoints
+            report['overall'] = summarize(all_samples, elapsed)
+
+            queued = sum(client.notifications_queued for client in clients)
+            drain_start = time.perf_counter()
+            wait_for_outbox(smtp, queued, args.drain_timeout)
+            report['notifications'] = {
+                'queued': queued,
+                'delivered': smtp.counter.snapshot().get('messages', 0),
+                'drain_seconds': round(time.perf_counter() - drain_start, 3)
+            }
+            report['standins'] = {'smtp': smtp.counter.snapshot(), 'http': http.counter.snapshot()}
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    emit(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
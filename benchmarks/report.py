@@ -0,0 +1,63 @@
+"""Shared helpers for benchmark output: latency summaries and the run header."""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def summarize(samples, elapsed=None):
+    """p50/p95/p99/mean/max in milliseconds for latencies given in seconds."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    count = len(ordered)
+
+    def pick(q):
+        # Nearest-rank percentile
+        return round(ordered[min(count - 1, max(0, int(q * count + 0.5) - 1))] * 1000, 3)
+
+    summary = {
+        'count': count,
+        'p50_ms': pick(0.50),
+        'p95_ms': pick(0.95),
+        'p99_ms': pick(0.99),
+        'mean_ms': round(sum(ordered) / count * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+    if elapsed:
+        summary['throughput_rps'] = round(count / elapsed, 1)
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def header(name, **params):
+    # Identifies the run so reports from different commits can be diffed
+    return {
+        'benchmark': name,
+        'commit': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': params,
+    }
+
+
+def emit(report, path=None):
+    text = json.dumps(report, indent=2)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+    sys.stdout.flush()
@@ -0,0 +1,204 @@
+"""Local stand-ins for the external services the SOS app talks to.
+
+* SMTPStandIn     - accepts and counts messages (EHLO, AUTH PLAIN/LOGIN, no TLS)
+* HTTPStandIn     - Nominatim ``/reverse`` plus Google Places
+                    ``/nearbysearch/json`` and ``/details/json``
+
+Both add a configurable delay per request so upstream latency can be
+simulated. Running this file starts both and prints their addresses:
+
+    python benchmarks/standins.py [--smtp-port 2525] [--http-port 8089] [--delay-ms 20]
+"""
+import argparse
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _Counter:
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        self._reply('220 standin ESMTP ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self._reply('250-standin')
+                self._reply('250-AUTH PLAIN LOGIN')
+                self._reply('250 SIZE 10485760')
+            elif verb == 'HELO':
+                self._reply('250 standin')
+            elif verb == 'AUTH':
+                parts = command.split()
+                mechanism = parts[1].upper() if len(parts) > 1 else ''
+                if mechanism == 'PLAIN' and len(parts) < 3:
+                    self._reply('334 ')
+                    self.rfile.readline()
+                elif mechanism == 'LOGIN':
+                    for prompt in ('334 VXNlcm5hbWU6', '334 UGFzc3dvcmQ6'):
+                        self._reply(prompt)
+                        self.rfile.readline()
+                server.counter.inc('logins')
+                self._reply('235 Authentication successful')
+            elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                if server.delay:
+                    time.sleep(server.delay)
+                server.counter.inc('messages')
+                self._reply('250 OK queued')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, delay_ms=0):
+        super().__init__((host, port), _SMTPHandler)
+        self.delay = delay_ms / 1000.0
+        self.counter = _Counter()
+
+    def get_request(self):
+        request = super().get_request()
+        self.counter.inc('connections')
+        return request
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='smtp-standin', daemon=True).start()
+        return self
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if server.delay:
+            time.sleep(server.delay)
+
+        if url.path.endswith('/reverse'):
+            server.counter.inc('reverse')
+            lat, lon = float(query.get('lat', 0)), float(query.get('lon', 0))
+            return self._json({
+                'place_id': int(abs(lat) * 1e4) * 10 ** 7 + int(abs(lon) * 1e4),
+                'lat': str(lat),
+                'lon': str(lon),
+                'display_name': f'Stand-in Road, near {lat:.4f}, {lon:.4f}, Kerala, India',
+            })
+        if url.path.endswith('/nearbysearch/json'):
+            server.counter.inc('nearbysearch')
+            lat, lng = (float(x) for x in query.get('location', '0,0').split(','))
+            rng = random.Random(query.get('location'))
+            results = [{
+                'place_id': f'standin-{lat:.3f}-{lng:.3f}-{i}',
+                'name': f'Stand-in Police Station {i}',
+                'vicinity': 'Stand-in Road',
+                'geometry': {'location': {'lat': lat + rng.uniform(-0.02, 0.02),
+                                          'lng': lng + rng.uniform(-0.02, 0.02)}},
+            } for i in range(3)]
+            return self._json({'status': 'OK', 'results': results})
+        if url.path.endswith('/details/json'):
+            server.counter.inc('details')
+            return self._json({'status': 'OK', 'result': {
+                'name': 'Stand-in Police Station',
+                'formatted_phone_number': '0471 000 0000',
+                'formatted_address': 'Stand-in Road, Kerala, India',
+            }})
+        server.counter.inc('not_found')
+        return self._json({'error': 'not found'}, status=404)
+
+
+class HTTPStandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, delay_ms=0):
+        super().__init__((host, port), _HTTPHandler)
+        self.delay = delay_ms / 1000.0
+        self.counter = _Counter()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    @property
+    def places_url(self):
+        return f'http://127.0.0.1:{self.port}/maps/api/place'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='http-standin', daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--smtp-port', type=int, default=2525)
+    parser.add_argument('--http-port', type=int, default=8089)
+    parser.add_argument('--delay-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    smtp = SMTPStandIn(port=args.smtp_port, delay_ms=args.delay_ms).start()
+    http = HTTPStandIn(port=args.http_port, delay_ms=args.delay_ms).start()
+    print(json.dumps({
+        'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': smtp.port, 'MAIL_USE_TLS': 'false',
+        'GEOCODER_DOMAIN': f'127.0.0.1:{http.port}', 'GEOCODER_SCHEME': 'http',
+        'GOOGLE_PLACES_URL': http.places_url
+    }, indent=2))
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps({'smtp': smtp.counter.snapshot(), 'http': http.counter.snapshot()}))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
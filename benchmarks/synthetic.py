@@ -0,0 +1,104 @@
+"""Synthetic helpers and incidents for the benchmarks.
+
+Helpers are clustered around real population centres so grid cells are as
+unevenly filled as in production: most people live in a few towns, the rest
+are spread thinly across the region.
+
+    python benchmarks/synthetic.py --helpers 100000 --format ndjson > helpers.ndjson
+"""
+import argparse
+import csv
+import json
+import math
+import random
+import sys
+
+# (name, lat, lon, weight, spread_km)
+AREAS = {
+    'kerala': [
+        ('Thiruvananthapuram', 8.5241, 76.9366, 0.18, 12),
+        ('Kochi', 9.9312, 76.2673, 0.22, 10),
+        ('Kozhikode', 11.2588, 75.7804, 0.14, 9),
+        ('Thrissur', 10.5276, 76.2144, 0.10, 8),
+        ('Kollam', 8.8932, 76.6141, 0.08, 8),
+        ('Kottayam', 9.5916, 76.5222, 0.07, 7),
+        ('Kannur', 11.8745, 75.3704, 0.06, 7),
+        ('Palakkad', 10.7867, 76.6548, 0.05, 8),
+    ],
+    'india': [
+        ('Delhi', 28.6139, 77.2090, 0.24, 25),
+        ('Mumbai', 19.0760, 72.8777, 0.22, 18),
+        ('Bengaluru', 12.9716, 77.5946, 0.16, 15),
+        ('Chennai', 13.0827, 80.2707, 0.12, 14),
+        ('Kolkata', 22.5726, 88.3639, 0.12, 14),
+        ('Hyderabad', 17.3850, 78.4867, 0.10, 15),
+    ],
+}
+# Share of helpers scattered uniformly over each area's bounding box
+RURAL_SHARE = 0.04
+FIRST_NAMES = ['Anandhu', 'Arjun', 'Devika', 'Fathima', 'Gokul', 'Lakshmi', 'Meera', 'Rahul', 'Sneha', 'Vishnu']
+KM_PER_DEGREE = 111.19
+
+
+def _bounds(area):
+    lats = [c[1] for c in AREAS[area]]
+    lons = [c[2] for c in AREAS[area]]
+    return min(lats) - 0.3, max(lats) + 0.3, min(lons) - 0.3, max(lons) + 0.3
+
+
+def random_points(n, area='kerala', seed=42):
+    """Yields n (lat, lon) points, clustered around the area's towns."""
+    rng = random.Random(seed)
+    centres = AREAS[area]
+    weights = [c[3] for c in centres]
+    min_lat, max_lat, min_lon, max_lon = _bounds(area)
+    for _ in range(n):
+        if rng.random() < RURAL_SHARE:
+            yield rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)
+            continue
+        _, lat, lon, _, spread = rng.choices(centres, weights)[0]
+        dlat = rng.gauss(0, spread) / KM_PER_DEGREE
+        dlon = rng.gauss(0, spread) / (KM_PER_DEGREE * math.cos(math.radians(lat)))
+        yield max(-90.0, min(90.0, lat + dlat)), (lon + dlon + 180.0) % 360.0 - 180.0
+
+
+def helpers(n, area='kerala', seed=42, email_prefix='helper'):
+    """Yields helper rows shaped like /register_user bodies."""
+    rng = random.Random(seed + 1)
+    for i, (lat, lon) in enumerate(random_points(n, area, seed), start=1):
+        yield {
+            'name': f'{rng.choice(FIRST_NAMES)} {i}',
+            'email': f'{email_prefix}{i}@example.org',
+            'latitude': round(lat, 6),
+            'longitude': round(lon, 6),
+        }
+
+
+def incidents(n, area='kerala', seed=7):
+    # SOS locations follow the same population density as helpers
+    return [{'latitude': round(lat, 6), 'longitude': round(lon, 6)}
+            for lat, lon in random_points(n, area, seed)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--helpers', type=int, default=10000)
+    parser.add_argument('--area', choices=sorted(AREAS), default='kerala')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', choices=['ndjson', 'csv', 'json'], default='ndjson')
+    args = parser.parse_args()
+
+    rows = helpers(args.helpers, args.area, args.seed)
+    if args.format == 'csv':
+        writer = csv.DictWriter(sys.stdout, fieldnames=['name', 'email', 'latitude', 'longitude'])
+        writer.writeheader()
+        writer.writerows(rows)
+    elif args.format == 'json':
+        json.dump(list(rows), sys.stdout)
+    else:
+        for row in rows:
+            sys.stdout.write(json.dumps(row) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+import codecs
+import csv
+import io
+import json
+import time
+
+from sqlalchemy import insert, select
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+READ_SIZE = 64 * 1024
+
+
+def _iter_json_array(stream):
+    # Incrementally decodes a top-level JSON array without reading it all
+    decoder = json.JSONDecoder()
+    reader = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        # Skip whitespace and separators
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = stream.read(READ_SIZE)
+            eof = not chunk
+            buf = buf[pos:] + reader.decode(chunk, final=eof)
+            pos = 0
+        if pos >= len(buf):
+            raise ValueError("Unexpected end of JSON array")
+        if not started:
+            if buf[pos] != '[':
+                raise ValueError("Body must be a JSON array")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = stream.read(READ_SIZE)
+            eof = not chunk
+            buf = buf[pos:] + reader.decode(chunk, final=eof)
+            pos = 0
+            continue
+        yield item
+        pos = end
+
+
+class _RawInput(io.RawIOBase):
+    # File interface for WSGI inputs that only offer read(), e.g. gunicorn's
+    # request body, so TextIOWrapper can decode them
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _text(stream, **kwargs):
+    if not hasattr(stream, 'readable'):
+        stream = io.BufferedReader(_RawInput(stream), READ_SIZE)
+    return io.TextIOWrapper(stream, encoding='utf-8', **kwargs)
+
+
+def _iter_ndjson(stream):
+    for line in _text(stream):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield e
+
+
+def _iter_csv(stream):
+    yield from csv.DictReader(_text(stream, newline=''))
+
+
+def iter_upload_rows(request):
+    """Yields raw rows from a JSON array, NDJSON or CSV body or file upload.
+
+    Undecodable NDJSON lines are yielded as the exception so they are reported
+    against their row number instead of aborting the upload.
+    """
+    if request.files:
+        upload = next(iter(request.files.values()))
+        name = (upload.filename or '').lower()
+        if name.endswith('.csv'):
+            return _iter_csv(upload.stream)
+        if name.endswith(('.ndjson', '.jsonl')):
+            return _iter_ndjson(upload.stream)
+        return _iter_json_array(upload.stream)
+
+    mimetype = request.mimetype
+    if mimetype == 'text/csv':
+        return _iter_csv(request.stream)
+    if mimetype in ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines'):
+        return _iter_ndjson(request.stream)
+    if mimetype == 'application/json':
+        return _iter_json_array(request.stream)
+    raise ValueError("Upload must be JSON, NDJSON or CSV")
+
+
+def validate_helper_row(row):
+    # Same rules as /register_user; returns (record, error)
+    if isinstance(row, Exception):
+        return None, f"Invalid JSON: {row}"
+    if not isinstance(row, dict):
+        return None, "Row must be an object"
+
+    name = str(row.get('name') or '').strip()
+    email = str(row.get('email') or '').strip()
+    latitude = row.get('latitude')
+    longitude = row.get('longitude')
+    if not all([name, email, latitude, longitude]):
+        return None, "All fields (name, email, latitude, longitude) are required!"
+    try:
+        latitude = float(latitude)
+        longitude = float(longitude)
+    except (TypeError, ValueError):
+        return None, "Latitude and Longitude must be numeric values"
+    if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+        return None, "Latitude and Longitude are out of range"
+    if len(name) > 50 or len(email) > 120:
+        return None, "Name or email is too long"
+    return {'name': name, 'email': email, 'latitude': latitude, 'longitude': longitude}, None
+
+
+class BulkRegistration:
+    """Validates and inserts helper rows in chunks, one transaction per chunk.
+
+    Duplicate emails are found with one ``IN`` query per chunk plus the set of
+    emails already seen in this upload. ``on_inserted`` receives the inserted
+    ``(id, name, email, latitude, longitude)`` rows after each commit.
+    """
+
+    def __init__(self, session, model, chunk_size=CHUNK_SIZE, on_inserted=None):
+        self.session = session
+        self.model = model
+        self.chunk_size = chunk_size
+        self.on_inserted = on_inserted
+        self.received = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+        self._seen = set()
+
+    def _error(self, row_number, email, message):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'email': email, 'message': message})
+
+    def _flush(self, chunk):
+        if not chunk:
+            return
+        emails = [record['email'] for _, record in chunk]
+        existing = set(self.session.execute(
+            select(self.model.email).where(self.model.email.in_(emails))
+        ).scalars())
+
+        records = []
+        for row_number, record in chunk:
+            if record['email'] in existing:
+                self.duplicates += 1
+                self._error(row_number, record['email'], "This email is already registered.")
+            else:
+                records.append(record)
+        if not records:
+            return
+
+        try:
+            inserted = self.session.execute(
+                insert(self.model).returning(
+                    self.model.id, self.model.name, self.model.email, self.model.latitude, self.model.longitude
+                ),
+                records
+            ).all()
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        self.inserted += len(inserted)
+        if self.on_inserted:
+            self.on_inserted(inserted)
+
+    def run(self, rows):
+        started = time.perf_counter()
+        chunk = []
+        for row_number, row in enumerate(rows, start=1):
+            self.received += 1
+            record, error = validate_helper_row(row)
+            if error:
+                self.invalid += 1
+                email = row.get('email') if isinstance(row, dict) else None
+                self._error(row_number, email, error)
+                continue
+            if record['email'] in self._seen:
+                self.duplicates += 1
+                self._error(row_number, record['email'], "Duplicate email in upload")
+                continue
+            self._seen.add(record['email'])
+            chunk.append((row_number, record))
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk)
+                chunk = []
+        self._flush(chunk)
+        return self.summary(time.perf_counter() - started)
+
+    def summary(self, elapsed):
+        return {
+            'received': self.received,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'errors': self.errors,
+            'errorsTruncated': len(self.errors) < self.duplicates + self.invalid,
+            'seconds': round(elapsed, 4),
+            'rowsPerSecond': round(self.received / elapsed, 1) if elapsed > 0 else None
+        }
@@ -1,6 +1,6 @@
-from app import app, db
+from app import create_app, init_db
 
-# Create tables for the database
-with app.app_context():
-    db.create_all()
-    print("Database and tables created successfully!")
+# Create tables for the database and apply pending migrations
+# (same as `flask --app app init-db`)
+init_db(create_app())
+print("Database and tables created successfully!")
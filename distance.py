@@ -0,0 +1,58 @@
+import math
+
+# NumPy is optional: without it the batch functions fall back to plain Python
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_batch(lat, lon, lats, lons):
+    """Distances in km from one origin to many points.
+
+    ``lats``/``lons`` may be lists, ``array('d')`` or NumPy arrays. Returns a
+    NumPy array when NumPy is installed, otherwise a list.
+    """
+    if np is not None:
+        return _haversine_numpy(lat, lon, lats, lons)
+    return _haversine_python(lat, lon, lats, lons)
+
+
+def within_radius(lat, lon, lats, lons, radius):
+    # Indices (into lats/lons) and distances of the points inside radius km
+    distances = haversine_batch(lat, lon, lats, lons)
+    if np is not None:
+        hits = np.flatnonzero(distances <= radius)
+        return hits.tolist(), distances[hits].tolist()
+    hits = [i for i, d in enumerate(distances) if d <= radius]
+    return hits, [distances[i] for i in hits]
+
+
+def _haversine_numpy(lat, lon, lats, lons):
+    lat1 = math.radians(float(lat))
+    lon1 = math.radians(float(lon))
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lons, dtype=np.float64))
+
+    a = np.sin((lat2 - lat1) * 0.5) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) * 0.5) ** 2
+    np.clip(a, 0.0, 1.0, out=a)
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _haversine_python(lat, lon, lats, lons):
+    # Origin terms are hoisted out of the loop; only per-point trig remains
+    lat1 = math.radians(float(lat))
+    lon1 = math.radians(float(lon))
+    cos_lat1 = math.cos(lat1)
+    sin, cos, sqrt, atan2, rad = math.sin, math.cos, math.sqrt, math.atan2, math.radians
+
+    out = []
+    append = out.append
+    for lat2, lon2 in zip(lats, lons):
+        lat2 = rad(lat2)
+        a = sin((lat2 - lat1) * 0.5) ** 2 + cos_lat1 * cos(lat2) * sin((rad(lon2) - lon1) * 0.5) ** 2
+        a = min(1.0, max(0.0, a))
+        append(2 * EARTH_RADIUS_KM * atan2(sqrt(a), sqrt(1 - a)))
+    return out
@@ -0,0 +1,165 @@
+import math
+import threading
+
+# Roughly 111 km per degree of latitude (Earth radius 6371 km)
+KM_PER_DEGREE = 6371 * math.pi / 180
+
+
+def bounding_box(lat, lon, radius_km):
+    # Returns (min_lat, min_lon, max_lat, max_lon) covering a circle of radius_km.
+    # Longitude span is widened to the whole globe near the poles.
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat = max(-90.0, lat - dlat)
+    max_lat = min(90.0, lat + dlat)
+
+    widest = max(abs(min_lat), abs(max_lat))
+    cos_lat = math.cos(math.radians(widest))
+    if widest >= 90.0 or cos_lat <= 1e-9:
+        return min_lat, -180.0, max_lat, 180.0
+
+    dlon = radius_km / (KM_PER_DEGREE * cos_lat)
+    if dlon >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+    return min_lat, lon - dlon, max_lat, lon + dlon
+
+
+def _float_arg(args, name, error):
+    try:
+        return float(args.get(name))
+    except (TypeError, ValueError):
+        raise error(f"'{name}' must be a number")
+
+
+def parse_region(args, error=ValueError):
+    """Reads a search region from query parameters.
+
+    bbox=minLat,minLng,maxLat,maxLng  or  lat=..&lng=..&radius=<km>
+    Returns ``(bbox, center, radius)``; a circle also gets its bounding box.
+    Any box crossing the antimeridian, drawn or around a circle, comes back
+    with max_lng > 180 (never min_lng < -180). No region gives
+    ``(None, None, None)``. Bad values raise ``error``.
+    """
+    if args.get('bbox'):
+        try:
+            min_lat, min_lng, max_lat, max_lng = (float(v) for v in args['bbox'].split(','))
+        except ValueError:
+            raise error("'bbox' must be minLat,minLng,maxLat,maxLng")
+        if max_lng < min_lng:
+            # A box drawn across the antimeridian
+            max_lng += 360
+        center = radius = None
+    elif args.get('radius'):
+        radius = _float_arg(args, 'radius', error)
+        if radius <= 0:
+            raise error("'radius' must be positive")
+        center = (_float_arg(args, 'lat', error), _float_arg(args, 'lng', error))
+        min_lat, min_lng, max_lat, max_lng = bounding_box(center[0], center[1], radius)
+    else:
+        return None, None, None
+    if min_lng < -180:
+        # e.g. a circle just west of the antimeridian; shifted to the same form
+        min_lng, max_lng = min_lng + 360, max_lng + 360
+    return (min_lat, min_lng, max_lat, max_lng), center, radius
+
+
+class Grid:
+    """Geometry of a fixed-size lat/lon grid; cells are ``(row, col)`` tuples."""
+
+    def __init__(self, cell_size_deg=0.1):
+        self.cell_size = float(cell_size_deg)
+        self._lon_cells = int(math.ceil(360.0 / self.cell_size))
+
+    def cell_for(self, lat, lon):
+        row = int(math.floor((float(lat) + 90.0) / self.cell_size))
+        col = int(math.floor((float(lon) + 180.0) / self.cell_size)) % self._lon_cells
+        return row, col
+
+    def cells_in_box(self, min_lat, min_lon, max_lat, max_lon):
+        first_row, first_col = self.cell_for(min_lat, min_lon)
+        last_row, _ = self.cell_for(max_lat, max_lon)
+        span = int(math.floor((max_lon - min_lon) / self.cell_size)) + 1
+        span = min(span + 1, self._lon_cells)
+        for row in range(first_row, last_row + 1):
+            for offset in range(span):
+                yield row, (first_col + offset) % self._lon_cells
+
+    def cells_for_radius(self, lat, lon, radius_km, occupied):
+        # Cells overlapping the search box that appear in `occupied`
+        min_lat, min_lon, max_lat, max_lon = bounding_box(float(lat), float(lon), radius_km)
+        rows = self.cell_for(max_lat, 0)[0] - self.cell_for(min_lat, 0)[0] + 1
+        cols = int((max_lon - min_lon) / self.cell_size) + 2
+        if rows * cols > len(occupied):
+            # Sparse grid: cheaper to walk occupied cells than the box
+            return [cell for cell in occupied
+                    if self._cell_overlaps(cell, min_lat, min_lon, max_lat, max_lon)]
+        return [cell for cell in self.cells_in_box(min_lat, min_lon, max_lat, max_lon) if cell in occupied]
+
+    def _cell_overlaps(self, cell, min_lat, min_lon, max_lat, max_lon):
+        row, col = cell
+        cell_lat = row * self.cell_size - 90.0
+        if cell_lat > max_lat or cell_lat + self.cell_size < min_lat:
+            return False
+        if max_lon - min_lon >= 360.0:
+            return True
+        cell_lon = col * self.cell_size - 180.0
+        # Shift the cell by whole turns so antimeridian-crossing boxes still match
+        for shift in (-360.0, 0.0, 360.0):
+            west = cell_lon + shift
+            if west <= max_lon and west + self.cell_size >= min_lon:
+                return True
+        return False
+
+
+class GridIndex(Grid):
+    """Grid mapping cells to the points inside them.
+
+    Points are stored as ``id -> (lat, lon, payload)`` so a proximity query only
+    touches the cells overlapping the search circle's bounding box.
+    """
+
+    def __init__(self, cell_size_deg=0.1):
+        super().__init__(cell_size_deg)
+        self._cells = {}
+        self._where = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, item_id):
+        return item_id in self._where
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._where.clear()
+
+    def insert(self, item_id, lat, lon, payload=None):
+        lat, lon = float(lat), float(lon)
+        with self._lock:
+            self.remove(item_id)
+            cell = self.cell_for(lat, lon)
+            self._cells.setdefault(cell, {})[item_id] = (lat, lon, payload)
+            self._where[item_id] = cell
+
+    def remove(self, item_id):
+        with self._lock:
+            cell = self._where.pop(item_id, None)
+            if cell is None:
+                return False
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.pop(item_id, None)
+                if not bucket:
+                    del self._cells[cell]
+            return True
+
+    def candidates(self, lat, lon, radius_km):
+        # All points in cells overlapping the search box; callers still need
+        # the exact distance check.
+        with self._lock:
+            found = []
+            for cell in self.cells_for_radius(lat, lon, radius_km, self._cells):
+                bucket = self._cells[cell]
+                found.extend((item_id, p[0], p[1], p[2]) for item_id, p in bucket.items())
+            return found
@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode_cache (
+    lat_key REAL NOT NULL,
+    lon_key REAL NOT NULL,
+    address TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (lat_key, lon_key)
+)
+"""
+
+
+class ReverseGeocodeCache:
+    """Reverse-geocode results keyed on coordinates rounded to ``precision`` decimals.
+
+    Lookups check an in-memory LRU first, then an optional SQLite file so cached
+    addresses survive restarts. 4 decimals is roughly an 11 m grid.
+    """
+
+    def __init__(self, path=None, precision=4, ttl=86400, max_entries=10000):
+        self.path = path
+        self.precision = precision
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            self._db().execute(SCHEMA)
+
+    def key(self, lat, lon):
+        return round(float(lat), self.precision), round(float(lon), self.precision)
+
+    def _db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, address, expires_at):
+        # Caller holds self._lock
+        self._entries[key] = (address, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, lat, lon, count=True):
+        # count=False re-checks without touching the hit/miss counters
+        key = self.key(lat, lon)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += count
+                    return entry[0]
+                del self._entries[key]
+
+        if self.path:
+            row = self._db().execute(
+                'SELECT address, expires_at FROM geocode_cache WHERE lat_key = ? AND lon_key = ? AND expires_at > ?',
+                (key[0], key[1], now)
+            ).fetchone()
+            if row is not None:
+                with self._lock:
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += count
+                return row[0]
+
+        if count:
+            with self._lock:
+                self.misses += 1
+        return None
+
+    def set(self, lat, lon, address):
+        key = self.key(lat, lon)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, address, expires_at)
+        if self.path:
+            self._db().execute(
+                'INSERT OR REPLACE INTO geocode_cache (lat_key, lon_key, address, expires_at) VALUES (?, ?, ?, ?)',
+                (key[0], key[1], address, expires_at)
+            )
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'diskHits': self.disk_hits,
+                'misses': self.misses,
+                'hitRatio': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'precision': self.precision
+            }
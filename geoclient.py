@@ -0,0 +1,223 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class GeocoderBusy(Exception):
+    """Raised when the work queue is full or no rate-limit token arrives in time."""
+
+
+class TokenBucket:
+    # Allows `rate` calls per second on average with bursts up to `capacity`
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class SharedTokenBucket:
+    """TokenBucket whose tokens live in a SQLite file, so every process using
+    the file (e.g. all gunicorn workers) shares one ``rate`` between them.
+
+    Each acquire is one short write transaction; the state is a single row
+    per ``name`` in the ``rate_limits`` table.
+    """
+
+    def __init__(self, path, rate, capacity=1, name='geocoder'):
+        self.path = path
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.name = name
+        self._local = threading.local()
+        self._db().execute(
+            'CREATE TABLE IF NOT EXISTS rate_limits (name TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+            'updated_at REAL NOT NULL)'
+        )
+
+    def _db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _take(self):
+        # Takes a token if one is available; returns the seconds until one is
+        conn = self._db()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            row = conn.execute('SELECT tokens, updated_at FROM rate_limits WHERE name = ?', (self.name,)).fetchone()
+            tokens = self.capacity if row is None else min(
+                self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+            if not wait:
+                tokens -= 1
+            conn.execute('INSERT OR REPLACE INTO rate_limits (name, tokens, updated_at) VALUES (?, ?, ?)',
+                         (self.name, tokens, now))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution of fn
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class NominatimBackend:
+    """geopy Nominatim backend; ``domain``/``scheme`` point it at a local fake server."""
+
+    def __init__(self, user_agent="distress_signal_app", domain=None, scheme=None, timeout=10, language='en'):
+        from geopy.exc import GeocoderTimedOut
+        from geopy.geocoders import Nominatim
+
+        options = {'user_agent': user_agent, 'timeout': timeout}
+        if domain:
+            options['domain'] = domain
+        if scheme:
+            options['scheme'] = scheme
+        self.language = language
+        self._geolocator = Nominatim(**options)
+        self._timed_out = GeocoderTimedOut
+
+    def reverse(self, lat, lon):
+        # Surfaced as the builtin TimeoutError so callers need not import geopy
+        try:
+            location = self._geolocator.reverse((lat, lon), language=self.language)
+        except self._timed_out as e:
+            raise TimeoutError(str(e)) from e
+        return location.address if location else None
+
+
+class GeocodingClient:
+    """Rate-aware front end for a reverse-geocoding backend.
+
+    Requests go through a bounded queue served by ``workers`` threads, each call
+    takes a token from the bucket first, and identical in-flight keys are
+    coalesced so waiting callers share one backend result. ``bucket``
+    replaces the per-process TokenBucket(rate, burst), e.g. with a
+    SharedTokenBucket when several processes call the same backend.
+    """
+
+    def __init__(self, backend, rate=1.0, burst=1, max_queue=64, workers=1, timeout=10, bucket=None):
+        self.backend = backend
+        self.timeout = timeout
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self.flights = SingleFlight()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.backend_calls = 0
+        self.rejected = 0
+        self._workers = [
+            threading.Thread(target=self._work, name=f'geocoder-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _work(self):
+        while True:
+            future, lat, lon, deadline = self._queue.get()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if not self.bucket.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                    future.set_exception(GeocoderBusy("Geocoding rate limit exceeded"))
+                    continue
+                self.backend_calls += 1
+                future.set_result(self.backend.reverse(lat, lon))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, lat, lon, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        future = Future()
+        try:
+            self._queue.put_nowait((future, lat, lon, time.monotonic() + timeout))
+        except queue.Full:
+            self.rejected += 1
+            raise GeocoderBusy("Geocoding queue is full")
+        return future
+
+    def reverse(self, lat, lon, key=None, timeout=None):
+        # `key` groups requests that should share a result (e.g. a cache key)
+        timeout = self.timeout if timeout is None else timeout
+        key = (lat, lon) if key is None else key
+
+        def lookup():
+            return self.submit(lat, lon, timeout).result(timeout)
+
+        return self.flights.do(key, lookup)
+
+    def stats(self):
+        return {
+            'backendCalls': self.backend_calls,
+            'queued': self._queue.qsize(),
+            'inFlight': self.flights.in_flight(),
+            'coalesced': self.flights.shared,
+            'rejected': self.rejected
+        }
@@ -0,0 +1,42 @@
+# gunicorn settings for wsgi:app. Every value can be overridden from the
+# environment; WEB_CONCURRENCY follows the usual PaaS convention.
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# Threaded workers: a request waiting on the geocoder or the database holds
+# one thread, not the whole process. Each process keeps its own in-memory
+# helper registry, so a few processes with many threads beat many processes.
+# Live location streams (SSE) hold a thread each and are capped by
+# LIVE_MAX_SUBSCRIBERS, which defaults to a quarter of GUNICORN_THREADS.
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', str(min(4, multiprocessing.cpu_count()))))
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+
+# Workers get SOS_DRAIN_TIMEOUT to send due SOS deliveries after they stop
+# accepting requests, plus headroom for requests already running
+graceful_timeout = int(float(os.getenv('SOS_DRAIN_TIMEOUT', '20'))) + 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+
+def on_starting(server):
+    # Tables and migrations once, before any worker serves a request
+    from app import create_app, init_db
+
+    init_db(create_app({'CONFIGURE_LOGGING': False}))
+
+
+def worker_exit(server, worker):
+    # Runs in the worker after its last request; the same drain also runs at
+    # interpreter exit, whichever comes first does the work
+    app = getattr(worker, 'wsgi', None)
+    if app is not None and 'sos' in getattr(app, 'extensions', {}):
+        app.extensions['sos'].shutdown()
@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+import metrics
+from storage import prune_helper_changes
+
+logger = logging.getLogger(__name__)
+
+
+def parse_location_update(data):
+    # -> (helper_id, latitude, longitude); raises ValueError. The helper's
+    # token is checked by the route
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    try:
+        helper_id = int(data['id'])
+        latitude = float(data['latitude'])
+        longitude = float(data['longitude'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("'id', 'latitude' and 'longitude' are required and must be numeric")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("Coordinates out of range")
+    return helper_id, latitude, longitude
+
+
+def parse_heartbeat(data):
+    # -> helper_id; raises ValueError. The token is checked by the route
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    try:
+        return int(data['id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("'id' is required and must be numeric")
+
+
+def _merge(older, newer):
+    # Entries are (lat, lon, moved_at, seen_at); a heartbeat-only entry has
+    # no position and must not erase one still waiting to be written
+    if newer[0] is None and older[0] is not None:
+        return older[:3] + (max(older[3], newer[3]),)
+    return newer
+
+
+class HelperLocationBuffer:
+    """Latest reported position per helper, written to SQLite in batches.
+
+    ``update`` (a position) and ``seen`` (a heartbeat) only replace the
+    helper's entry in a dict, so any number of pings between flushes costs
+    one row update; a heartbeat only moves ``last_seen_at``. A background thread writes
+    everything pending every ``flush_interval`` seconds - or sooner once
+    ``max_pending`` helpers are waiting - as one transaction. The registry
+    reads ``get`` so reloads from the database never roll a helper back to
+    an older position than the one already reported here.
+    """
+
+    def __init__(self, engine, flush_interval=10.0, max_pending=50000, keep_changes=100000):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.keep_changes = keep_changes
+        self._pending = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._flusher = None
+        self.received = 0
+        self.heartbeats = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+
+    def update(self, helper_id, lat, lon, reported_at=None):
+        reported_at = reported_at or time.time()
+        self._add(helper_id, (lat, lon, reported_at, reported_at))
+
+    def seen(self, helper_id, seen_at=None):
+        self._add(helper_id, (None, None, None, seen_at or time.time()))
+
+    def _add(self, helper_id, entry):
+        with self._lock:
+            self.received += 1
+            if entry[0] is None:
+                self.heartbeats += 1
+            previous = self._pending.get(helper_id)
+            if previous is not None:
+                self.coalesced += 1
+                entry = _merge(previous, entry)
+            self._pending[helper_id] = entry
+            pending = len(self._pending)
+            if self._flusher is None and not self._stop_event.is_set():
+                self._flusher = threading.Thread(target=self._run, name='helper-locations', daemon=True)
+                self._flusher.start()
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def get(self, helper_id):
+        # (lat, lon) not yet committed to the database, or None
+        for entries in (self._pending, self._inflight):
+            entry = entries.get(helper_id)
+            if entry is not None and entry[0] is not None:
+                return entry[:2]
+        return None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+        if not batch:
+            return 0
+        try:
+            with metrics.stage('location_flush'), self.engine.begin() as conn:
+                conn.execute(
+                    text('UPDATE registered_user SET latitude = COALESCE(:lat, latitude), '
+                         'longitude = COALESCE(:lon, longitude), '
+                         'location_updated_at = COALESCE(:moved, location_updated_at), '
+                         'last_seen_at = :seen WHERE id = :id'),
+                    [{'id': helper_id, 'lat': lat, 'lon': lon, 'moved': moved, 'seen': seen}
+                     for helper_id, (lat, lon, moved, seen) in batch.items()]
+                )
+        except Exception as e:
+            # Retry the batch with the next flush; newer pings take precedence
+            with self._lock:
+                for helper_id, entry in batch.items():
+                    newer = self._pending.get(helper_id)
+                    self._pending[helper_id] = entry if newer is None else _merge(entry, newer)
+                self._inflight = {}
+            self.failures += 1
+            logger.error(f"Helper location flush failed for {len(batch)} helpers: {str(e)}")
+            return 0
+        self._inflight = {}
+        self.flushed += len(batch)
+        self.flushes += 1
+        # Every flushed row also lands in helper_changes via the update trigger
+        prune_helper_changes(self.engine, keep=self.keep_changes)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Helper location flusher error: {str(e)}")
+
+    def stop(self, timeout=None):
+        # Final flush so positions reported before shutdown are kept
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout)
+        return self.flush()
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'received': self.received,
+            'heartbeats': self.heartbeats,
+            'coalesced': self.coalesced,
+            'flushed': self.flushed,
+            'flushes': self.flushes,
+            'failures': self.failures
+        }
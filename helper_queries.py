@@ -0,0 +1,124 @@
+import json
+
+from sqlalchemy import and_, or_, select
+
+from distance import within_radius
+from geo_index import parse_region
+
+HELPER_FIELDS = ('id', 'name', 'email', 'latitude', 'longitude')
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+
+class HelperQueryError(ValueError):
+    pass
+
+
+def parse_helper_query(args):
+    """Reads /get_helpers query parameters.
+
+    after=<id>      keyset cursor: only helpers with a larger id
+    limit=<n>       page size (1..MAX_PAGE_SIZE); omitted means no paging
+    fields=a,b      projection over HELPER_FIELDS
+    format=ndjson   stream one JSON object per line
+    bbox=minLat,minLng,maxLat,maxLng  or  lat=..&lng=..&radius=<km>
+    """
+    params = {'after': None, 'limit': None, 'fields': HELPER_FIELDS, 'format': 'json',
+              'bbox': None, 'center': None, 'radius': None}
+
+    if args.get('after'):
+        try:
+            params['after'] = int(args['after'])
+        except ValueError:
+            raise HelperQueryError("'after' must be a helper id")
+
+    if args.get('limit'):
+        try:
+            params['limit'] = int(args['limit'])
+        except ValueError:
+            raise HelperQueryError("'limit' must be an integer")
+        if not 1 <= params['limit'] <= MAX_PAGE_SIZE:
+            raise HelperQueryError(f"'limit' must be between 1 and {MAX_PAGE_SIZE}")
+
+    if args.get('fields'):
+        fields = tuple(f.strip() for f in args['fields'].split(',') if f.strip())
+        unknown = [f for f in fields if f not in HELPER_FIELDS]
+        if unknown or not fields:
+            raise HelperQueryError(f"Unknown fields: {', '.join(unknown) or '(none)'}")
+        params['fields'] = fields
+
+    fmt = args.get('format', 'json')
+    if fmt not in ('json', 'ndjson'):
+        raise HelperQueryError("'format' must be 'json' or 'ndjson'")
+    params['format'] = fmt
+
+    params['bbox'], params['center'], params['radius'] = parse_region(args, HelperQueryError)
+    return params
+
+
+def _lon_filter(column, min_lon, max_lon):
+    # Boxes crossing the antimeridian are split into two ranges
+    if min_lon < -180:
+        return or_(column >= min_lon + 360, column <= max_lon)
+    if max_lon > 180:
+        return or_(column >= min_lon, column <= max_lon - 360)
+    return column.between(min_lon, max_lon)
+
+
+def build_helper_select(model, params, *criteria):
+    # Selected columns always include id (cursor) and, for radius
+    # queries, the coordinates needed for the exact distance check
+    columns = list(params['fields'])
+    for needed in ['id'] + (['latitude', 'longitude'] if params['radius'] else []):
+        if needed not in columns:
+            columns.append(needed)
+
+    stmt = select(*(getattr(model, name) for name in columns)).where(*criteria)
+    if params['after'] is not None:
+        stmt = stmt.where(model.id > params['after'])
+    if params['bbox'] is not None:
+        min_lat, min_lon, max_lat, max_lon = params['bbox']
+        stmt = stmt.where(and_(
+            model.latitude.between(min_lat, max_lat),
+            _lon_filter(model.longitude, min_lon, max_lon)
+        ))
+    stmt = stmt.order_by(model.id)
+    if params['limit'] is not None:
+        stmt = stmt.limit(params['limit'])
+    return stmt
+
+
+def _filter_batch(rows, params):
+    # Exact radius check; rows are RowMappings
+    if params['radius'] is None or not rows:
+        return rows
+    hits, _ = within_radius(
+        params['center'][0], params['center'][1],
+        [r['latitude'] for r in rows], [r['longitude'] for r in rows],
+        params['radius']
+    )
+    return [rows[i] for i in hits]
+
+
+def _project(row, fields):
+    return {f: row[f] for f in fields}
+
+
+def fetch_helper_page(session, model, params, *criteria):
+    # Returns (helpers, next_cursor). With a radius filter a page can hold
+    # fewer than `limit` helpers; the cursor still advances past every row read.
+    rows = session.execute(build_helper_select(model, params, *criteria)).mappings().all()
+    next_cursor = None
+    if params['limit'] is not None and len(rows) == params['limit']:
+        next_cursor = rows[-1]['id']
+    helpers = [_project(row, params['fields']) for row in _filter_batch(rows, params)]
+    return helpers, next_cursor
+
+
+def stream_helpers_ndjson(session, model, params, *criteria):
+    # Yields NDJSON lines straight from a server-side cursor in batches
+    stmt = build_helper_select(model, params, *criteria).execution_options(yield_per=STREAM_BATCH_SIZE)
+    result = session.execute(stmt).mappings()
+    for batch in result.partitions():
+        for row in _filter_batch(batch, params):
+            yield json.dumps(_project(row, params['fields'])) + '\n'
@@ -0,0 +1,211 @@
+import heapq
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+from helper_store import HelperStore
+from sos_batch import assign_helpers
+
+logger = logging.getLogger(__name__)
+
+HELPER_COLUMNS = 'id, name, email, latitude, longitude, is_active, last_seen_at'
+
+
+class HelperRegistry:
+    """In-process copy of the helper table shared by the hot read paths.
+
+    Writers in this process update it write-through. Every insert, update and
+    delete on registered_user is also recorded in the trigger-maintained
+    helper_changes table (see storage.py); its highest row id is the registry
+    version. Other processes compare versions at most every ``check_interval``
+    seconds and replay only the changes they missed.
+
+    ``positions`` (a HelperLocationBuffer) holds reported positions not yet
+    written to the database; rows read back from the database use those
+    instead of the older stored coordinates. ``presence`` (a PresenceSet)
+    learns each row's ``last_seen_at``, which is how heartbeats received by
+    other processes reach this one.
+    """
+
+    def __init__(self, cell_size_deg=0.1, check_interval=1.0, positions=None, presence=None):
+        self.check_interval = check_interval
+        self.positions = positions
+        self.presence = presence
+        self.version = 0
+        self.loaded = False
+        self.reloads = 0
+        self.incremental_syncs = 0
+        self.store = HelperStore(cell_size_deg)
+        self._lock = threading.RLock()
+        self._next_check = 0.0
+
+    def __len__(self):
+        return len(self.store)
+
+    # Loading and cross-process synchronisation
+
+    def sync(self, engine, force=False):
+        # Cheap enough to call on every read; hits the database at most once
+        # per check_interval
+        now = time.monotonic()
+        if self.loaded and not force and now < self._next_check:
+            return self
+        with self._lock:
+            if not self.loaded:
+                self._load(engine)
+            elif force or now >= self._next_check:
+                self._refresh(engine)
+            self._next_check = time.monotonic() + self.check_interval
+        return self
+
+    def _load(self, engine):
+        with engine.connect() as conn:
+            version = conn.execute(text('SELECT COALESCE(MAX(version), 0) FROM helper_changes')).scalar()
+            rows = conn.execute(text(f'SELECT {HELPER_COLUMNS} FROM registered_user')).mappings().all()
+        self.store.clear()
+        for row in rows:
+            self._put(row)
+        self.version = version
+        self.loaded = True
+        self.reloads += 1
+        logger.info(f"Helper registry loaded {len(self.store)} helpers at version {version}")
+
+    def _refresh(self, engine):
+        with engine.connect() as conn:
+            oldest, latest = conn.execute(
+                text('SELECT COALESCE(MIN(version), 0), COALESCE(MAX(version), 0) FROM helper_changes')
+            ).one()
+            if latest <= self.version:
+                return
+            if oldest > self.version + 1:
+                # Change log was pruned past our version; start over
+                self._load(engine)
+                return
+            changed = conn.execute(
+                text('SELECT DISTINCT helper_id FROM helper_changes WHERE version > :v'),
+                {'v': self.version}
+            ).scalars().all()
+            rows = {}
+            for start in range(0, len(changed), 500):
+                batch = changed[start:start + 500]
+                params = {f'id{i}': helper_id for i, helper_id in enumerate(batch)}
+                placeholders = ', '.join(f':{name}' for name in params)
+                for row in conn.execute(
+                    text(f'SELECT {HELPER_COLUMNS} FROM registered_user WHERE id IN ({placeholders})'), params
+                ).mappings():
+                    rows[row['id']] = row
+
+        for helper_id in changed:
+            if helper_id in rows:
+                self._put(rows[helper_id])
+            else:
+                self._drop(helper_id)
+        self.version = latest
+        self.incremental_syncs += 1
+
+    # Write-through updates from this process
+
+    def _put(self, helper):
+        lat, lon = helper['latitude'], helper['longitude']
+        if self.positions is not None:
+            lat, lon = self.positions.get(helper['id']) or (lat, lon)
+        self.store.upsert(
+            helper['id'], lat, lon, helper['name'], helper['email'], bool(helper.get('is_active', True))
+        )
+        if self.presence is not None and helper.get('last_seen_at'):
+            self.presence.beat(helper['id'], helper['last_seen_at'])
+
+    def _drop(self, helper_id):
+        self.store.delete(helper_id)
+        if self.presence is not None:
+            self.presence.forget(helper_id)
+
+    def upsert(self, helper):
+        if not self.loaded:
+            return
+        with self._lock:
+            self._put(helper)
+
+    def move(self, helper_id, lat, lon):
+        # Position-only update; False if the helper is not in the registry
+        if not self.loaded:
+            return False
+        with self._lock:
+            return self.store.move(helper_id, lat, lon)
+
+    def remove(self, helper_id):
+        if not self.loaded:
+            return
+        with self._lock:
+            self._drop(helper_id)
+
+    # Reads
+
+    def get(self, helper_id):
+        with self._lock:
+            return self.store.get(helper_id)
+
+    def all(self, active_only=False):
+        with self._lock:
+            helpers = self.store.rows()
+        if active_only:
+            helpers = [h for h in helpers if h['is_active']]
+        return helpers
+
+    def nearby(self, lat, lon, radius):
+        # ([(helper, distance_km)], helpers_scanned) for active helpers in
+        # radius; rows are only materialized for matches
+        with self._lock:
+            matches, scanned = self.store.nearby(lat, lon, radius)
+            return [(self.store.row(slot), d) for slot, d in matches], scanned
+
+    def nearest(self, lat, lon, k, max_radius):
+        # Top-k active helpers within max_radius km, nearest first
+        with self._lock:
+            matches, scanned = self.store.nearest(lat, lon, k, max_radius)
+            return [(self.store.row(slot), d) for slot, d in matches], scanned
+
+    # Presence-aware variants: helpers heard from recently come first and
+    # stale ones (closest first) only make up a shortfall below `minimum`.
+    # Both return ([(helper, distance_km)], stale_skipped, helpers_scanned).
+
+    def nearby_present(self, lat, lon, radius, minimum=1):
+        if self.presence is None:
+            matches, scanned = self.nearby(lat, lon, radius)
+            return matches, 0, scanned
+        with self._lock:
+            matches, scanned = self.store.nearby(lat, lon, radius)
+            ids = self.store.ids
+            present, stale = [], []
+            for match in matches:
+                (present if ids[match[0]] in self.presence else stale).append(match)
+            fill = heapq.nsmallest(max(0, minimum - len(present)), stale, key=lambda m: m[1])
+            return [(self.store.row(slot), d) for slot, d in present + fill], len(stale) - len(fill), scanned
+
+    def nearest_present(self, lat, lon, k, max_radius, minimum=1):
+        if self.presence is None:
+            matches, scanned = self.nearest(lat, lon, k, max_radius)
+            return matches, 0, scanned
+        with self._lock:
+            matches, skipped, scanned = self.store.nearest_preferred(
+                lat, lon, k, max_radius, self.presence.__contains__, minimum
+            )
+            return [(self.store.row(slot), d) for slot, d in matches], skipped, scanned
+
+    def assign(self, points, radius, per_helper_cap):
+        # Many incidents at once; each helper goes to at most per_helper_cap
+        # of its closest incidents. See sos_batch.assign_helpers.
+        with self._lock:
+            assigned, found, scanned = assign_helpers(self.store, points, radius, per_helper_cap)
+            rows = [[(self.store.row(slot), d) for slot, d in matches] for matches in assigned]
+        return rows, found, scanned
+
+    def stats(self):
+        return {
+            'helpers': len(self.store),
+            'version': self.version,
+            'reloads': self.reloads,
+            'incrementalSyncs': self.incremental_syncs
+        }
@@ -0,0 +1,254 @@
+import heapq
+from array import array
+
+from distance import haversine_batch, np
+from geo_index import Grid
+
+
+class StringTable:
+    # Each distinct string is stored once; rows keep its index
+    def __init__(self):
+        self._strings = []
+        self._index = {}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def add(self, value):
+        idx = self._index.get(value)
+        if idx is None:
+            idx = self._index[value] = len(self._strings)
+            self._strings.append(value)
+        return idx
+
+    def __getitem__(self, idx):
+        return self._strings[idx]
+
+
+class HelperStore:
+    """Struct-of-arrays helper set.
+
+    Row ``slot`` is described by ``ids[slot]``, ``lats[slot]``, ``lons[slot]``,
+    ``flags[slot]`` and an index into the interned name table; emails live in a
+    parallel list. Deletes only tombstone a slot (flag ``DELETED``) and
+    ``compact()`` rewrites the arrays once enough tombstones pile up. Grid cells
+    hold ``array('q')`` slot lists so proximity scans read only nearby rows.
+    """
+
+    ACTIVE = 1
+    DELETED = 2
+
+    def __init__(self, cell_size_deg=0.1, compact_ratio=0.25, compact_min=1024):
+        self.grid = Grid(cell_size_deg)
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        self._reset()
+
+    def _reset(self):
+        self.ids = array('q')
+        self.lats = array('d')
+        self.lons = array('d')
+        self.flags = bytearray()
+        self.name_refs = array('l')
+        self.names = StringTable()
+        self.emails = []
+        self._slots = {}
+        self._cells = {}
+        self.tombstones = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, helper_id):
+        return helper_id in self._slots
+
+    def clear(self):
+        self._reset()
+
+    # Writes
+
+    def append(self, helper_id, lat, lon, name, email, active=True):
+        if helper_id in self._slots:
+            self.delete(helper_id)
+        slot = len(self.ids)
+        self.ids.append(helper_id)
+        self.lats.append(float(lat))
+        self.lons.append(float(lon))
+        self.flags.append(self.ACTIVE if active else 0)
+        self.name_refs.append(self.names.add(name))
+        self.emails.append(email)
+        self._slots[helper_id] = slot
+        self._cells.setdefault(self.grid.cell_for(lat, lon), array('q')).append(slot)
+        return slot
+
+    def upsert(self, helper_id, lat, lon, name, email, active=True):
+        # Replays of an unchanged row (or a pure move) don't create tombstones
+        slot = self._slots.get(helper_id)
+        if slot is not None and self.emails[slot] == email and self.names[self.name_refs[slot]] == name:
+            self.flags[slot] = self.ACTIVE if active else 0
+            self.move(helper_id, lat, lon)
+            return slot
+        return self.append(helper_id, lat, lon, name, email, active)
+
+    def move(self, helper_id, lat, lon):
+        # In-place position update; only the grid cell membership changes
+        slot = self._slots.get(helper_id)
+        if slot is None:
+            return False
+        old_cell = self.grid.cell_for(self.lats[slot], self.lons[slot])
+        new_cell = self.grid.cell_for(lat, lon)
+        self.lats[slot] = float(lat)
+        self.lons[slot] = float(lon)
+        if old_cell != new_cell:
+            self._cells[old_cell].remove(slot)
+            if not self._cells[old_cell]:
+                del self._cells[old_cell]
+            self._cells.setdefault(new_cell, array('q')).append(slot)
+        return True
+
+    def delete(self, helper_id):
+        slot = self._slots.pop(helper_id, None)
+        if slot is None:
+            return False
+        self.flags[slot] = self.DELETED
+        self.emails[slot] = None
+        self.tombstones += 1
+        if self.tombstones >= self.compact_min and self.tombstones >= self.compact_ratio * len(self.ids):
+            self.compact()
+        return True
+
+    def compact(self):
+        # Rewrites every column without tombstoned rows
+        live = [slot for slot in range(len(self.ids)) if self.flags[slot] != self.DELETED]
+        old = (self.ids, self.lats, self.lons, self.flags, self.name_refs, self.names, self.emails)
+        self._reset()
+        ids, lats, lons, flags, name_refs, names, emails = old
+        for slot in live:
+            self.append(ids[slot], lats[slot], lons[slot], names[name_refs[slot]],
+                        emails[slot], flags[slot] == self.ACTIVE)
+        return len(old[0]) - len(live)
+
+    # Reads
+
+    def row(self, slot):
+        return {
+            'id': self.ids[slot],
+            'name': self.names[self.name_refs[slot]],
+            'email': self.emails[slot],
+            'latitude': self.lats[slot],
+            'longitude': self.lons[slot],
+            'is_active': self.flags[slot] == self.ACTIVE
+        }
+
+    def get(self, helper_id):
+        slot = self._slots.get(helper_id)
+        return None if slot is None else self.row(slot)
+
+    def rows(self):
+        return [self.row(slot) for slot in sorted(self._slots.values(), key=self.ids.__getitem__)]
+
+    def nearby(self, lat, lon, radius):
+        """Active rows within radius km as ``([(slot, distance_km)], scanned)``."""
+        slots, distances, scanned = self.nearby_arrays(lat, lon, radius)
+        if np is not None:
+            return list(zip(slots.tolist(), distances.tolist())), scanned
+        return list(zip(slots, distances)), scanned
+
+    def nearby_arrays(self, lat, lon, radius):
+        # Same as nearby() but as parallel (slots, distances) columns:
+        # int64/float64 arrays with NumPy, plain lists without
+        slots = array('q')
+        for cell in self.grid.cells_for_radius(lat, lon, radius, self._cells):
+            slots.extend(self._cells[cell])
+
+        if np is not None:
+            if not slots:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), 0
+            idx = np.frombuffer(slots, dtype=np.int64)
+            flags = np.frombuffer(self.flags, dtype=np.uint8)
+            idx = idx[flags[idx] == self.ACTIVE]
+            lats = np.frombuffer(self.lats, dtype=np.float64)[idx]
+            lons = np.frombuffer(self.lons, dtype=np.float64)[idx]
+            distances = haversine_batch(lat, lon, lats, lons)
+            hits = distances <= radius
+            # Fancy indexing copies, so nothing returned pins the store's
+            # buffers and appends can still resize them
+            return idx[hits], distances[hits], len(slots)
+
+        active = [s for s in slots if self.flags[s] == self.ACTIVE]
+        distances = haversine_batch(lat, lon, [self.lats[s] for s in active], [self.lons[s] for s in active])
+        hits = [(s, d) for s, d in zip(active, distances) if d <= radius]
+        return [s for s, _ in hits], [d for _, d in hits], len(slots)
+
+    def _distances(self, lat, lon, slots):
+        # (slot, distance) for the active rows among `slots`
+        active = [s for s in slots if self.flags[s] == self.ACTIVE]
+        if not active:
+            return []
+        if np is not None:
+            idx = np.fromiter(active, dtype=np.int64, count=len(active))
+            lats = np.frombuffer(self.lats, dtype=np.float64)[idx]
+            lons = np.frombuffer(self.lons, dtype=np.float64)[idx]
+            return list(zip(active, haversine_batch(lat, lon, lats, lons).tolist()))
+        return list(zip(active, haversine_batch(lat, lon, [self.lats[s] for s in active],
+                                                [self.lons[s] for s in active])))
+
+    def _rings(self, lat, lon, max_radius, start_radius):
+        # (radius, slots in cells first reached at that radius); the radius
+        # doubles from start_radius up to max_radius
+        visited = set()
+        radius = min(start_radius, max_radius)
+        while True:
+            fresh = array('q')
+            for cell in self.grid.cells_for_radius(lat, lon, radius, self._cells):
+                if cell not in visited:
+                    visited.add(cell)
+                    fresh.extend(self._cells[cell])
+            yield radius, fresh
+            if radius >= max_radius:
+                return
+            radius = min(radius * 2, max_radius)
+
+    def nearest(self, lat, lon, k, max_radius, start_radius=1.0):
+        """The k closest active rows within max_radius km, nearest first.
+
+        The search radius doubles from ``start_radius`` until k rows fall inside
+        it. Each ring only reads cells not visited by a smaller ring, and
+        selection uses a bounded heap instead of sorting every candidate.
+        Returns ``([(slot, distance_km)], scanned)``.
+        """
+        seen = []
+        scanned = 0
+        for radius, fresh in self._rings(lat, lon, max_radius, start_radius):
+            scanned += len(fresh)
+            seen.extend(self._distances(lat, lon, fresh))
+
+            # Everything within `radius` lives in a visited cell, so these
+            # k are final once there are enough of them
+            best = heapq.nsmallest(k, seen, key=lambda item: item[1])
+            if len(best) == k and best[-1][1] <= radius:
+                break
+        return [item for item in best if item[1] <= max_radius], scanned
+
+    def nearest_preferred(self, lat, lon, k, max_radius, prefer, minimum=1, start_radius=1.0):
+        """nearest() where only rows whose id passes ``prefer`` count towards k.
+
+        The other rows met on the way are kept aside; when fewer than
+        ``minimum`` preferred rows lie within max_radius the closest of them
+        make up the difference. Returns ``([(slot, distance_km)], passed_over,
+        scanned)`` where ``passed_over`` counts the other rows inside the
+        final search radius that were left out.
+        """
+        preferred, others = [], []
+        scanned = 0
+        for radius, fresh in self._rings(lat, lon, max_radius, start_radius):
+            scanned += len(fresh)
+            for slot, distance in self._distances(lat, lon, fresh):
+                (preferred if prefer(self.ids[slot]) else others).append((slot, distance))
+            best = heapq.nsmallest(k, preferred, key=lambda item: item[1])
+            if len(best) == k and best[-1][1] <= radius:
+                break
+        best = [item for item in best if item[1] <= max_radius]
+        others = [item for item in others if item[1] <= radius]
+        fill = heapq.nsmallest(max(0, min(minimum, k) - len(best)), others, key=lambda item: item[1])
+        return sorted(best + fill, key=lambda item: item[1]), len(others) - len(fill), scanned
@@ -0,0 +1,412 @@
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from datetime import datetime
+
+from distance import np, within_radius
+from geo_index import parse_region
+
+logger = logging.getLogger(__name__)
+
+# One incident, little-endian, 76 bytes: time, 64-bit geohash, position in
+# microdegrees, outbox job id, helper counts, search radius / k, flags and
+# stage durations in microseconds
+RECORD = struct.Struct('<dQii16sIIIfHBxIIII')
+# The fields queries filter on, for reading whole blocks with NumPy
+RECORD_DTYPE = np.dtype({'names': ['ts', 'code', 'lat', 'lon'], 'formats': ['<f8', '<u8', '<i4', '<i4'],
+                         'offsets': [0, 8, 16, 20], 'itemsize': RECORD.size}) if np is not None else None
+STAGES = ('registry_sync', 'helper_search', 'outbox_enqueue', 'total')
+
+COALESCED = 1
+BATCH = 2
+K_NEAREST = 4
+
+# The geohash index keys blocks by the first INDEX_BITS bits of the code:
+# 13 bits each of longitude and latitude, cells of 0.044 x 0.022 degrees
+# (about 5 x 2.5 km), so a town-sized query covers a few dozen cells
+INDEX_BITS = 26
+# Larger query boxes skip the geohash index and rely on the time index
+MAX_COVER_CELLS = 4096
+
+SEGMENT_NAME = re.compile(r'^incidents-(\d{6})\.log$')
+INDEX_VERSION = 2
+
+
+class IncidentQueryError(ValueError):
+    pass
+
+
+def _spread(value):
+    # Moves bit i of a 32-bit value to bit 2i
+    value &= 0xFFFFFFFF
+    value = (value | (value << 16)) & 0x0000FFFF0000FFFF
+    value = (value | (value << 8)) & 0x00FF00FF00FF00FF
+    value = (value | (value << 4)) & 0x0F0F0F0F0F0F0F0F
+    value = (value | (value << 2)) & 0x3333333333333333
+    return (value | (value << 1)) & 0x5555555555555555
+
+
+def _quantize(value, low, span, bits):
+    return min((1 << bits) - 1, max(0, int((value - low) / span * (1 << bits))))
+
+
+def geohash_code(lat, lon):
+    # 64-bit interleaved geohash, longitude bit first as in text geohashes
+    return (_spread(_quantize(lon, -180.0, 360.0, 32)) << 1) | _spread(_quantize(lat, -90.0, 180.0, 32))
+
+
+def index_cell(code):
+    return code >> (64 - INDEX_BITS)
+
+
+def cover_cells(bbox):
+    """Index cells overlapping (min_lat, min_lon, max_lat, max_lon), or None
+    when the box spans more than MAX_COVER_CELLS of them."""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    bits = INDEX_BITS // 2
+    # A box crossing the antimeridian has max_lon > 180
+    lon_ranges = [(min_lon, min(max_lon, 180.0))]
+    if max_lon > 180:
+        lon_ranges.append((-180.0, max_lon - 360))
+    lat_low = _quantize(min_lat, -90.0, 180.0, bits)
+    lat_high = _quantize(max_lat, -90.0, 180.0, bits)
+    columns = []
+    for low, high in lon_ranges:
+        columns.extend(range(_quantize(low, -180.0, 360.0, bits), _quantize(high, -180.0, 360.0, bits) + 1))
+    if len(columns) * (lat_high - lat_low + 1) > MAX_COVER_CELLS:
+        return None
+    return {(_spread(x) << 1) | _spread(y) for x in columns for y in range(lat_low, lat_high + 1)}
+
+
+def _parse_time(value, name):
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise IncidentQueryError(f"'{name}' must be epoch seconds or an ISO 8601 time")
+    if moment.tzinfo is None:
+        raise IncidentQueryError(f"'{name}' needs a UTC offset")
+    return moment.timestamp()
+
+
+def parse_incident_query(args, max_limit=100000):
+    """Reads /incidents query parameters.
+
+    from=, to=      epoch seconds or ISO 8601 with offset; `to` is exclusive
+    bbox=minLat,minLng,maxLat,maxLng  or  lat=..&lng=..&radius=<km>
+    limit=<n>       stop after n incidents (at most max_limit)
+    """
+    params = {'start': None, 'end': None, 'bbox': None, 'center': None, 'radius': None, 'limit': None}
+    if args.get('from'):
+        params['start'] = _parse_time(args['from'], 'from')
+    if args.get('to'):
+        params['end'] = _parse_time(args['to'], 'to')
+
+    params['bbox'], params['center'], params['radius'] = parse_region(args, IncidentQueryError)
+
+    if args.get('limit'):
+        try:
+            params['limit'] = int(args['limit'])
+        except ValueError:
+            raise IncidentQueryError("'limit' must be an integer")
+        if not 1 <= params['limit'] <= max_limit:
+            raise IncidentQueryError(f"'limit' must be between 1 and {max_limit}")
+    return params
+
+
+def _in_box(lat, lon, bbox):
+    min_lat, min_lon, max_lat, max_lon = bbox
+    if not min_lat <= lat <= max_lat:
+        return False
+    if max_lon > 180:
+        return lon >= min_lon or lon <= max_lon - 360
+    return min_lon <= lon <= max_lon
+
+
+def _matching(data, start, end, bbox):
+    # Records in `data` inside [start, end) and bbox, as RECORD tuples
+    if np is None:
+        return [fields for fields in RECORD.iter_unpack(data)
+                if (start is None or fields[0] >= start) and (end is None or fields[0] < end)
+                and (bbox is None or _in_box(fields[2] / 1e6, fields[3] / 1e6, bbox))]
+    rows = np.frombuffer(data, RECORD_DTYPE)
+    mask = np.ones(len(rows), dtype=bool)
+    if start is not None:
+        mask &= rows['ts'] >= start
+    if end is not None:
+        mask &= rows['ts'] < end
+    if bbox is not None:
+        min_lat, min_lon, max_lat, max_lon = (round(v * 1e6) for v in bbox)
+        lats, lons = rows['lat'], rows['lon']
+        mask &= (lats >= min_lat) & (lats <= max_lat)
+        if max_lon > 180000000:
+            mask &= (lons >= min_lon) | (lons <= max_lon - 360000000)
+        else:
+            mask &= (lons >= min_lon) & (lons <= max_lon)
+    return [RECORD.unpack_from(data, i * RECORD.size) for i in np.flatnonzero(mask).tolist()]
+
+
+def decode(fields):
+    # The job id stays in the file: it opens /sos_status and the victim's
+    # live stream, so it is never part of a query result
+    ts, _, lat, lon, _, found, queued, stale, radius, k, flags, *stages = fields
+    return {
+        'time': ts,
+        'latitude': lat / 1e6,
+        'longitude': lon / 1e6,
+        'helpersFound': found,
+        'helpersQueued': queued,
+        'staleSkipped': stale,
+        'radiusKm': round(radius, 3),
+        'k': k or None,
+        'coalesced': bool(flags & COALESCED),
+        'batch': bool(flags & BATCH),
+        'stagesMs': {name: us / 1000 for name, us in zip(STAGES, stages)},
+    }
+
+
+def pack_incident(location, job_id, found, queued, stale=0, radius=0.0, k=0, flags=0, stages=None, ts=None):
+    # One record; ``stages`` maps STAGES names to seconds
+    lat, lon = float(location['latitude']), float(location['longitude'])
+    try:
+        job = bytes.fromhex(job_id)
+    except (TypeError, ValueError):
+        job = b''
+    stages = stages or {}
+    return RECORD.pack(
+        ts or time.time(), geohash_code(lat, lon), round(lat * 1e6), round(lon * 1e6),
+        job, min(found, 0xFFFFFFFF), min(queued, 0xFFFFFFFF), min(stale, 0xFFFFFFFF), radius,
+        min(k or 0, 0xFFFF), flags,
+        *(min(0xFFFFFFFF, int((stages.get(name) or 0) * 1e6)) for name in STAGES)
+    )
+
+
+class Segment:
+    """Block index over one segment file.
+
+    Every ``block_records`` records form a block; the time index keeps each
+    block's min and max timestamp (appends from several processes are only
+    roughly in time order) and the geohash index maps index cells to the
+    blocks holding incidents there. Segments only grow, so ``refresh``
+    reads just the records appended since the last call. Sealed segments
+    save the index next to the file.
+    """
+
+    def __init__(self, path, block_records):
+        self.path = path
+        self.index_path = path[:-len('.log')] + '.idx'
+        self.block_records = block_records
+        self.records = 0
+        self.min_ts = array('d')
+        self.max_ts = array('d')
+        self.cells = {}
+        self.saved_records = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get('version') != INDEX_VERSION or saved.get('block') != self.block_records:
+            return
+        self.records = self.saved_records = saved['records']
+        self.min_ts = array('d', saved['min_ts'])
+        self.max_ts = array('d', saved['max_ts'])
+        self.cells = {int(cell): array('I', blocks) for cell, blocks in saved['cells'].items()}
+
+    def save(self):
+        with self._lock:
+            if self.records == self.saved_records:
+                return
+            data = {'version': INDEX_VERSION, 'block': self.block_records, 'records': self.records,
+                    'min_ts': self.min_ts.tolist(), 'max_ts': self.max_ts.tolist(),
+                    'cells': {str(cell): blocks.tolist() for cell, blocks in self.cells.items()}}
+            temp = f'{self.index_path}.{os.getpid()}.tmp'
+            with open(temp, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp, self.index_path)
+            self.saved_records = self.records
+
+    def refresh(self):
+        with self._lock:
+            # A torn tail (crash mid-append) is never counted
+            complete = os.path.getsize(self.path) // RECORD.size
+            if complete <= self.records:
+                return
+            with open(self.path, 'rb') as f:
+                f.seek(self.records * RECORD.size)
+                while self.records < complete:
+                    count = min(complete - self.records, self.block_records - self.records % self.block_records)
+                    self._add_block_part(f.read(count * RECORD.size))
+
+    def _add_block_part(self, data):
+        # Records that all fall in one block, possibly one already started
+        block = self.records // self.block_records
+        if np is not None:
+            rows = np.frombuffer(data, RECORD_DTYPE)
+            low, high = float(rows['ts'].min()), float(rows['ts'].max())
+            cells = np.unique(rows['code'] >> np.uint64(64 - INDEX_BITS)).tolist()
+        else:
+            times, cells = [], set()
+            for fields in RECORD.iter_unpack(data):
+                times.append(fields[0])
+                cells.add(index_cell(fields[1]))
+            low, high = min(times), max(times)
+        if block == len(self.min_ts):
+            self.min_ts.append(low)
+            self.max_ts.append(high)
+        else:
+            self.min_ts[block] = min(self.min_ts[block], low)
+            self.max_ts[block] = max(self.max_ts[block], high)
+        for cell in cells:
+            blocks = self.cells.setdefault(cell, array('I'))
+            if not blocks or blocks[-1] != block:
+                blocks.append(block)
+        self.records += len(data) // RECORD.size
+
+    def blocks(self, start=None, end=None, cells=None):
+        # Block numbers that may hold matches, in file order
+        start = float('-inf') if start is None else start
+        end = float('inf') if end is None else end
+        candidates = None
+        if cells is not None:
+            candidates = set()
+            for cell in cells:
+                candidates.update(self.cells.get(cell, ()))
+        return [block for block in (range(len(self.min_ts)) if candidates is None else sorted(candidates))
+                if self.max_ts[block] >= start and self.min_ts[block] < end]
+
+    def read_block(self, f, block):
+        # Only the records indexed so far; later appends wait for refresh()
+        first = block * self.block_records
+        count = min(self.block_records, self.records - first)
+        f.seek(first * RECORD.size)
+        return f.read(count * RECORD.size)
+
+
+class IncidentLog:
+    """Append-only SOS incident log in fixed-width binary records.
+
+    Each process appends whole records to the newest ``incidents-NNNNNN.log``
+    file opened with O_APPEND, so concurrent writers never interleave
+    partial records, and moves on to a new segment once it holds
+    ``segment_records``. Queries refresh each segment's block index (see
+    Segment), read only the blocks the time and geohash indexes point at
+    and yield matches one at a time, so memory use does not grow with the
+    log. Nothing is fsynced: the log is for analysis, not the SOS path.
+    """
+
+    def __init__(self, directory, segment_records=1000000, block_records=512):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.block_records = block_records
+        self._fd = None
+        self._segment = None
+        self._segments = {}
+        self._lock = threading.Lock()
+        self.appended = 0
+        self.failures = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, number):
+        return os.path.join(self.directory, f'incidents-{number:06d}.log')
+
+    def segment_numbers(self):
+        return sorted(int(match.group(1)) for match in map(SEGMENT_NAME.match, os.listdir(self.directory))
+                      if match)
+
+    def _open(self, skip_current=False):
+        numbers = self.segment_numbers()
+        number = numbers[-1] if numbers else 0
+        if numbers and (skip_current or os.path.getsize(self._path(number)) >= self.segment_records * RECORD.size):
+            number += 1
+        self._fd = os.open(self._path(number), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._segment = number
+
+    # Writes
+
+    def append(self, *records):
+        # Records from pack_incident(), written in one call so they stay together
+        data = b''.join(records)
+        with self._lock:
+            try:
+                if self._fd is None:
+                    self._open()
+                written = os.write(self._fd, data)
+                end = os.lseek(self._fd, 0, os.SEEK_CUR)
+            except OSError as e:
+                self.failures += 1
+                logger.error(f"Incident log write failed: {str(e)}")
+                self._close()
+                return False
+            if written != len(data):
+                # A short write leaves a partial record; later records go to
+                # a fresh segment so they stay aligned
+                self.failures += 1
+                logger.error(f"Incident log short write ({written} of {len(data)} bytes)")
+                self._close()
+                self._open(skip_current=True)
+                return False
+            self.appended += len(records)
+            if end >= self.segment_records * RECORD.size:
+                self._close()
+        return True
+
+    def _close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    # Reads
+
+    def _segment_index(self, number):
+        segment = self._segments.get(number)
+        if segment is None:
+            segment = self._segments.setdefault(number, Segment(self._path(number), self.block_records))
+        return segment
+
+    def query(self, start=None, end=None, bbox=None, center=None, radius=None, limit=None):
+        """Yields incidents (see decode()) with start <= time < end inside
+        bbox and, with center and radius, within radius km of center, in
+        file order."""
+        cells = cover_cells(bbox) if bbox is not None else None
+        numbers = self.segment_numbers()
+        count = 0
+        for number in numbers:
+            segment = self._segment_index(number)
+            segment.refresh()
+            if number != numbers[-1]:
+                segment.save()
+            blocks = segment.blocks(start, end, cells)
+            if not blocks:
+                continue
+            with open(segment.path, 'rb') as f:
+                for block in blocks:
+                    matches = _matching(segment.read_block(f, block), start, end, bbox)
+                    if radius is not None and matches:
+                        hits, _ = within_radius(center[0], center[1], [m[2] / 1e6 for m in matches],
+                                                [m[3] / 1e6 for m in matches], radius)
+                        matches = [matches[i] for i in hits]
+                    for fields in matches:
+                        yield decode(fields)
+                        count += 1
+                        if limit is not None and count >= limit:
+                            return
+
+    def stats(self):
+        return {'appended': self.appended, 'failures': self.failures, 'segment': self._segment}
@@ -0,0 +1,192 @@
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Rows read per tailer pass; a full batch means more are waiting
+TAIL_BATCH = 1000
+
+
+class TrackerFull(Exception):
+    """Raised when a process already serves its maximum number of live streams."""
+
+
+class Subscriber:
+    """Points waiting to be written to one live stream.
+
+    At most ``max_pending`` are held. A reader that falls behind loses the
+    oldest ones - only the latest position matters - and is told how many
+    were skipped, so a slow helper never holds memory or slows the others.
+    """
+
+    def __init__(self, job_id, max_pending=20, last_id=0):
+        self.job_id = job_id
+        self.last_id = last_id
+        self.dropped = 0
+        self.total_dropped = 0
+        self._pending = deque(maxlen=max_pending)
+        self._cond = threading.Condition()
+
+    def push(self, point):
+        with self._cond:
+            if point['id'] <= self.last_id:
+                return False
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+                self.total_dropped += 1
+            self._pending.append(point)
+            self.last_id = point['id']
+            self._cond.notify()
+            return True
+
+    def get(self, timeout):
+        # (points, skipped since the last call); no points on timeout
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+            points = list(self._pending)
+            self._pending.clear()
+            dropped, self.dropped = self.dropped, 0
+        return points, dropped
+
+
+class LiveTracker:
+    """Fans live SOS positions out to the streams open in this process.
+
+    Positions are written to the outbox database, so every server process
+    sees them: one tailer thread per process reads new rows by id and pushes
+    each to the local subscribers of its job. The tailer runs only while a
+    stream is open; publishing wakes it so local subscribers get updates
+    immediately, others within ``poll_interval``. Each followed job keeps a
+    ring buffer of its last ``buffer_size`` points, replayed to late or
+    reconnecting subscribers (``last_id`` is the SSE Last-Event-ID).
+    """
+
+    def __init__(self, store, buffer_size=50, max_pending=20, max_subscribers=64, poll_interval=0.5):
+        self.store = store
+        self.buffer_size = buffer_size
+        self.max_pending = max_pending
+        self.max_subscribers = max_subscribers
+        self.poll_interval = poll_interval
+        self._tracks = {}
+        self._subscribers = {}
+        self._count = 0
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._tailer = None
+        self.published = 0
+        self.pushed = 0
+        self.dropped = 0
+
+    def publish(self, job_id, points):
+        rows = self.store.add_track_points(job_id, points)
+        self.published += len(rows)
+        self._wakeup.set()
+        return rows
+
+    def subscribe(self, job_id, last_id=0):
+        subscriber = Subscriber(job_id, self.max_pending, last_id)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TrackerFull(f"{self._count} live streams already open")
+            if self._tailer is None:
+                self._last_id = self.store.last_track_point_id()
+                self._tailer = threading.Thread(target=self._tail, name='live-tracker', daemon=True)
+                self._tailer.start()
+            track = self._tracks.get(job_id)
+            if track is None:
+                track = self._tracks[job_id] = deque(
+                    self.store.track_points(job_id, limit=self.buffer_size), maxlen=self.buffer_size
+                )
+            # The backlog goes in before the tailer can see the subscriber,
+            # which would otherwise push a newer point and hide older ones
+            for point in track:
+                if point['id'] > last_id:
+                    subscriber.push(point)
+            self._subscribers.setdefault(job_id, set()).add(subscriber)
+            self._count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.job_id)
+            if not subscribers or subscriber not in subscribers:
+                return
+            subscribers.discard(subscriber)
+            self._count -= 1
+            self.dropped += subscriber.total_dropped
+            if not subscribers:
+                # Nobody here follows the job any more; its buffer is refilled
+                # from the database by the next subscriber
+                del self._subscribers[subscriber.job_id]
+                del self._tracks[subscriber.job_id]
+
+    def _tail(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self._lock:
+                if not self._count:
+                    self._tailer = None
+                    return
+                after_id = self._last_id
+            try:
+                rows = self.store.track_points(after_id=after_id, limit=TAIL_BATCH)
+            except Exception as e:
+                logger.error(f"Live tracker read error: {str(e)}")
+                continue
+            if not rows:
+                continue
+            if len(rows) == TAIL_BATCH:
+                self._wakeup.set()
+            with self._lock:
+                self._last_id = max(self._last_id, rows[-1]['id'])
+                deliveries = []
+                for row in rows:
+                    track = self._tracks.get(row['job_id'])
+                    if track is None:
+                        continue
+                    if not track or track[-1]['id'] < row['id']:
+                        track.append(row)
+                    deliveries.extend((subscriber, row) for subscriber in self._subscribers[row['job_id']])
+            for subscriber, row in deliveries:
+                if subscriber.push(row):
+                    self.pushed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': self._count,
+                'jobs': len(self._tracks),
+                'published': self.published,
+                'pushed': self.pushed,
+                'dropped': self.dropped + sum(s.total_dropped for subs in self._subscribers.values() for s in subs)
+            }
+
+
+def parse_track_points(data, max_points=100):
+    """Validates a position update: one ``latitude``/``longitude`` (plus
+    optional ``accuracy`` in metres) or a ``points`` list of them, e.g. a
+    backlog sent after the phone regained signal. Raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    raw = data.get('points', [data])
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("'points' must be a non-empty list")
+    if len(raw) > max_points:
+        raise ValueError(f"At most {max_points} points per update")
+    points = []
+    for item in raw:
+        try:
+            latitude = float(item['latitude'])
+            longitude = float(item['longitude'])
+            accuracy = item.get('accuracy')
+            accuracy = None if accuracy is None else float(accuracy)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError("Each point needs numeric 'latitude' and 'longitude'")
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError("Coordinates out of range")
+        points.append({'latitude': latitude, 'longitude': longitude, 'accuracy': accuracy})
+    return points
@@ -0,0 +1,168 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# Chatty third-party loggers kept quiet unless LOG_LEVELS says otherwise
+DEFAULT_LEVELS = {
+    'urllib3': 'WARNING',
+    'geopy': 'WARNING',
+    'sqlalchemy.engine': 'WARNING',
+}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+_lock = threading.Lock()
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; ``extra=`` fields become top-level keys."""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread without ever waiting on I/O.
+
+    Messages are rendered here (so arguments can't change under the writer)
+    but formatting into JSON or text happens on the listener thread. When the
+    queue is full the record is dropped and counted instead of blocking.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The record was created for this call and nothing else holds it, so
+        # it is updated in place instead of copied
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_levels(spec):
+    # "geopy=WARNING,app=DEBUG" -> {'geopy': 'WARNING', 'app': 'DEBUG'}
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level=None, levels=None, log_file=None, fmt=None, queue_size=None):
+    """Routes all logging through a queue drained by one background writer.
+
+    Settings default to the environment: LOG_LEVEL (root level, INFO),
+    LOG_LEVELS (per-logger overrides, ``name=LEVEL,...``), LOG_FILE (extra
+    file output, empty to disable), LOG_FORMAT (``json`` or ``text``) and
+    LOG_QUEUE_SIZE. Calling it again replaces the previous setup.
+    """
+    global _listener
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    overrides = dict(DEFAULT_LEVELS)
+    overrides.update(levels if levels is not None else parse_levels(os.getenv('LOG_LEVELS')))
+    log_file = os.getenv('LOG_FILE', '') if log_file is None else log_file
+    fmt = (fmt or os.getenv('LOG_FORMAT', 'json')).lower()
+    queue_size = int(queue_size or os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+    formatter = JSONFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT)
+    outputs = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        outputs.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for output in outputs:
+        output.setFormatter(formatter)
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+        log_queue = queue.Queue(maxsize=queue_size)
+        handler = NonBlockingQueueHandler(log_queue)
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level)
+        for name, logger_level in overrides.items():
+            logging.getLogger(name).setLevel(logger_level)
+
+        _listener = QueueListener(log_queue, *outputs, respect_handler_level=True)
+        _listener.start()
+    return handler
+
+
+def stop_logging():
+    # Flushes whatever is still queued; registered to run at exit
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(stop_logging)
+
+
+class LogSampler:
+    """Rate-limits a repeating event to one line per key per ``interval``.
+
+    Meant for per-item events inside hot loops (per-helper, per-message).
+    The first occurrence is logged; repeats inside the window are counted and
+    reported as ``suppressed`` on the next line that gets through.
+    """
+
+    def __init__(self, logger, interval=10.0):
+        self.logger = logger
+        self.interval = interval
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def log(self, level, key, msg, *args, **extra):
+        if not self.logger.isEnabledFor(level):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and now - window[0] < self.interval:
+                window[1] += 1
+                return False
+            suppressed = window[1] if window is not None else 0
+            self._windows[key] = [now, 0]
+        if suppressed:
+            extra['suppressed'] = suppressed
+        self.logger.log(level, msg, *args, extra=extra)
+        return True
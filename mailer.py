@@ -0,0 +1,193 @@
+import contextvars
+import logging
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from logging_setup import LogSampler
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+# An unreachable server fails every message the same way; log each kind of
+# failure once per window instead of once per recipient
+failure_log = LogSampler(logger, interval=10.0)
+
+
+def build_sos_message(sender, recipient, location, distance, track_url=None):
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = recipient
+    msg['Subject'] = "EMERGENCY SOS ALERT!"
+
+    body = f"""
+        EMERGENCY ALERT - Someone needs help!
+
+        Location Details:
+        Latitude: {location['latitude']}
+        Longitude: {location['longitude']}
+        Distance from you: {distance:.2f} km
+
+        Google Maps Link:
+        https://www.google.com/maps?q={location['latitude']},{location['longitude']}
+
+        Please respond if you can help!
+        """
+    if track_url:
+        body += f"""
+        Live location (updates as they move):
+        {track_url}
+        """
+
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+class SMTPConnectionPool:
+    """Bounded pool of authenticated SMTP sessions.
+
+    At most ``size`` connections exist at once. Sessions are reused across
+    messages so STARTTLS and LOGIN only happen when a connection is opened.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 size=4, timeout=10, idle_timeout=60, smtp_class=smtplib.SMTP):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._smtp_class = smtp_class
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _connect(self):
+        with stage('smtp_connect'):
+            server = self._smtp_class(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                with stage('smtp_starttls'):
+                    server.starttls()
+            if self.username and self.password:
+                with stage('smtp_login'):
+                    server.login(self.username, self.password)
+        except Exception:
+            self._discard(server)
+            raise
+        return server
+
+    def _discard(self, server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _checkout(self):
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < self.idle_timeout:
+                return server
+            # Servers drop idle sessions; don't gamble on a stale one
+            self._discard(server)
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("Timed out waiting for a free SMTP connection")
+        server = None
+        try:
+            server = self._checkout()
+            yield server
+        except Exception:
+            if server is not None:
+                self._discard(server)
+                server = None
+            raise
+        finally:
+            if server is not None:
+                if self._closed:
+                    self._discard(server)
+                else:
+                    self._idle.put((server, time.monotonic()))
+            self._slots.release()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(server)
+
+
+class SOSMailDispatcher:
+    """Sends messages in parallel over a shared SMTPConnectionPool.
+
+    Every blocking socket call of a send is bounded by ``message_timeout``,
+    so each send finishes (or fails) on its own; nothing is abandoned while
+    it may still reach the server.
+    """
+
+    def __init__(self, pool, concurrency=4, message_timeout=30):
+        self.pool = pool
+        self.concurrency = concurrency
+        self.message_timeout = message_timeout
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='sos-mail')
+
+    def send(self, msg):
+        # One retry on a fresh connection if a pooled session was dropped
+        for attempt in range(2):
+            try:
+                with self.pool.connection() as server:
+                    # Pooled sessions were opened with the connect timeout
+                    if getattr(server, 'sock', None) is not None:
+                        server.sock.settimeout(self.message_timeout)
+                    with stage('smtp_send'):
+                        server.send_message(msg)
+                return True
+            except smtplib.SMTPServerDisconnected:
+                if attempt:
+                    raise
+        return False
+
+    def _send_logged(self, msg):
+        try:
+            return self.send(msg), None
+        except Exception as e:
+            failure_log.log(logging.ERROR, type(e).__name__, f"Email error to {msg['To']}: {str(e)}")
+            return False, str(e)
+
+    def send_batch(self, messages):
+        # Returns one (ok, error) pair per message, in order. Waits for every
+        # send: a message only counts as failed once its own send has failed
+        # (a socket timeout included), so a retry never duplicates an email
+        # that was still on its way.
+        if not messages:
+            return []
+        # Each task runs in a copy of the caller's context so stage timings
+        # keep the caller's route label
+        futures = [self._executor.submit(contextvars.copy_context().run, self._send_logged, msg)
+                   for msg in messages]
+        return [future.result() for future in futures]
+
+    def send_many(self, messages):
+        return [ok for ok, _ in self.send_batch(messages)]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        self.pool.close()
@@ -0,0 +1,218 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator, contextmanager
+from contextvars import ContextVar
+
+# Seconds; spans cache hits (sub-millisecond) to SMTP/Nominatim timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Route label for stages timed outside a request (workers, background threads)
+current_route = ContextVar('current_route', default='background')
+
+# {stage: seconds} summed over the current request (set per request by the
+# app), so a route can store its own stage timings; None elsewhere
+current_stages = ContextVar('current_stages', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_labels(self.labelnames, key)} {_number(value)}')
+        return lines
+
+
+class Gauge:
+    # Read at scrape time from `function`, which returns a number or a
+    # {label_values_tuple: number} dict
+    def __init__(self, name, documentation, function, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        values = self.function()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{_labels(self.labelnames, key)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; one observation is a bisect and a locked add."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", _number(bound))])} '
+                             f'{cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, function, labelnames=()):
+        return self._add(Gauge(name, documentation, function, labelnames))
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ('route', 'method', 'status')
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    'sos_stage_duration_seconds', 'Time spent in each pipeline stage', ('route', 'stage')
+)
+HELPERS_SCANNED = REGISTRY.counter(
+    'sos_helpers_scanned_total', 'Helpers whose distance was computed', ('route',)
+)
+HELPERS_MATCHED = REGISTRY.counter(
+    'sos_helpers_matched_total', 'Helpers found within the search radius', ('route',)
+)
+HELPERS_STALE_SKIPPED = REGISTRY.counter(
+    'sos_helpers_stale_skipped_total', 'Helpers in range not notified because they sent no recent heartbeat',
+    ('route',)
+)
+PRESENCE_FALLBACKS = REGISTRY.counter(
+    'sos_presence_fallbacks_total', 'Searches that found too few present helpers and added stale ones',
+    ('route',)
+)
+HELPERS_NOTIFIED = REGISTRY.counter(
+    'sos_helpers_notified_total', 'SOS notification attempts by outcome', ('result',)
+)
+
+
+class stage(ContextDecorator):
+    """Times a block into sos_stage_duration_seconds.
+
+    Also usable as a decorator. ``route`` defaults to the route of the request
+    being served, or ``background`` outside a request. A plain class rather
+    than a generator keeps the cost to a few microseconds per block.
+    """
+
+    __slots__ = ('name', 'route', '_start')
+
+    def __init__(self, name, route=None):
+        self.name = name
+        self.route = route
+
+    def _recreate_cm(self):
+        # Fresh instance per decorated call, so threads don't share _start
+        return stage(self.name, self.route)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._start
+        STAGE_SECONDS.observe(elapsed, route=self.route or current_route.get(), stage=self.name)
+        stages = current_stages.get()
+        if stages is not None:
+            stages[self.name] = stages.get(self.name, 0.0) + elapsed
+        return False
+
+
+@contextmanager
+def route(name):
+    # Labels stages timed inside the block (and in contexts copied from it)
+    token = current_route.set(name)
+    try:
+        yield
+    finally:
+        current_route.reset(token)
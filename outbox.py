@@ -0,0 +1,427 @@
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from distance import haversine_batch
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sos_jobs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    location TEXT NOT NULL,
+    client_key TEXT,
+    idempotency_key TEXT,
+    track_token TEXT
+);
+CREATE TABLE IF NOT EXISTS sos_deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES sos_jobs(id),
+    helper_id INTEGER,
+    email TEXT NOT NULL,
+    distance REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sos_deliveries_job ON sos_deliveries (job_id);
+CREATE INDEX IF NOT EXISTS ix_sos_deliveries_due ON sos_deliveries (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS sos_track_points (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES sos_jobs(id),
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    accuracy REAL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sos_track_points_job ON sos_track_points (job_id, id);
+CREATE TABLE IF NOT EXISTS sos_idempotency_keys (
+    idempotency_key TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL REFERENCES sos_jobs(id),
+    created_at REAL NOT NULL
+);
+"""
+
+# Applied after SCHEMA so outboxes created before these columns existed catch up
+UPGRADES = (
+    ('sos_jobs', 'client_key', 'ALTER TABLE sos_jobs ADD COLUMN client_key TEXT'),
+    ('sos_jobs', 'idempotency_key', 'ALTER TABLE sos_jobs ADD COLUMN idempotency_key TEXT'),
+    ('sos_jobs', 'track_token', 'ALTER TABLE sos_jobs ADD COLUMN track_token TEXT'),
+)
+UPGRADE_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS ux_sos_jobs_idempotency ON sos_jobs (idempotency_key);
+CREATE INDEX IF NOT EXISTS ix_sos_jobs_client ON sos_jobs (client_key, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_sos_deliveries_job_email ON sos_deliveries (job_id, email);
+"""
+
+
+def _job_for_key(conn, idempotency_key):
+    # Keys live in sos_idempotency_keys; outboxes written before it existed
+    # kept them on sos_jobs
+    row = conn.execute(
+        'SELECT job_id FROM sos_idempotency_keys WHERE idempotency_key = ? '
+        'UNION ALL SELECT id FROM sos_jobs WHERE idempotency_key = ? LIMIT 1',
+        (idempotency_key, idempotency_key)
+    ).fetchone()
+    return row[0] if row else None
+
+# Delivery states: pending -> sending -> sent | failed (pending again on retry)
+PENDING, SENDING, SENT, FAILED = 'pending', 'sending', 'sent', 'failed'
+
+
+class Outbox:
+    """SQLite-backed outbox of SOS email deliveries.
+
+    ``send_sos`` writes a job plus one delivery row per helper and returns;
+    OutboxWorker threads claim due deliveries and record the outcome. A claim is
+    a lease that the worker renews while it is sending: deliveries left in
+    ``sending`` by a crashed worker become due again once ``lease_seconds``
+    pass.
+    """
+
+    def __init__(self, path, max_attempts=5, backoff_base=2.0, backoff_max=300.0, lease_seconds=60.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        conn = self._connect().conn
+        conn.executescript(SCHEMA)
+        for table, column, ddl in UPGRADES:
+            if column not in {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}:
+                conn.execute(ddl)
+        conn.executescript(UPGRADE_INDEXES)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def enqueue(self, location, helpers, client_key=None, idempotency_key=None):
+        job_id, _, _ = self.submit(location, helpers, client_key, idempotency_key)
+        return job_id
+
+    def find_by_idempotency_key(self, idempotency_key):
+        with self._connect() as conn:
+            return _job_for_key(conn, idempotency_key)
+
+    def submit(self, location, helpers, client_key=None, idempotency_key=None,
+               coalesce_window=0, coalesce_distance_km=0):
+        """Creates a job, or attaches to one that already covers this SOS.
+
+        A repeated ``idempotency_key`` returns its job untouched. Otherwise the
+        newest job from ``client_key`` younger than ``coalesce_window`` seconds
+        and within ``coalesce_distance_km`` is reused, and only helpers not yet
+        queued for it are added. The key is recorded against whichever job
+        the request ends up in, so a retry finds it either way. Lookup and insert share one write transaction
+        so simultaneous repeats cannot both start a fan-out.
+        Returns ``(job_id, coalesced, helpers_added)``.
+        """
+        lat, lon = float(location['latitude']), float(location['longitude'])
+        now = time.time()
+        with self._connect() as conn:
+            if idempotency_key:
+                job_id = _job_for_key(conn, idempotency_key)
+                if job_id:
+                    return job_id, True, 0
+
+            job_id = None
+            if client_key and coalesce_window > 0:
+                rows = conn.execute(
+                    'SELECT id, latitude, longitude FROM sos_jobs WHERE client_key = ? AND created_at >= ? '
+                    'ORDER BY created_at DESC',
+                    (client_key, now - coalesce_window)
+                ).fetchall()
+                if rows:
+                    distances = haversine_batch(lat, lon, [row['latitude'] for row in rows],
+                                                [row['longitude'] for row in rows])
+                    job_id = next((row['id'] for row, distance in zip(rows, distances)
+                                   if distance <= coalesce_distance_km), None)
+
+            coalesced = job_id is not None
+            if not coalesced:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    'INSERT INTO sos_jobs (id, created_at, latitude, longitude, location, client_key, track_token) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (job_id, now, lat, lon, json.dumps(location), client_key, uuid.uuid4().hex)
+                )
+            if idempotency_key:
+                # sos_jobs holds one key per job; coalesced requests bring more
+                conn.execute(
+                    'INSERT INTO sos_idempotency_keys (idempotency_key, job_id, created_at) VALUES (?, ?, ?)',
+                    (idempotency_key, job_id, now)
+                )
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO sos_deliveries (job_id, helper_id, email, distance, next_attempt_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(job_id, h.get('id'), h['email'], h['distance'], now, now) for h in helpers]
+            )
+            added = conn.total_changes - before
+        if added:
+            self._wakeup.set()
+        return job_id, coalesced, added
+
+    def enqueue_many(self, jobs):
+        # [(location, helpers)] -> [job_id], all written in one transaction
+        now = time.time()
+        job_ids = [uuid.uuid4().hex for _ in jobs]
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT INTO sos_jobs (id, created_at, latitude, longitude, location, track_token) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(job_id, now, float(location['latitude']), float(location['longitude']), json.dumps(location),
+                  uuid.uuid4().hex)
+                 for job_id, (location, _) in zip(job_ids, jobs)]
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO sos_deliveries (job_id, helper_id, email, distance, next_attempt_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(job_id, h.get('id'), h['email'], h['distance'], now, now)
+                 for job_id, (_, helpers) in zip(job_ids, jobs) for h in helpers]
+            )
+        self._wakeup.set()
+        return job_ids
+
+    def claim(self, limit=20):
+        # Leases up to `limit` due deliveries to the calling worker
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT d.id, d.job_id, d.helper_id, d.email, d.distance, d.attempts, j.location '
+                'FROM sos_deliveries d JOIN sos_jobs j ON j.id = d.job_id '
+                'WHERE d.status IN (?, ?) AND d.next_attempt_at <= ? '
+                'ORDER BY d.next_attempt_at LIMIT ?',
+                (PENDING, SENDING, now, limit)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    'UPDATE sos_deliveries SET status = ?, attempts = attempts + 1, next_attempt_at = ?, updated_at = ? '
+                    'WHERE id = ?',
+                    [(SENDING, now + self.lease_seconds, now, row['id']) for row in rows]
+                )
+        return [{
+            'id': row['id'],
+            'job_id': row['job_id'],
+            'helper_id': row['helper_id'],
+            'email': row['email'],
+            'distance': row['distance'],
+            'attempts': row['attempts'] + 1,
+            'location': json.loads(row['location'])
+        } for row in rows]
+
+    def renew(self, deliveries):
+        # Extends the lease on claimed deliveries still being sent. The
+        # attempts count identifies the claim, so a lease another worker has
+        # since taken over is left alone.
+        until = time.time() + self.lease_seconds
+        with self._connect() as conn:
+            conn.executemany(
+                'UPDATE sos_deliveries SET next_attempt_at = ? WHERE id = ? AND status = ? AND attempts = ?',
+                [(until, delivery['id'], SENDING, delivery['attempts']) for delivery in deliveries]
+            )
+
+    def backoff(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def complete(self, deliveries, results, errors=None):
+        # Records one send outcome per claimed delivery
+        now = time.time()
+        errors = errors or [None] * len(deliveries)
+        updates = []
+        for delivery, ok, error in zip(deliveries, results, errors):
+            if ok:
+                updates.append((SENT, now, None, now, delivery['id']))
+            elif delivery['attempts'] >= self.max_attempts:
+                updates.append((FAILED, now, error, now, delivery['id']))
+            else:
+                updates.append((PENDING, now + self.backoff(delivery['attempts']), error, now, delivery['id']))
+        with self._connect() as conn:
+            conn.executemany(
+                'UPDATE sos_deliveries SET status = ?, next_attempt_at = ?, last_error = ?, updated_at = ? WHERE id = ?',
+                updates
+            )
+
+    def job_status(self, job_id):
+        with self._connect() as conn:
+            job = conn.execute('SELECT * FROM sos_jobs WHERE id = ?', (job_id,)).fetchone()
+            if job is None:
+                return None
+            rows = conn.execute(
+                'SELECT helper_id, email, distance, status, attempts, last_error, updated_at '
+                'FROM sos_deliveries WHERE job_id = ? ORDER BY distance',
+                (job_id,)
+            ).fetchall()
+
+        deliveries = [dict(row) for row in rows]
+        counts = {PENDING: 0, SENDING: 0, SENT: 0, FAILED: 0}
+        for delivery in deliveries:
+            counts[delivery['status']] += 1
+        if counts[PENDING] or counts[SENDING]:
+            state = 'in_progress'
+        elif counts[FAILED] and not counts[SENT]:
+            state = 'failed'
+        elif counts[FAILED]:
+            state = 'partial'
+        else:
+            state = 'done'
+        return {
+            'jobId': job['id'],
+            'createdAt': job['created_at'],
+            'location': json.loads(job['location']),
+            'state': state,
+            'counts': counts,
+            'deliveries': deliveries
+        }
+
+    def track_token(self, job_id):
+        # Secret that lets the person in distress publish positions for a job;
+        # None for unknown jobs and ones created before live tracking existed
+        with self._connect() as conn:
+            row = conn.execute('SELECT track_token FROM sos_jobs WHERE id = ?', (job_id,)).fetchone()
+        return row['track_token'] if row else None
+
+    def add_track_points(self, job_id, points):
+        """Appends live positions to a job; returns them with their ids.
+
+        Ids increase across all jobs, so they double as SSE event ids and as
+        the cursor LiveTracker tails with.
+        """
+        now = time.time()
+        rows = []
+        with self._connect() as conn:
+            for point in points:
+                cursor = conn.execute(
+                    'INSERT INTO sos_track_points (job_id, latitude, longitude, accuracy, recorded_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (job_id, point['latitude'], point['longitude'], point.get('accuracy'), now)
+                )
+                rows.append({'id': cursor.lastrowid, 'job_id': job_id, 'latitude': point['latitude'],
+                             'longitude': point['longitude'], 'accuracy': point.get('accuracy'),
+                             'recorded_at': now})
+        return rows
+
+    def track_points(self, job_id=None, after_id=0, limit=1000):
+        # Oldest first. With job_id, the newest `limit` points of that job;
+        # without, the next `limit` points of any job after `after_id`
+        with self._connect() as conn:
+            if job_id is None:
+                rows = conn.execute(
+                    'SELECT * FROM sos_track_points WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    'SELECT * FROM sos_track_points WHERE job_id = ? AND id > ? ORDER BY id DESC LIMIT ?',
+                    (job_id, after_id, limit)
+                ).fetchall()[::-1]
+        return [dict(row) for row in rows]
+
+    def last_track_point_id(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COALESCE(MAX(id), 0) FROM sos_track_points').fetchone()[0]
+
+    def due_count(self):
+        # Deliveries being sent now or due to be claimed; later retries excluded
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT COUNT(*) FROM sos_deliveries WHERE status = ? OR (status = ? AND next_attempt_at <= ?)',
+                (SENDING, PENDING, time.time())
+            ).fetchone()[0]
+
+    def wait_for_work(self, timeout):
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+    def notify(self):
+        self._wakeup.set()
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE ... COMMIT/ROLLBACK around an autocommit connection
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+class OutboxWorker(threading.Thread):
+    """Drains an Outbox by passing claimed deliveries to ``send_batch``.
+
+    ``send_batch(deliveries)`` must return one ``(ok, error)`` pair per delivery.
+    """
+
+    def __init__(self, outbox, send_batch, batch_size=20, poll_interval=1.0, name=None):
+        super().__init__(name=name or 'sos-outbox', daemon=True)
+        self.outbox = outbox
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                logger.error(f"Outbox worker error: {str(e)}")
+                processed = 0
+            if not processed:
+                self.outbox.wait_for_work(self.poll_interval)
+
+    def run_once(self):
+        deliveries = self.outbox.claim(self.batch_size)
+        if not deliveries:
+            return 0
+        # A batch on a slow SMTP server can outlast the lease; keep renewing
+        # it so no other worker claims the same deliveries mid-send
+        sent = threading.Event()
+        renewer = threading.Thread(target=self._renew_lease, args=(deliveries, sent),
+                                   name=f'{self.name}-lease', daemon=True)
+        renewer.start()
+        try:
+            outcomes = self.send_batch(deliveries)
+        finally:
+            sent.set()
+            renewer.join()
+        self.outbox.complete(
+            deliveries,
+            [ok for ok, _ in outcomes],
+            [error for _, error in outcomes]
+        )
+        return len(deliveries)
+
+    def _renew_lease(self, deliveries, sent):
+        while not sent.wait(self.outbox.lease_seconds / 3):
+            try:
+                self.outbox.renew(deliveries)
+            except Exception as e:
+                logger.error(f"Outbox lease renewal error: {str(e)}")
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self.outbox.notify()
+        self.join(timeout)
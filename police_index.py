@@ -0,0 +1,160 @@
+import csv
+import heapq
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from distance import within_radius
+from geo_index import GridIndex
+
+# Overridable so benchmarks can point the client at a local stand-in
+PLACES_BASE_URL = 'https://maps.googleapis.com/maps/api/place'
+
+
+class PoliceStationIndex:
+    """Police stations loaded from a CSV or GeoJSON dump, queryable by proximity.
+
+    CSV files need ``name`` plus ``lat``/``latitude`` and ``lng``/``lon``/``longitude``
+    columns; ``place_id``, ``phone`` and ``address`` are optional. GeoJSON files
+    must contain Point features with the same optional properties.
+    """
+
+    def __init__(self, cell_size_deg=0.05):
+        self.grid = GridIndex(cell_size_deg)
+        self._stations = {}
+
+    def __len__(self):
+        return len(self._stations)
+
+    def add(self, station):
+        station_id = station.get('place_id') or f"local-{len(self._stations)}"
+        station = dict(station, place_id=station_id, lat=float(station['lat']), lng=float(station['lng']))
+        self._stations[station_id] = station
+        self.grid.insert(station_id, station['lat'], station['lng'])
+
+    def load(self, path):
+        if path.lower().endswith(('.geojson', '.json')):
+            self.load_geojson(path)
+        else:
+            self.load_csv(path)
+        return len(self)
+
+    def load_csv(self, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                lat = row.get('lat') or row.get('latitude')
+                lng = row.get('lng') or row.get('lon') or row.get('longitude')
+                if not row.get('name') or lat in (None, '') or lng in (None, ''):
+                    continue
+                self.add({
+                    'name': row['name'],
+                    'lat': lat,
+                    'lng': lng,
+                    'place_id': row.get('place_id') or None,
+                    'phone': row.get('phone') or None,
+                    'address': row.get('address') or None
+                })
+
+    def load_geojson(self, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        for feature in data.get('features', []):
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') != 'Point':
+                continue
+            lng, lat = geometry['coordinates'][:2]
+            props = feature.get('properties') or {}
+            self.add({
+                'name': props.get('name', 'Police Station'),
+                'lat': lat,
+                'lng': lng,
+                'place_id': props.get('place_id'),
+                'phone': props.get('phone'),
+                'address': props.get('address')
+            })
+
+    def nearest(self, lat, lng, k=1, max_radius_km=50.0, start_radius_km=2.0):
+        # Grows the search radius until k stations are inside it, so dense
+        # areas only touch a few grid cells
+        radius = min(start_radius_km, max_radius_km)
+        while True:
+            candidates = self.grid.candidates(lat, lng, radius)
+            hits, distances = within_radius(
+                lat, lng, [c[1] for c in candidates], [c[2] for c in candidates], radius
+            )
+            if len(hits) >= k or radius >= max_radius_km:
+                best = heapq.nsmallest(k, zip(distances, hits))
+                return [
+                    dict(self._stations[candidates[i][0]], distance=d)
+                    for d, i in best
+                ]
+            radius = min(radius * 2, max_radius_km)
+
+
+class PlaceDetailsCache:
+    # Small LRU with TTL for Places "details" responses
+    def __init__(self, max_entries=1024, ttl=7 * 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, place_id):
+        with self._lock:
+            entry = self._entries.get(place_id)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[place_id]
+                return None
+            self._entries.move_to_end(place_id)
+            return entry[0]
+
+    def set(self, place_id, details):
+        with self._lock:
+            self._entries[place_id] = (details, time.time() + self.ttl)
+            self._entries.move_to_end(place_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class PlacesClient:
+    """Google Places calls over one pooled ``requests.Session``, used on index misses."""
+
+    def __init__(self, api_key, pool_size=10, timeout=5, details_cache=None, base_url=PLACES_BASE_URL):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.api_key = api_key
+        self.timeout = timeout
+        self.base_url = base_url.rstrip('/')
+        self.details_cache = details_cache or PlaceDetailsCache()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def nearby_police(self, lat, lng, radius_m=5000):
+        response = self.session.get(f'{self.base_url}/nearbysearch/json', params={
+            'location': f'{lat},{lng}',
+            'radius': str(radius_m),
+            'type': 'police',
+            'key': self.api_key
+        }, timeout=self.timeout)
+        return response.json()
+
+    def details(self, place_id):
+        details = self.details_cache.get(place_id)
+        if details is not None:
+            return details
+        response = self.session.get(f'{self.base_url}/details/json', params={
+            'place_id': place_id,
+            'fields': 'name,formatted_phone_number,formatted_address',
+            'key': self.api_key
+        }, timeout=self.timeout)
+        data = response.json()
+        if data.get('status') != 'OK':
+            return {}
+        self.details_cache.set(place_id, data['result'])
+        return data['result']
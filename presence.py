@@ -0,0 +1,76 @@
+import heapq
+import threading
+import time
+
+
+class PresenceSet:
+    """Helpers heard from within the last ``ttl`` seconds.
+
+    A heartbeat moves the helper's deadline forward in a dict; a min-heap
+    with at most one entry per helper orders those deadlines, so ``expire``
+    only touches helpers whose entry reached the top. An entry whose helper
+    has beaten since is pushed back with the newer deadline instead of being
+    removed. A forgotten helper keeps its entry (tracked in ``_queued``)
+    until it reaches the top, so beating again never adds a second one. Times are wall-clock seconds, so ``last_seen_at`` values read
+    back from the database (beats recorded by other processes) apply too.
+    """
+
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self._deadlines = {}
+        self._heap = []
+        self._queued = set()
+        self._lock = threading.Lock()
+        self.beats = 0
+        self.expired = 0
+
+    def beat(self, helper_id, seen_at=None):
+        now = time.time()
+        deadline = (seen_at or now) + self.ttl
+        with self._lock:
+            self._expire(now)
+            if deadline <= now:
+                return False
+            current = self._deadlines.get(helper_id)
+            if helper_id not in self._queued:
+                heapq.heappush(self._heap, (deadline, helper_id))
+                self._queued.add(helper_id)
+            elif current is not None and current >= deadline:
+                return True
+            self._deadlines[helper_id] = deadline
+            self.beats += 1
+        return True
+
+    def _expire(self, now):
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, helper_id = heapq.heappop(heap)
+            deadline = self._deadlines.get(helper_id)
+            if deadline is not None and deadline > now:
+                heapq.heappush(heap, (deadline, helper_id))
+                continue
+            self._queued.discard(helper_id)
+            if deadline is not None:
+                del self._deadlines[helper_id]
+                self.expired += 1
+
+    def expire(self):
+        with self._lock:
+            self._expire(time.time())
+
+    def forget(self, helper_id):
+        # Its heap entry stays queued and is dropped when it reaches the top
+        with self._lock:
+            self._deadlines.pop(helper_id, None)
+
+    def __contains__(self, helper_id):
+        # Exact whether or not expire() has caught up
+        deadline = self._deadlines.get(helper_id)
+        return deadline is not None and deadline > time.time()
+
+    def __len__(self):
+        self.expire()
+        return len(self._deadlines)
+
+    def stats(self):
+        return {'present': len(self), 'beats': self.beats, 'expired': self.expired}
@@ -0,0 +1,293 @@
+import atexit
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+
+import metrics
+from geocache import ReverseGeocodeCache
+from geoclient import GeocodingClient, NominatimBackend, SharedTokenBucket
+from helper_locations import HelperLocationBuffer
+from helper_registry import HelperRegistry
+from incident_log import IncidentLog
+from live_tracking import LiveTracker
+from outbox import Outbox, OutboxWorker
+from presence import PresenceSet
+from static_assets import AudioAssets
+
+logger = logging.getLogger(__name__)
+
+
+class Services:
+    """Components behind one app, each built the first time it is used.
+
+    Creating the app therefore opens no files and starts no threads: the
+    outbox and geocode cache open their SQLite files, the geocoder starts
+    its worker and the mail modules (smtplib, email.mime) are imported only
+    when a request first needs them. Lives in ``app.extensions['sos']``.
+    """
+
+    def __init__(self, app):
+        self.config = app.config
+        self.instance_path = app.instance_path
+        self.root_path = app.root_path
+        self.log_handler = None
+        self.engine = None
+        self._built = {}
+        self._lock = threading.RLock()
+        self._workers = []
+        self._stopped = False
+
+    def _get(self, name, build):
+        component = self._built.get(name)
+        if component is None:
+            with self._lock:
+                component = self._built.get(name)
+                if component is None:
+                    component = self._built[name] = build()
+        return component
+
+    def built(self, name):
+        # The component if it exists, without building it (used by /metrics)
+        return self._built.get(name)
+
+    def _instance_file(self, key, filename):
+        path = self.config.get(key)
+        if not path:
+            os.makedirs(self.instance_path, exist_ok=True)
+            path = os.path.join(self.instance_path, filename)
+        return path
+
+    @property
+    def registry(self):
+        # In-memory helper registry shared by the hot read paths. Loaded once,
+        # kept write-through by this process and synced from the change log
+        return self._get('registry', lambda: HelperRegistry(
+            cell_size_deg=self.config['HELPER_GRID_CELL_DEG'],
+            check_interval=self.config['HELPER_REGISTRY_CHECK_INTERVAL'],
+            positions=self.helper_locations,
+            presence=self.presence
+        ))
+
+    @property
+    def presence(self):
+        # Helpers heard from within HELPER_PRESENCE_TTL seconds
+        return self._get('presence', lambda: PresenceSet(ttl=self.config['HELPER_PRESENCE_TTL']))
+
+    @property
+    def helper_locations(self):
+        # Last reported helper positions, flushed to the database in batches
+        def build():
+            buffer = HelperLocationBuffer(
+                self.engine,
+                flush_interval=self.config['HELPER_LOCATION_FLUSH_INTERVAL'],
+                max_pending=self.config['HELPER_LOCATION_MAX_PENDING']
+            )
+            # Positions still in memory are written before the interpreter exits
+            atexit.register(self.shutdown)
+            return buffer
+
+        return self._get('helper_locations', build)
+
+    @property
+    def audio_assets(self):
+        # Alarm sounds with content-fingerprinted URLs
+        return self._get('audio_assets', lambda: AudioAssets(
+            self.config['AUDIO_DIR'] or os.path.join(self.root_path, 'static', 'audio')
+        ))
+
+    @property
+    def outbox(self):
+        # Durable SOS outbox drained by background workers
+        return self._get('outbox', lambda: Outbox(
+            self._instance_file('SOS_OUTBOX_PATH', 'outbox.db'),
+            max_attempts=self.config['SOS_MAX_ATTEMPTS']
+        ))
+
+    @property
+    def incident_log(self):
+        # Append-only binary record of every SOS, queried by /incidents
+        return self._get('incident_log', lambda: IncidentLog(
+            self._instance_file('INCIDENT_LOG_DIR', 'incidents'),
+            segment_records=self.config['INCIDENT_SEGMENT_RECORDS']
+        ))
+
+    @property
+    def live_tracker(self):
+        # Fans live SOS positions out to the SSE streams open in this process
+        return self._get('live_tracker', lambda: LiveTracker(
+            self.outbox,
+            buffer_size=self.config['LIVE_BUFFER_SIZE'],
+            max_pending=self.config['LIVE_MAX_PENDING'],
+            max_subscribers=self.config['LIVE_MAX_SUBSCRIBERS'],
+            poll_interval=self.config['LIVE_POLL_INTERVAL']
+        ))
+
+    @property
+    def geocode_cache(self):
+        return self._get('geocode_cache', lambda: ReverseGeocodeCache(
+            self._instance_file('GEOCODE_CACHE_PATH', 'geocode_cache.db'),
+            precision=self.config['GEOCODE_CACHE_PRECISION'],
+            ttl=self.config['GEOCODE_CACHE_TTL'],
+            max_entries=self.config['GEOCODE_CACHE_SIZE']
+        ))
+
+    @property
+    def geocoding_client(self):
+        # Rate-limited, coalescing client; geopy is imported by the backend
+        return self._get('geocoding_client', lambda: GeocodingClient(
+            NominatimBackend(
+                user_agent="distress_signal_app",
+                domain=self.config['GEOCODER_DOMAIN'],
+                scheme=self.config['GEOCODER_SCHEME']
+            ),
+            max_queue=self.config['GEOCODER_QUEUE_SIZE'],
+            workers=self.config['GEOCODER_WORKERS'],
+            timeout=self.config['GEOCODER_TIMEOUT'],
+            # GEOCODER_RATE is for the whole deployment: every process (each
+            # gunicorn worker) draws from one bucket in the geocode cache file
+            bucket=SharedTokenBucket(
+                self._instance_file('GEOCODE_CACHE_PATH', 'geocode_cache.db'),
+                self.config['GEOCODER_RATE'],
+                self.config['GEOCODER_BURST']
+            )
+        ))
+
+    @property
+    def mail_dispatcher(self):
+        # Authenticated SMTP sessions are pooled and reused across SOS messages
+        def build():
+            from mailer import SMTPConnectionPool, SOSMailDispatcher
+
+            return SOSMailDispatcher(
+                SMTPConnectionPool(
+                    self.config['MAIL_SERVER'],
+                    self.config['MAIL_PORT'],
+                    username=self.config['MAIL_USERNAME'],
+                    password=self.config['MAIL_PASSWORD'],
+                    use_tls=self.config['MAIL_USE_TLS'],
+                    size=self.config['SMTP_POOL_SIZE'],
+                    timeout=self.config['SMTP_TIMEOUT']
+                ),
+                concurrency=self.config['SMTP_CONCURRENCY'],
+                message_timeout=self.config['SMTP_MESSAGE_TIMEOUT']
+            )
+
+        return self._get('mail_dispatcher', build)
+
+    @property
+    def helper_token_key(self):
+        # HMAC key for helper device tokens: HELPER_TOKEN_SECRET, else a random
+        # key kept in the instance folder so every process issues the same tokens
+        def build():
+            secret = self.config['HELPER_TOKEN_SECRET']
+            if secret:
+                return secret.encode()
+            path = self._instance_file('HELPER_TOKEN_KEY_PATH', 'helper_token.key')
+            if not os.path.exists(path):
+                # Written whole, then linked into place: the first process to
+                # link wins and nobody reads a half-written key
+                temp = f'{path}.{os.getpid()}.tmp'
+                with open(os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+                    f.write(os.urandom(32))
+                try:
+                    os.link(temp, path)
+                except FileExistsError:
+                    pass
+                finally:
+                    os.unlink(temp)
+            with open(path, 'rb') as f:
+                return f.read()
+
+        return self._get('helper_token_key', build)
+
+    def helper_token(self, helper_id, email):
+        # Secret a helper's device sends with position pings and heartbeats.
+        # Derived from id and email, so checking it needs no database read and
+        # a reused id (after a delete) gets a different token
+        message = f'helper:{int(helper_id)}:{email.lower()}'.encode()
+        return hmac.new(self.helper_token_key, message, hashlib.sha256).hexdigest()
+
+    def validate_email_config(self):
+        # A local relay without TLS (e.g. a test SMTP server) needs no password
+        if not self.config['MAIL_USERNAME'] or (self.config['MAIL_USE_TLS'] and not self.config['MAIL_PASSWORD']):
+            raise ValueError("Email credentials missing")
+
+    def track_url(self, job_id):
+        # Link to the live map of an incident, when the public address is known
+        base_url = self.config['PUBLIC_BASE_URL']
+        return f"{base_url.rstrip('/')}/sos/{job_id}/live" if base_url and job_id else None
+
+    def build_messages(self, deliveries):
+        from mailer import build_sos_message
+
+        return [
+            build_sos_message(self.config['MAIL_USERNAME'], d['email'], d['location'], d['distance'],
+                              track_url=self.track_url(d.get('job_id')))
+            for d in deliveries
+        ]
+
+    def deliver_outbox_batch(self, deliveries):
+        # Send callback for outbox workers: one (ok, error) per delivery
+        try:
+            self.validate_email_config()
+        except ValueError as e:
+            return [(False, str(e))] * len(deliveries)
+        messages = self.build_messages(deliveries)
+        with metrics.route('outbox'), metrics.stage('smtp_batch'):
+            results = self.mail_dispatcher.send_batch(messages)
+        sent = sum(1 for ok, _ in results if ok)
+        metrics.HELPERS_NOTIFIED.inc(sent, result='sent')
+        metrics.HELPERS_NOTIFIED.inc(len(results) - sent, result='failed')
+        return results
+
+    def start_outbox_workers(self):
+        with self._lock:
+            if not self._workers and not self._stopped:
+                for i in range(self.config['SOS_OUTBOX_WORKERS']):
+                    worker = OutboxWorker(self.outbox, self.deliver_outbox_batch, name=f'sos-outbox-{i}')
+                    worker.start()
+                    self._workers.append(worker)
+                # Workers are daemon threads; drain them before the interpreter exits
+                atexit.register(self.shutdown)
+        return self._workers
+
+    def shutdown(self, drain_timeout=None):
+        """Lets the outbox workers finish what is due, then stops them.
+
+        Waits up to ``drain_timeout`` (SOS_DRAIN_TIMEOUT) seconds for
+        deliveries that are being sent or are due now; retries scheduled for
+        later stay in the outbox for the next start. Helper positions still
+        in memory are flushed. Safe to call twice.
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            workers = list(self._workers)
+        drain_timeout = self.config['SOS_DRAIN_TIMEOUT'] if drain_timeout is None else drain_timeout
+        deadline = time.monotonic() + drain_timeout
+        remaining = 0
+        if workers:
+            while True:
+                remaining = self.outbox.due_count()
+                if not remaining or time.monotonic() >= deadline:
+                    break
+                time.sleep(0.1)
+            for worker in workers:
+                worker.stop(max(0.0, deadline - time.monotonic()))
+        dispatcher = self.built('mail_dispatcher')
+        if dispatcher is not None:
+            dispatcher.shutdown(wait=False)
+        locations = self.built('helper_locations')
+        if locations is not None:
+            locations.stop(timeout=5)
+        incident_log = self.built('incident_log')
+        if incident_log is not None:
+            incident_log.close()
+        if remaining:
+            logger.warning(f"Shutdown drain timed out; {remaining} SOS deliveries left for the next start")
+        else:
+            logger.info("SOS outbox drained")
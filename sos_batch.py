@@ -0,0 +1,134 @@
+from distance import np
+
+DEFAULT_RADIUS_KM = 10
+DEFAULT_HELPER_CAP = 1
+
+
+class SOSBatchError(ValueError):
+    pass
+
+
+def parse_batch_request(data, max_incidents, max_radius, default_cap=DEFAULT_HELPER_CAP):
+    """Validates a /send_sos/batch body; returns (locations, radius, cap).
+
+    ``incidents`` is a list of ``{"location": {"latitude", "longitude", ...}}``
+    objects, the same shape /send_sos accepts.
+    """
+    if not isinstance(data, dict):
+        raise SOSBatchError("Body must be a JSON object")
+    incidents = data.get('incidents')
+    if not isinstance(incidents, list) or not incidents:
+        raise SOSBatchError("'incidents' must be a non-empty list")
+    if len(incidents) > max_incidents:
+        raise SOSBatchError(f"At most {max_incidents} incidents per batch")
+
+    locations = []
+    for i, incident in enumerate(incidents):
+        location = incident.get('location') if isinstance(incident, dict) else None
+        if not isinstance(location, dict):
+            raise SOSBatchError(f"Incident {i} has no location")
+        try:
+            latitude = float(location['latitude'])
+            longitude = float(location['longitude'])
+        except (KeyError, TypeError, ValueError):
+            raise SOSBatchError(f"Incident {i} needs numeric latitude and longitude")
+        if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+            raise SOSBatchError(f"Incident {i} location is out of range")
+        locations.append({**location, 'latitude': latitude, 'longitude': longitude})
+
+    try:
+        radius = float(data.get('radius', DEFAULT_RADIUS_KM))
+        cap = int(data.get('perHelperCap', default_cap))
+    except (TypeError, ValueError):
+        raise SOSBatchError("'radius' and 'perHelperCap' must be numeric")
+    if radius <= 0 or cap < 1:
+        raise SOSBatchError("'radius' and 'perHelperCap' must be positive")
+    return locations, min(radius, max_radius), cap
+
+
+def assign_helpers(store, points, radius, per_helper_cap=DEFAULT_HELPER_CAP):
+    """Assigns helpers in a HelperStore to many incidents at once.
+
+    Every (incident, helper) pair within ``radius`` km is collected through the
+    store's grid, then each helper keeps only its ``per_helper_cap`` closest
+    incidents. Returns ``(assigned, found, scanned)`` where ``assigned[i]`` is
+    ``[(slot, distance_km)]`` for incident i, nearest first, and ``found[i]``
+    counts the helpers in range before the cap.
+    """
+    if np is not None:
+        return _assign_numpy(store, points, radius, per_helper_cap)
+    return _assign_python(store, points, radius, per_helper_cap)
+
+
+def _assign_numpy(store, points, radius, cap):
+    incidents, slots, distances = [], [], []
+    scanned = 0
+    for i, (lat, lon) in enumerate(points):
+        hit_slots, hit_distances, seen = store.nearby_arrays(lat, lon, radius)
+        scanned += seen
+        if len(hit_slots):
+            incidents.append(np.full(len(hit_slots), i, dtype=np.int64))
+            slots.append(hit_slots)
+            distances.append(hit_distances)
+
+    found = [0] * len(points)
+    assigned = [[] for _ in points]
+    if not slots:
+        return assigned, found, scanned
+    incidents = np.concatenate(incidents)
+    slots = np.concatenate(slots)
+    distances = np.concatenate(distances)
+    found = np.bincount(incidents, minlength=len(points)).tolist()
+
+    # Rank each helper's incidents by distance and keep the first `cap`
+    order = _group_order(slots, distances)
+    grouped = slots[order]
+    positions = np.arange(len(order))
+    starts = np.empty(len(order), dtype=bool)
+    starts[0] = True
+    starts[1:] = grouped[1:] != grouped[:-1]
+    rank = positions - np.maximum.accumulate(np.where(starts, positions, 0))
+    keep = order[rank < cap]
+
+    # Regroup the survivors by incident, nearest helper first
+    keep = keep[_group_order(incidents[keep], distances[keep])]
+    bounds = np.searchsorted(incidents[keep], np.arange(len(points) + 1))
+    kept_slots = slots[keep].tolist()
+    kept_distances = distances[keep].tolist()
+    for i in range(len(points)):
+        lo, hi = bounds[i], bounds[i + 1]
+        assigned[i] = list(zip(kept_slots[lo:hi], kept_distances[lo:hi]))
+    return assigned, found, scanned
+
+
+def _group_order(groups, distances):
+    # argsort by (group, distance) through one int64 key: the group in the
+    # high bits, distance in whole millimetres in the low bits, sized to the
+    # largest distance so any radius keeps its order. Several times faster
+    # than np.lexsort, which is used when the two don't fit in 63 bits.
+    millimetres = (distances * 1e6).astype(np.int64)
+    shift = int(millimetres.max()).bit_length()
+    if int(groups.max()).bit_length() + shift > 63:
+        return np.lexsort((distances, groups))
+    return np.argsort((groups << shift) | millimetres)
+
+
+def _assign_python(store, points, radius, cap):
+    pairs = []
+    found = []
+    scanned = 0
+    for i, (lat, lon) in enumerate(points):
+        hit_slots, hit_distances, seen = store.nearby_arrays(lat, lon, radius)
+        scanned += seen
+        found.append(len(hit_slots))
+        pairs.extend((d, i, slot) for slot, d in zip(hit_slots, hit_distances))
+
+    # Closest pairs claim helpers first
+    pairs.sort()
+    taken = {}
+    assigned = [[] for _ in points]
+    for d, i, slot in pairs:
+        if taken.get(slot, 0) < cap:
+            taken[slot] = taken.get(slot, 0) + 1
+            assigned[i].append((slot, d))
+    return assigned, found, scanned
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+
+# Order of <source> elements: smallest download first. The browser picks the
+# first type it can play, so the list can lead with the smaller codec.
+AUDIO_TYPES = (('ogg', 'audio/ogg'), ('mp3', 'audio/mpeg'), ('wav', 'audio/wav'))
+
+# Order tried when negotiating on the Accept header: a bare */* (what most
+# media requests send) gets the format every browser plays
+NEGOTIATION_ORDER = ('audio/mpeg', 'audio/ogg', 'audio/wav')
+
+
+class AudioAsset:
+    __slots__ = ('name', 'ext', 'mimetype', 'path', 'size', 'mtime', 'mtime_ns', 'digest')
+
+    def __init__(self, name, ext, mimetype, path, stat, digest):
+        self.name = name
+        self.ext = ext
+        self.mimetype = mimetype
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.mtime_ns = stat.st_mtime_ns
+        self.digest = digest
+
+    @property
+    def filename(self):
+        # Fingerprinted name; a new file content means a new URL
+        return f'{self.name}.{self.digest}.{self.ext}'
+
+
+class AudioAssets:
+    """Audio files in one directory, addressed by content fingerprint.
+
+    ``alarm.mp3`` is published as ``alarm.<digest>.mp3`` where the digest is
+    a prefix of its SHA-256, so those URLs can be cached forever and the
+    digest doubles as the ETag. Files are hashed on first use and again only
+    when their size or mtime changes.
+    """
+
+    def __init__(self, directory, digest_length=12):
+        self.directory = directory
+        self.digest_length = digest_length
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def _hash(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                digest.update(block)
+        return digest.hexdigest()[:self.digest_length]
+
+    def get(self, name, ext):
+        mimetype = dict(AUDIO_TYPES).get(ext)
+        if mimetype is None or os.sep in name or name.startswith('.'):
+            return None
+        path = os.path.join(self.directory, f'{name}.{ext}')
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        asset = self._assets.get((name, ext))
+        if asset is None or asset.mtime_ns != stat.st_mtime_ns or asset.size != stat.st_size:
+            with self._lock:
+                asset = AudioAsset(name, ext, mimetype, path, stat, self._hash(path))
+                self._assets[(name, ext)] = asset
+        return asset
+
+    def variants(self, name):
+        # Every format present for `name`, in AUDIO_TYPES order
+        return [asset for asset in (self.get(name, ext) for ext, _ in AUDIO_TYPES) if asset is not None]
+
+    def resolve(self, filename):
+        # (asset, fingerprint_matches) for "name.digest.ext" or "name.ext";
+        # (None, False) when no such file exists
+        parts = filename.split('.')
+        if len(parts) == 3:
+            name, digest, ext = parts
+        elif len(parts) == 2:
+            (name, ext), digest = parts, None
+        else:
+            return None, False
+        asset = self.get(name, ext)
+        if asset is None:
+            return None, False
+        return asset, digest == asset.digest
+
+    def negotiate(self, name, accept):
+        # Best variant for a werkzeug MIMEAccept; mp3 when nothing matches
+        variants = {asset.mimetype: asset for asset in self.variants(name)}
+        offered = [mimetype for mimetype in NEGOTIATION_ORDER if mimetype in variants]
+        if not offered:
+            return None
+        best = accept.best_match(offered) if accept else None
+        return variants[best or offered[0]]
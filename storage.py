@@ -0,0 +1,145 @@
+import logging
+import os
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+# Applied on every new SQLite connection
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', '5000'),
+    ('mmap_size', os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    ('cache_size', '-20000'),
+    ('temp_store', 'MEMORY'),
+)
+
+
+def sqlite_engine_options(database_uri):
+    # WAL lets readers run alongside a writer, so the pool can hand out
+    # several connections at once. In-memory databases keep Flask-SQLAlchemy's
+    # single shared connection; other databases keep SQLAlchemy's defaults.
+    url = make_url(database_uri)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return {}
+    return {
+        'pool_size': int(os.getenv('SQLITE_POOL_SIZE', '10')),
+        'max_overflow': int(os.getenv('SQLITE_MAX_OVERFLOW', '20')),
+        'pool_timeout': 30,
+        'pool_pre_ping': False,
+        'connect_args': {'timeout': 30, 'check_same_thread': False},
+    }
+
+
+def _set_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def install_sqlite_pragmas(engine):
+    # Safe to call more than once per engine
+    if engine.dialect.name != 'sqlite' or event.contains(engine, 'connect', _set_pragmas):
+        return
+    event.listen(engine, 'connect', _set_pragmas)
+
+
+def _columns(conn, table):
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn, table, column, ddl):
+    # ALTER TABLE ... ADD COLUMN never rebuilds the table
+    if column not in _columns(conn, table):
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+def _m1_password_hash(conn):
+    _add_column(conn, 'registered_user', 'password_hash', 'VARCHAR(256)')
+
+
+def _m2_is_active(conn):
+    _add_column(conn, 'registered_user', 'is_active', 'BOOLEAN NOT NULL DEFAULT 1')
+
+
+def _m3_indexes(conn):
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_registered_user_is_active ON registered_user (is_active)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_registered_user_lat_lon ON registered_user (latitude, longitude)'))
+
+
+def _m4_helper_changes(conn):
+    # Change log read by HelperRegistry; triggers cover every writer,
+    # including bulk inserts and other processes
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS helper_changes ('
+        'version INTEGER PRIMARY KEY AUTOINCREMENT, helper_id INTEGER NOT NULL, op TEXT NOT NULL)'
+    ))
+    for op, event_name, row in (('upsert', 'INSERT', 'NEW'), ('upsert', 'UPDATE', 'NEW'), ('delete', 'DELETE', 'OLD')):
+        conn.execute(text(
+            f'CREATE TRIGGER IF NOT EXISTS trg_registered_user_{event_name.lower()} '
+            f'AFTER {event_name} ON registered_user BEGIN '
+            f"INSERT INTO helper_changes (helper_id, op) VALUES ({row}.id, '{op}'); END"
+        ))
+
+
+def _m5_location_updated_at(conn):
+    # Set when a position reported through /helper_location is flushed
+    _add_column(conn, 'registered_user', 'location_updated_at', 'FLOAT')
+
+
+def _m6_last_seen_at(conn):
+    # Last heartbeat or position ping, written with the batched positions
+    _add_column(conn, 'registered_user', 'last_seen_at', 'FLOAT')
+
+
+# (version, description, function) - append only; never edit a shipped step
+MIGRATIONS = [
+    (1, 'registered_user.password_hash', _m1_password_hash),
+    (2, 'registered_user.is_active', _m2_is_active),
+    (3, 'indexes on is_active and latitude/longitude', _m3_indexes),
+    (4, 'helper_changes log and triggers', _m4_helper_changes),
+    (5, 'registered_user.location_updated_at', _m5_location_updated_at),
+    (6, 'registered_user.last_seen_at', _m6_last_seen_at),
+]
+
+
+def current_version(conn):
+    conn.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+    version = conn.execute(text('SELECT MAX(version) FROM schema_version')).scalar()
+    return version or 0
+
+
+def migrate(engine, migrations=MIGRATIONS):
+    """Applies pending migrations in order, each in its own transaction."""
+    with engine.begin() as conn:
+        version = current_version(conn)
+    applied = []
+    for number, description, step in migrations:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(text('INSERT INTO schema_version (version) VALUES (:v)'), {'v': number})
+        logger.info(f"Applied migration {number}: {description}")
+        applied.append(number)
+    return applied
+
+
+def prune_helper_changes(engine, keep=100000):
+    # Registries older than the pruned range fall back to a full reload
+    with engine.begin() as conn:
+        conn.execute(text(
+            'DELETE FROM helper_changes WHERE version <= (SELECT MAX(version) FROM helper_changes) - :keep'
+        ), {'keep': keep})
+
+
+def init_storage(db):
+    # Call inside an app context: pragmas, tables, then migrations
+    install_sqlite_pragmas(db.engine)
+    db.create_all()
+    applied = migrate(db.engine)
+    prune_helper_changes(db.engine)
+    return applied
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from email.mime.multipart import MIMEMultipart
@@ -11,22 +11,27 @@ import logging
 import os
 from dotenv import load_dotenv
 from math import radians, sin, cos, sqrt, atan2
+from helper_registry import HelperRegistry
+from storage import init_storage, sqlite_engine_options
+from mailer import SMTPConnectionPool, SOSMailDispatcher
+from geocache import ReverseGeocodeCache
+from police_index import PLACES_BASE_URL, PoliceStationIndex, PlacesClient
+from helper_queries import HelperQueryError, fetch_helper_page, parse_helper_query, stream_helpers_ndjson
+from logging_setup import configure_logging
 
 # Load environment variables
 load_dotenv()
 GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
 # Database Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///users.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 
 # Configure CORS correctly
 CORS(app, resources={
@@ -47,11 +52,21 @@ class RegisteredUser(db.Model):
     password_hash = db.Column(db.String(256))
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
-    is_active = db.Column(db.Boolean, default=True)
+    is_active = db.Column(db.Boolean, nullable=False, default=True, server_default='1', index=True)
+
+    __table_args__ = (
+        db.Index('ix_registered_user_lat_lon', 'latitude', 'longitude'),
+    )
 
     def __repr__(self):
         return f"<RegisteredUser {self.name}>"
 
+# In-memory registry of helpers; SOS lookups only scan nearby grid cells
+helper_registry = HelperRegistry(
+    cell_size_deg=float(os.getenv('HELPER_GRID_CELL_DEG', '0.1')),
+    check_interval=float(os.getenv('HELPER_REGISTRY_CHECK_INTERVAL', '1'))
+)
+
 def calculate_distance(lat1, lon1, lat2, lon2):
     R = 6371  # Earth's radius in km
     lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
@@ -97,6 +112,14 @@ def register_user():
 
         db.session.add(new_user)
         db.session.commit()
+        helper_registry.upsert({
+            'id': new_user.id,
+            'name': new_user.name,
+            'email': new_user.email,
+            'latitude': new_user.latitude,
+            'longitude': new_user.longitude,
+            'is_active': True
+        })
 
         return jsonify({
             'success': True,
@@ -114,18 +137,27 @@ def register_user():
 @app.route('/get_helpers', methods=['GET'])
 def get_helpers():
     try:
-        helpers = RegisteredUser.query.filter_by(is_active=True).all()
-        helpers_list = [{
-            'id': helper.id,
-            'name': helper.name,
-            'email': helper.email,
-            'latitude': helper.latitude,
-            'longitude': helper.longitude
-        } for helper in helpers]
+        params = parse_helper_query(request.args)
+    except HelperQueryError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    try:
+        active = RegisteredUser.is_active.is_(True)
+        if params['format'] == 'ndjson':
+            return Response(
+                stream_with_context(stream_helpers_ndjson(db.session, RegisteredUser, params, active)),
+                mimetype='application/x-ndjson'
+            )
+
+        helpers_list, next_cursor = fetch_helper_page(db.session, RegisteredUser, params, active)
         
         return jsonify({
             'success': True,
-            'helpers': helpers_list
+            'helpers': helpers_list,
+            'nextCursor': next_cursor
         })
     except Exception as e:
         logger.error(f"Error fetching helpers: {str(e)}")
@@ -133,6 +165,45 @@ def get_helpers():
             'success': False,
             'error': 'Failed to fetch helpers'
         }), 500
+# Local police-station index (CSV/GeoJSON dump); Google Places is only used
+# when no indexed station is within range
+police_index = PoliceStationIndex()
+if os.getenv('POLICE_STATIONS_PATH'):
+    police_index.load(os.getenv('POLICE_STATIONS_PATH'))
+    logger.info(f"Loaded {len(police_index)} police stations")
+places_client = PlacesClient(GOOGLE_MAPS_API_KEY, base_url=os.getenv('GOOGLE_PLACES_URL', PLACES_BASE_URL))
+POLICE_SEARCH_RADIUS_KM = 5
+
+def find_police_station(lat, lng):
+    local = police_index.nearest(lat, lng, k=1, max_radius_km=POLICE_SEARCH_RADIUS_KM)
+    if local:
+        station = local[0]
+        if not (station.get('phone') and station.get('address')) and not station['place_id'].startswith('local-'):
+            details = places_client.details(station['place_id'])
+            station['phone'] = station.get('phone') or details.get('formatted_phone_number')
+            station['address'] = station.get('address') or details.get('formatted_address')
+        return station
+
+    # Cache miss: fall back to the Places API over the pooled session
+    data = places_client.nearby_police(lat, lng, radius_m=POLICE_SEARCH_RADIUS_KM * 1000)
+    if data.get('status') != 'OK':
+        return None
+    closest_station = data['results'][0]
+    station_location = closest_station['geometry']['location']
+    details = places_client.details(closest_station['place_id'])
+    station = {
+        'place_id': closest_station['place_id'],
+        'name': closest_station['name'],
+        'lat': station_location['lat'],
+        'lng': station_location['lng'],
+        'phone': details.get('formatted_phone_number'),
+        'address': details.get('formatted_address')
+    }
+    # Remember it so the next request nearby is answered locally
+    police_index.add(station)
+    station['distance'] = calculate_distance(lat, lng, station['lat'], station['lng'])
+    return station
+
 @app.route('/get_nearby_police_station')
 def get_nearby_police_station():
     try:
@@ -147,63 +218,27 @@ def get_nearby_police_station():
                 'error': 'Invalid coordinates'
             }), 400
 
-        # Use Google Places API to find nearby police stations
-        url = 'https://maps.googleapis.com/maps/api/place/nearbysearch/json'
-        params = {
-            'location': f'{lat},{lng}',
-            'radius': '5000',  # Search within 5km
-            'type': 'police',
-            'key': GOOGLE_MAPS_API_KEY
-        }
-
-        response = requests.get(url, params=params)
-        data = response.json()
-
-        if data.get('status') != 'OK':
+        station = find_police_station(lat, lng)
+        if station is None:
             return jsonify({
                 'success': False,
                 'error': 'No police stations found nearby'
             }), 404
 
-        # Get the closest police station
-        closest_station = data['results'][0]
-        station_location = closest_station['geometry']['location']
-
-        # Get additional details about the police station
-        place_details_url = 'https://maps.googleapis.com/maps/api/place/details/json'
-        details_params = {
-            'place_id': closest_station['place_id'],
-            'fields': 'name,formatted_phone_number,formatted_address',
-            'key': GOOGLE_MAPS_API_KEY
-        }
-
-        details_response = requests.get(place_details_url, params=details_params)
-        details_data = details_response.json()
-
-        if details_data.get('status') != 'OK':
-            phone = 'Not available'
-        else:
-            phone = details_data['result'].get('formatted_phone_number', 'Not available')
-
-        # Calculate distance
-        distance = get_distance(lat, lng, 
-                              station_location['lat'], 
-                              station_location['lng'])
-
         return jsonify({
             'success': True,
             'policeStation': {
-                'name': closest_station['name'],
-                'lat': station_location['lat'],
-                'lng': station_location['lng'],
-                'phone': phone,
-                'distance': round(distance, 2),  # Distance in km
-                'address': details_data['result'].get('formatted_address', 'Address not available')
+                'name': station['name'],
+                'lat': station['lat'],
+                'lng': station['lng'],
+                'phone': station.get('phone') or 'Not available',
+                'distance': round(station['distance'], 2),  # Distance in km
+                'address': station.get('address') or 'Address not available'
             }
         })
 
     except Exception as e:
-        print(f"Error in get_nearby_police_station: {str(e)}")
+        logger.error(f"Error in get_nearby_police_station: {str(e)}")
         return jsonify({
             'success': False,
             'error': 'Failed to fetch police station information'
@@ -220,20 +255,14 @@ def send_sos():
 
         sender_location = data['location']
         radius = float(os.getenv('SOS_RADIUS', '10'))  # 10km default radius
-        helpers = RegisteredUser.query.filter_by(is_active=True).all()
-        emails_sent = 0
-
-        for helper in helpers:
-            distance = calculate_distance(
-                float(sender_location['latitude']),
-                float(sender_location['longitude']),
-                helper.latitude,
-                helper.longitude
-            )
-            
-            if distance <= radius:
-                if send_sos_email(helper.email, sender_location, distance):
-                    emails_sent += 1
+        sender_lat = float(sender_location['latitude'])
+        sender_lon = float(sender_location['longitude'])
+        matches, _ = helper_registry.sync(db.engine).nearby(sender_lat, sender_lon, radius)
+        messages = [
+            build_sos_email(helper['email'], sender_location, distance)
+            for helper, distance in matches
+        ]
+        emails_sent = sum(mail_dispatcher.send_many(messages))
 
         return jsonify({
             'success': True,
@@ -248,14 +277,28 @@ def send_sos():
             'message': 'Failed to send SOS'
         }), 500
 
-def send_sos_email(recipient_email, location, distance):
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = os.getenv('EMAIL_USER')
-        msg['To'] = recipient_email
-        msg['Subject'] = "URGENT: SOS Signal Received"
+# Pooled SMTP sessions shared by all SOS sends
+mail_dispatcher = SOSMailDispatcher(
+    SMTPConnectionPool(
+        os.getenv('MAIL_SERVER', 'smtp.gmail.com'),
+        int(os.getenv('MAIL_PORT', '587')),
+        username=os.getenv('EMAIL_USER'),
+        password=os.getenv('EMAIL_PASSWORD'),
+        use_tls=os.getenv('MAIL_USE_TLS', 'true').lower() == 'true',
+        size=int(os.getenv('SMTP_POOL_SIZE', '4')),
+        timeout=float(os.getenv('SMTP_TIMEOUT', '10'))
+    ),
+    concurrency=int(os.getenv('SMTP_CONCURRENCY', '4')),
+    message_timeout=float(os.getenv('SMTP_MESSAGE_TIMEOUT', '30'))
+)
 
-        body = f"""
+def build_sos_email(recipient_email, location, distance):
+    msg = MIMEMultipart()
+    msg['From'] = os.getenv('EMAIL_USER')
+    msg['To'] = recipient_email
+    msg['Subject'] = "URGENT: SOS Signal Received"
+
+    body = f"""
         URGENT: SOS signal received from {distance:.2f}km away!
 
         Location: https://www.google.com/maps?q={location['latitude']},{location['longitude']}
@@ -263,20 +306,16 @@ def send_sos_email(recipient_email, location, distance):
         Please respond if you can help.
         """
 
-        msg.attach(MIMEText(body, 'plain'))
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
 
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(
-                os.getenv('EMAIL_USER'),
-                os.getenv('EMAIL_PASSWORD')
-            )
-            server.send_message(msg)
-
-        return True
-    except Exception as e:
-        logger.error(f"Email error: {str(e)}")
-        return False
+# Cached reverse geocoding through one shared Nominatim client
+os.makedirs(app.instance_path, exist_ok=True)
+geocode_cache = ReverseGeocodeCache(
+    os.getenv('GEOCODE_CACHE_PATH', os.path.join(app.instance_path, 'geocode_cache.db')),
+    precision=int(os.getenv('GEOCODE_CACHE_PRECISION', '4'))
+)
+geolocator = Nominatim(user_agent="distress_signal_app")
 
 @app.route('/get_location_info', methods=['POST'])
 def get_location_info():
@@ -288,12 +327,14 @@ def get_location_info():
                 'message': 'Missing coordinates'
             }), 400
 
-        geolocator = Nominatim(user_agent="distress_signal_app")
-        try:
-            location = geolocator.reverse((data['lat'], data['lng']))
-            address = location.address if location else "Address not found"
-        except GeocoderTimedOut:
-            address = "Timeout getting address"
+        address = geocode_cache.get(data['lat'], data['lng'])
+        if address is None:
+            try:
+                location = geolocator.reverse((data['lat'], data['lng']))
+                address = location.address if location else "Address not found"
+                geocode_cache.set(data['lat'], data['lng'], address)
+            except GeocoderTimedOut:
+                address = "Timeout getting address"
 
         return jsonify({
             'success': True,
@@ -312,5 +353,5 @@ def get_location_info():
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        init_storage(db)
     app.run(debug=True, port=5000)
\ No newline at end of file
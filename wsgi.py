@@ -0,0 +1,12 @@
+"""Production entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each server worker process builds its own app and outbox workers; the
+database is initialised once by the gunicorn master (see gunicorn.conf.py).
+"""
+from app import create_app
+
+app = create_app()
+# Deliveries left over from a previous run go out without waiting for a new SOS
+app.extensions['sos'].start_outbox_workers()